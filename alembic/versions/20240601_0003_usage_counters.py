@@ -0,0 +1,64 @@
+"""Add monthly usage counters per tenant"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20240601_0003"
+down_revision = "20240509_0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    counters = op.create_table(
+        "billing_usage_counters",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("periodo", sa.Date(), nullable=False),
+        sa.Column("documentos", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("monto_cargado", sa.Numeric(16, 4), nullable=False, server_default="0"),
+        sa.UniqueConstraint("tenant_id", "periodo", name="uq_billing_usage_counters_periodo"),
+    )
+
+    # Siembra los contadores con el histórico; se agrupa en Python para no
+    # depender de funciones de fecha propias de cada motor.
+    records = sa.table(
+        "billing_usage_records",
+        sa.column("tenant_id", sa.Integer()),
+        sa.column("fecha", sa.DateTime()),
+        sa.column("monto_cargado", sa.Numeric(16, 4)),
+    )
+    totals: dict[tuple[int, date], list] = defaultdict(lambda: [0, Decimal("0")])
+    result = op.get_bind().execute(sa.select(records.c.tenant_id, records.c.fecha, records.c.monto_cargado))
+    for tenant_id, fecha, monto in result:
+        entry = totals[(tenant_id, date(fecha.year, fecha.month, 1))]
+        entry[0] += 1
+        entry[1] += Decimal(str(monto or 0))
+    if totals:
+        now = datetime.utcnow()
+        op.bulk_insert(
+            counters,
+            [
+                {
+                    "created_at": now,
+                    "updated_at": now,
+                    "tenant_id": tenant_id,
+                    "periodo": periodo,
+                    "documentos": documentos,
+                    "monto_cargado": monto,
+                }
+                for (tenant_id, periodo), (documentos, monto) in totals.items()
+            ],
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("billing_usage_counters")
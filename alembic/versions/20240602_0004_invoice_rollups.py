@@ -0,0 +1,66 @@
+"""Add monthly invoice rollups per tenant"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20240602_0004"
+down_revision = "20240601_0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    rollups = op.create_table(
+        "invoice_monthly_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("periodo", sa.Date(), nullable=False),
+        sa.Column("emitidos", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("aceptados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("rechazados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("contabilizados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("monto", sa.Numeric(18, 2), nullable=False, server_default="0"),
+        sa.UniqueConstraint("tenant_id", "periodo", name="uq_invoice_monthly_rollups_periodo"),
+    )
+
+    # Siembra los totales con el histórico en una sola agregación del motor,
+    # para que el resumen contable no arranque en cero tras desplegar.
+    bind = op.get_bind()
+    invoices = sa.table(
+        "invoices",
+        sa.column("tenant_id", sa.Integer()),
+        sa.column("fecha_emision", sa.DateTime()),
+        sa.column("estado_dgii", sa.String()),
+        sa.column("contabilizado", sa.Boolean()),
+        sa.column("total", sa.Numeric(18, 2)),
+    )
+    if bind.dialect.name == "postgresql":
+        mes = sa.cast(sa.func.date_trunc("month", invoices.c.fecha_emision), sa.Date())
+    elif bind.dialect.name == "sqlite":
+        mes = sa.func.strftime("%Y-%m-01", invoices.c.fecha_emision)
+    else:
+        raise NotImplementedError(f"Totales mensuales no soportados en {bind.dialect.name}")
+    now = datetime.utcnow()
+    seed = sa.select(
+        sa.literal(now, sa.DateTime()),
+        sa.literal(now, sa.DateTime()),
+        invoices.c.tenant_id,
+        mes,
+        sa.func.count(),
+        sa.func.sum(sa.case((invoices.c.estado_dgii == "ACEPTADO", 1), else_=0)),
+        sa.func.sum(sa.case((invoices.c.estado_dgii == "RECHAZADO", 1), else_=0)),
+        sa.func.sum(sa.case((invoices.c.contabilizado.is_(True), 1), else_=0)),
+        sa.func.coalesce(sa.func.sum(invoices.c.total), 0),
+    ).group_by(invoices.c.tenant_id, mes)
+    columns = ["created_at", "updated_at", "tenant_id", "periodo", "emitidos", "aceptados", "rechazados", "contabilizados", "monto"]
+    op.execute(rollups.insert().from_select(columns, seed))
+
+
+def downgrade() -> None:
+    op.drop_table("invoice_monthly_rollups")
@@ -0,0 +1,29 @@
+"""Covering indexes for keyset pagination of the tenant ledger"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20240603_0005"
+down_revision = "20240602_0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_invoice_ledger_entries_tenant_fecha",
+        "invoice_ledger_entries",
+        ["tenant_id", sa.text("fecha DESC"), sa.text("id DESC")],
+        postgresql_include=["invoice_id"],
+    )
+    # El índice compuesto empieza por tenant_id y reemplaza al simple.
+    op.drop_index("ix_invoice_ledger_entries_tenant", table_name="invoice_ledger_entries")
+    op.create_index("ix_invoices_id_contabilizado", "invoices", ["id", "contabilizado"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_invoices_id_contabilizado", table_name="invoices")
+    op.create_index("ix_invoice_ledger_entries_tenant", "invoice_ledger_entries", ["tenant_id"])
+    op.drop_index("ix_invoice_ledger_entries_tenant_fecha", table_name="invoice_ledger_entries")
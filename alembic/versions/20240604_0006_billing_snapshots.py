@@ -0,0 +1,43 @@
+"""Add closed billing periods and their per-tenant snapshots"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20240604_0006"
+down_revision = "20240603_0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_billing_usage_counters_periodo", "billing_usage_counters", ["periodo"])
+
+    op.create_table(
+        "billing_periods",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("periodo", sa.Date(), nullable=False, unique=True),
+        sa.Column("closed_at", sa.DateTime(), nullable=False),
+    )
+
+    op.create_table(
+        "billing_period_snapshots",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("periodo", sa.Date(), nullable=False),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("tenant_name", sa.String(length=255), nullable=False),
+        sa.Column("invoice_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_amount", sa.Numeric(16, 4), nullable=False, server_default="0"),
+        sa.UniqueConstraint("periodo", "tenant_id", name="uq_billing_period_snapshots_tenant"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("billing_period_snapshots")
+    op.drop_table("billing_periods")
+    op.drop_index("ix_billing_usage_counters_periodo", table_name="billing_usage_counters")
@@ -0,0 +1,21 @@
+"""Index the content-addressed XML archive in xml_store"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20240605_0007"
+down_revision = "20240604_0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("xml_store", sa.Column("size_bytes", sa.Integer(), nullable=True))
+    op.create_index("ix_xml_store_sha256", "xml_store", ["sha256"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_xml_store_sha256", table_name="xml_store")
+    op.drop_column("xml_store", "size_bytes")
@@ -47,9 +47,11 @@ class LedgerEntryItem(LedgerEntryBase):
 
 class LedgerPaginatedResponse(BaseModel):
     items: List[LedgerEntryItem]
-    total: int
+    total: Optional[int]
     page: int
     size: int
+    next_cursor: Optional[str] = None
+    total_exacto: bool = True
 
 
 class LedgerStatusBreakdown(BaseModel):
@@ -126,3 +128,8 @@ class BillingSummaryResponse(BaseModel):
 class TenantPlanResponse(BaseModel):
     tenant_id: int
     plan: Optional[PlanResponse] = None
+
+
+class DGIIStatusLookupRequest(BaseModel):
+    track_ids: List[str] = Field(..., min_length=1, max_length=10_000)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=64)
@@ -13,6 +13,7 @@ from pydantic import ValidationError
 from app.api.schemas.enfc_schemas import AprobacionReq, CertReq, RecepcionReq
 from app.services.aprobacion_service import procesar_aprobacion
 from app.services.auth_service import emitir_semilla, validar_certificado
+from app.services.documents import ParsedDocument
 from app.services.idempotency import idempotency_store
 from app.services.recepcion_service import procesar_ecf
 
@@ -51,16 +52,18 @@ async def _read_request(request: Request) -> Tuple[str, bytes]:
 
 
 async def _handle_idempotency(key: str, payload_hash: str, response: Response):
+    """Devuelve ``(respuesta guardada, None)`` o toma el candado en vuelo: ``(None, token)``."""
+
     try:
-        cached = await idempotency_store.get(key, payload_hash)
+        cached, lock_token = await idempotency_store.begin(key, payload_hash)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
     if cached:
         response.status_code = cached.status_code
         response.headers.update(cached.headers)
         response.headers["Idempotent-Replay"] = "true"
-        return cached.body
-    return None
+        return cached.body, None
+    return None, lock_token
 
 
 async def _store_idempotent_response(
@@ -86,7 +89,7 @@ async def recepcion_ecf(
     content_type, body = await _read_request(request)
     payload_hash = _hash_payload(content_type, body)
 
-    cached_body = await _handle_idempotency(idempotency_key, payload_hash, response)
+    cached_body, lock_token = await _handle_idempotency(idempotency_key, payload_hash, response)
     if cached_body is not None:
         return cached_body
 
@@ -98,21 +101,23 @@ async def recepcion_ecf(
             except (json.JSONDecodeError, ValidationError) as exc:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"JSON inválido: {exc}") from exc
         else:
-            payload = body
+            payload = ParsedDocument.from_bytes(body, sha256=payload_hash)
         result = await procesar_ecf(payload)
     except ValueError as exc:
         logger.warning("recepcion.ecf.error", error=str(exc))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-
-    response.headers["Idempotent-Replay"] = "false"
-    await _store_idempotent_response(
-        idempotency_key,
-        payload_hash,
-        status.HTTP_200_OK,
-        result,
-        headers={"Content-Type": "application/json"},
-    )
-    return result
+    else:
+        response.headers["Idempotent-Replay"] = "false"
+        await _store_idempotent_response(
+            idempotency_key,
+            payload_hash,
+            status.HTTP_200_OK,
+            result,
+            headers={"Content-Type": "application/json"},
+        )
+        return result
+    finally:
+        await idempotency_store.release(idempotency_key, lock_token)
 
 
 @router.post("/aprobacioncomercial/api/ecf")
@@ -127,7 +132,7 @@ async def aprobacion_ecf(
     content_type, body = await _read_request(request)
     payload_hash = _hash_payload(content_type, body)
 
-    cached_body = await _handle_idempotency(idempotency_key, payload_hash, response)
+    cached_body, lock_token = await _handle_idempotency(idempotency_key, payload_hash, response)
     if cached_body is not None:
         return cached_body
 
@@ -139,21 +144,23 @@ async def aprobacion_ecf(
             except (json.JSONDecodeError, ValidationError) as exc:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"JSON inválido: {exc}") from exc
         else:
-            payload = body
+            payload = ParsedDocument.from_bytes(body, sha256=payload_hash)
         result = await procesar_aprobacion(payload)
     except ValueError as exc:
         logger.warning("aprobacion.ecf.error", error=str(exc))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-
-    response.headers["Idempotent-Replay"] = "false"
-    await _store_idempotent_response(
-        idempotency_key,
-        payload_hash,
-        status.HTTP_200_OK,
-        result,
-        headers={"Content-Type": "application/json"},
-    )
-    return result
+    else:
+        response.headers["Idempotent-Replay"] = "false"
+        await _store_idempotent_response(
+            idempotency_key,
+            payload_hash,
+            status.HTTP_200_OK,
+            result,
+            headers={"Content-Type": "application/json"},
+        )
+        return result
+    finally:
+        await idempotency_store.release(idempotency_key, lock_token)
 
 
 @router.get("/autenticacion/api/semilla")
@@ -11,7 +11,7 @@ router = APIRouter()
 
 
 @router.post("/login", response_model=LoginResponse)
-async def login(payload: LoginRequest, service: AuthService = Depends(get_service)) -> LoginResponse:
+def login(payload: LoginRequest, service: AuthService = Depends(get_service)) -> LoginResponse:
     """Realiza autenticación tradicional (primer factor)."""
 
     _, tokens = service.authenticate(payload.email, payload.password)
@@ -19,14 +19,14 @@ async def login(payload: LoginRequest, service: AuthService = Depends(get_servic
 
 
 @router.post("/mfa/verify", response_model=dict[str, bool])
-async def verify_mfa(payload: MFARequest, service: AuthService = Depends(get_service)) -> dict[str, bool]:
+def verify_mfa(payload: MFARequest, service: AuthService = Depends(get_service)) -> dict[str, bool]:
     """Valida códigos TOTP enviados por el usuario."""
 
     return {"valid": service.verify_mfa(payload.email, payload.code)}
 
 
 @router.get("/me", response_model=UserRead)
-async def me(service: AuthService = Depends(get_service)) -> UserRead:
+def me(service: AuthService = Depends(get_service)) -> UserRead:
     """Retorna información del usuario autenticado."""
 
     user = service.bootstrap_admin(None)
@@ -3,18 +3,31 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from app.billing.validators import validate_encf, validate_rnc
+from app.billing.templates import render_document
+from app.billing.validators import resolve_razon_social_comprador, validate_encf, validate_rnc
 
 
-def build_acecf(*, encf: str, rnc_emisor: str, rnc_comprador: str, estado: int, detalle_motivo: str | None) -> str:
+def build_acecf(
+    *,
+    encf: str,
+    rnc_emisor: str,
+    rnc_comprador: str,
+    estado: int,
+    detalle_motivo: str | None,
+    razon_social_comprador: str | None = None,
+) -> str:
     validate_encf(encf)
     validate_rnc(rnc_emisor)
-    validate_rnc(rnc_comprador)
+    razon_social_comprador = resolve_razon_social_comprador(rnc_comprador, razon_social_comprador)
     if estado == 2 and not detalle_motivo:
         raise ValueError("Debe indicar detalle de motivo para rechazos")
-    return (
-        "<?xml version='1.0' encoding='UTF-8'?>"
-        f"<ACECF><ENCF>{encf}</ENCF><RNCEmisor>{rnc_emisor}</RNCEmisor>"
-        f"<RNCComprador>{rnc_comprador}</RNCComprador><Estado>{estado}</Estado>"
-        f"<DetalleMotivo>{detalle_motivo or ''}</DetalleMotivo><Fecha>{datetime.utcnow().isoformat()}</Fecha></ACECF>"
+    return render_document(
+        "acecf",
+        encf=encf,
+        rnc_emisor=rnc_emisor,
+        rnc_comprador=rnc_comprador,
+        razon_social_comprador=razon_social_comprador,
+        estado=estado,
+        detalle_motivo=detalle_motivo or "",
+        fecha=datetime.utcnow().isoformat(),
     )
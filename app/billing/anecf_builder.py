@@ -3,6 +3,7 @@ from __future__ import annotations
 
 from datetime import datetime
 
+from app.billing.templates import render_document
 from app.billing.validators import validate_rnc
 
 
@@ -11,9 +12,12 @@ def build_anecf(*, tipo_ecf: str, rnc_emisor: str, desde: int, hasta: int) -> st
         raise ValueError("Rango inválido")
     cantidad = hasta - desde + 1
     validate_rnc(rnc_emisor)
-    return (
-        "<?xml version='1.0' encoding='UTF-8'?>"
-        f"<ANECF><TipoECF>{tipo_ecf}</TipoECF><RNCEmisor>{rnc_emisor}</RNCEmisor>"
-        f"<Desde>{desde}</Desde><Hasta>{hasta}</Hasta><Cantidad>{cantidad}</Cantidad>"
-        f"<Fecha>{datetime.utcnow().isoformat()}</Fecha></ANECF>"
+    return render_document(
+        "anecf",
+        tipo_ecf=tipo_ecf,
+        rnc_emisor=rnc_emisor,
+        desde=desde,
+        hasta=hasta,
+        cantidad=cantidad,
+        fecha=datetime.utcnow().isoformat(),
     )
@@ -3,18 +3,31 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from app.billing.validators import validate_encf, validate_rnc
+from app.billing.templates import render_document
+from app.billing.validators import resolve_razon_social_comprador, validate_encf, validate_rnc
 
 
-def build_arecf(*, encf: str, rnc_emisor: str, rnc_comprador: str, estado: int, motivo_codigo: str | None) -> str:
+def build_arecf(
+    *,
+    encf: str,
+    rnc_emisor: str,
+    rnc_comprador: str,
+    estado: int,
+    motivo_codigo: str | None,
+    razon_social_comprador: str | None = None,
+) -> str:
     validate_encf(encf)
     validate_rnc(rnc_emisor)
-    validate_rnc(rnc_comprador)
+    razon_social_comprador = resolve_razon_social_comprador(rnc_comprador, razon_social_comprador)
     if estado == 1 and not motivo_codigo:
         raise ValueError("Debe indicar motivo para estado 1")
-    return (
-        "<?xml version='1.0' encoding='UTF-8'?>"
-        f"<ARECF><ENCF>{encf}</ENCF><RNCEmisor>{rnc_emisor}</RNCEmisor>"
-        f"<RNCComprador>{rnc_comprador}</RNCComprador><Estado>{estado}</Estado>"
-        f"<CodigoMotivo>{motivo_codigo or ''}</CodigoMotivo><Fecha>{datetime.utcnow().isoformat()}</Fecha></ARECF>"
+    return render_document(
+        "arecf",
+        encf=encf,
+        rnc_emisor=rnc_emisor,
+        rnc_comprador=rnc_comprador,
+        razon_social_comprador=razon_social_comprador,
+        estado=estado,
+        motivo_codigo=motivo_codigo or "",
+        fecha=datetime.utcnow().isoformat(),
     )
@@ -0,0 +1,194 @@
+"""Resúmenes RFCE de facturas de consumo (tipo 32) por tenant y período.
+
+Las facturas se leen de la base en streaming (cursor del servidor, solo las
+columnas necesarias, ordenadas por fecha), de modo que en memoria solo vive
+el acumulador del día en curso: cada resumen diario se emite, firma y envía
+en cuanto aparece la primera factura del día siguiente.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Protocol
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.logging import bind_request_context
+from app.dgii.models import RFCERequest
+
+TIPO_CONSUMO = "32"
+
+SignFn = Callable[[bytes], Awaitable[bytes]]
+
+
+class RFCESender(Protocol):
+    async def send_rfce(self, xml_bytes: bytes, *, idempotency_key: str | None = None) -> Dict[str, Any]: ...
+
+
+@dataclass(frozen=True, slots=True)
+class ConsumoRow:
+    encf: str
+    total: Decimal
+    fecha_emision: datetime
+
+
+@dataclass(slots=True)
+class RFCESummary:
+    periodo: date
+    cantidad_facturas: int = 0
+    monto_total: Decimal = Decimal("0")
+    encf_desde: str = ""
+    encf_hasta: str = ""
+
+    def add(self, row: ConsumoRow) -> None:
+        self.cantidad_facturas += 1
+        self.monto_total += Decimal(row.total)
+        if not self.encf_desde or row.encf < self.encf_desde:
+            self.encf_desde = row.encf
+        if row.encf > self.encf_hasta:
+            self.encf_hasta = row.encf
+
+    def to_request(self, rnc_emisor: str) -> RFCERequest:
+        return RFCERequest(
+            encf=self.encf_desde,
+            rnc_emisor=rnc_emisor,
+            periodo=self.periodo,
+            cantidad_facturas=self.cantidad_facturas,
+            monto_total=self.monto_total,
+        )
+
+
+@dataclass(slots=True)
+class RFCEResult:
+    resumen: RFCESummary
+    respuesta: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class RFCERunReport:
+    resultados: List[RFCEResult] = field(default_factory=list)
+
+    @property
+    def facturas(self) -> int:
+        return sum(result.resumen.cantidad_facturas for result in self.resultados)
+
+    @property
+    def errores(self) -> int:
+        return sum(1 for result in self.resultados if result.error)
+
+
+async def stream_consumo(
+    session: Any,
+    tenant_id: int,
+    desde: date,
+    hasta: date,
+    *,
+    batch_size: int | None = None,
+) -> AsyncIterator[ConsumoRow]:
+    """Facturas tipo 32 bajo el límite del tenant entre ``desde`` y ``hasta`` (inclusive)."""
+
+    from app.models.invoice import Invoice
+
+    stmt = (
+        select(Invoice.encf, Invoice.total, Invoice.fecha_emision)
+        .where(
+            Invoice.tenant_id == tenant_id,
+            Invoice.tipo_ecf == TIPO_CONSUMO,
+            Invoice.total < settings.rfce_monto_limite,
+            Invoice.fecha_emision >= datetime.combine(desde, time.min),
+            Invoice.fecha_emision < datetime.combine(hasta + timedelta(days=1), time.min),
+        )
+        .order_by(Invoice.fecha_emision, Invoice.id)
+        .execution_options(yield_per=batch_size or settings.rfce_stream_batch_size)
+    )
+    result = await session.stream(stmt)
+    async for encf, total, fecha_emision in result:
+        yield ConsumoRow(encf=encf, total=total, fecha_emision=fecha_emision)
+
+
+async def summarize(rows: AsyncIterator[ConsumoRow]) -> AsyncIterator[RFCESummary]:
+    """Agrupa filas ordenadas por fecha en un resumen por día, emitido al cerrar el día."""
+
+    current: RFCESummary | None = None
+    async for row in rows:
+        day = row.fecha_emision.date()
+        if current is not None and current.periodo != day:
+            if day < current.periodo:
+                raise ValueError("Las facturas deben llegar ordenadas por fecha de emisión")
+            yield current
+            current = None
+        if current is None:
+            current = RFCESummary(periodo=day)
+        current.add(row)
+    if current is not None:
+        yield current
+
+
+class RFCEAggregator:
+    """Resume, firma y envía los RFCE de un tenant para un período."""
+
+    def __init__(self, *, client: RFCESender, sign: SignFn, session_factory: Any | None = None) -> None:
+        self._client = client
+        self._sign = sign
+        self._session_factory = session_factory
+
+    async def run(
+        self,
+        tenant_id: int,
+        rnc_emisor: str,
+        desde: date,
+        hasta: date,
+        *,
+        rows: AsyncIterator[ConsumoRow] | None = None,
+    ) -> RFCERunReport:
+        if rows is not None:
+            return await self._process(tenant_id, rnc_emisor, rows)
+
+        session_factory = self._session_factory
+        if session_factory is None:
+            from app.db import AsyncSessionFactory as session_factory
+        async with session_factory() as session:
+            return await self._process(tenant_id, rnc_emisor, stream_consumo(session, tenant_id, desde, hasta))
+
+    async def _process(self, tenant_id: int, rnc_emisor: str, rows: AsyncIterator[ConsumoRow]) -> RFCERunReport:
+        logger = bind_request_context(tenant_id=tenant_id, documento="RFCE")
+        report = RFCERunReport()
+        async for resumen in summarize(rows):
+            result = RFCEResult(resumen=resumen)
+            try:
+                signed = await self._sign(resumen.to_request(rnc_emisor).to_xml_bytes())
+                result.respuesta = await self._client.send_rfce(
+                    signed, idempotency_key=f"rfce:{tenant_id}:{resumen.periodo.isoformat()}"
+                )
+            except Exception as exc:  # noqa: BLE001 - un día fallido no detiene el resto
+                result.error = str(exc)
+                logger.error("Envío de RFCE falló", periodo=resumen.periodo.isoformat(), error=str(exc))
+            else:
+                logger.info(
+                    "RFCE enviado",
+                    periodo=resumen.periodo.isoformat(),
+                    facturas=resumen.cantidad_facturas,
+                    monto_total=str(resumen.monto_total),
+                )
+            report.resultados.append(result)
+        return report
+
+
+async def enviar_rfce_periodo(tenant_id: int, rnc_emisor: str, desde: date, hasta: date) -> RFCERunReport:
+    """Punto de entrada con el cliente DGII y el pool de firma compartidos.
+
+    Firma y token se resuelven por ``rnc_emisor``, la clave de tenant que usan
+    los routers, para tomar el certificado y el token propios del emisor.
+    """
+
+    from app.dgii.client import DGIIClient
+    from app.dgii.signing_pool import signing_pool
+
+    async def sign(xml_bytes: bytes) -> bytes:
+        return await signing_pool.sign_async(xml_bytes, rnc_emisor)
+
+    async with DGIIClient(config=settings, tenant=rnc_emisor) as client:
+        return await RFCEAggregator(client=client, sign=sign).run(tenant_id, rnc_emisor, desde, hasta)
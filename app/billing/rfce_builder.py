@@ -3,14 +3,17 @@ from __future__ import annotations
 
 from datetime import datetime
 
+from app.billing.templates import render_document
 from app.billing.validators import validate_encf, validate_rnc
 
 
 def build_rfce(*, encf: str, rnc_emisor: str, total: float) -> str:
     validate_encf(encf)
     validate_rnc(rnc_emisor)
-    return (
-        "<?xml version='1.0' encoding='UTF-8'?>"
-        f"<Resumen><RNCEmisor>{rnc_emisor}</RNCEmisor><ENCF>{encf}</ENCF>"
-        f"<Total>{total:.2f}</Total><Fecha>{datetime.utcnow().date().isoformat()}</Fecha></Resumen>"
+    return render_document(
+        "rfce",
+        rnc_emisor=rnc_emisor,
+        encf=encf,
+        total=f"{total:.2f}",
+        fecha=datetime.utcnow().date().isoformat(),
     )
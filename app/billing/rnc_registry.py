@@ -0,0 +1,357 @@
+"""Índice local del registro de contribuyentes (RNC) publicado por la DGII.
+
+El archivo ``DGII_RNC.TXT`` (delimitado por ``|``, codificación latin-1, a
+veces comprimido en ``.zip``) se importa a una tabla SQLite ``WITHOUT ROWID``
+indexada por RNC: cada búsqueda es un recorrido del B-tree, O(log n), sin
+llamadas de red. La reimportación compara huellas por fila contra una tabla
+temporal y solo toca los registros que cambiaron; si el archivo es idéntico al
+último importado no se procesa.
+
+Uso desde la línea de comandos::
+
+    python -m app.billing.rnc_registry importar DGII_RNC.zip --db /var/getupnet/rnc.sqlite3
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import io
+import sqlite3
+import threading
+import zipfile
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_BATCH_SIZE = 5_000
+_COLUMNS = ("rnc", "razon_social", "nombre_comercial", "actividad", "estado", "regimen")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contribuyentes (
+    rnc TEXT PRIMARY KEY,
+    razon_social TEXT NOT NULL,
+    nombre_comercial TEXT NOT NULL DEFAULT '',
+    actividad TEXT NOT NULL DEFAULT '',
+    estado TEXT NOT NULL DEFAULT '',
+    regimen TEXT NOT NULL DEFAULT '',
+    huella TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS registro_meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class Contribuyente:
+    rnc: str
+    razon_social: str
+    nombre_comercial: str = ""
+    actividad: str = ""
+    estado: str = ""
+    regimen: str = ""
+
+    @property
+    def activo(self) -> bool:
+        return not self.estado or self.estado.upper() == "ACTIVO"
+
+    def as_dict(self) -> Dict[str, str]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class ImportStats:
+    leidos: int = 0
+    descartados: int = 0
+    insertados: int = 0
+    actualizados: int = 0
+    eliminados: int = 0
+    sin_cambios: bool = False
+
+    def as_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+def normalize_rnc(value: str) -> str:
+    return "".join(ch for ch in str(value) if ch.isdigit())
+
+
+def parse_line(fields: List[str]) -> Optional[Contribuyente]:
+    """Convierte una fila del padrón DGII; devuelve ``None`` para encabezados o basura.
+
+    Columnas del archivo: RNC | razón social | nombre comercial | actividad |
+    ... | estado (posición 9) | régimen de pago (posición 10).
+    """
+
+    if not fields:
+        return None
+    rnc = normalize_rnc(fields[0])
+    if len(rnc) not in (9, 11):
+        return None
+
+    def column(index: int) -> str:
+        return " ".join(fields[index].split()) if len(fields) > index else ""
+
+    razon_social = column(1)
+    if not razon_social:
+        return None
+    return Contribuyente(
+        rnc=rnc,
+        razon_social=razon_social,
+        nombre_comercial=column(2),
+        actividad=column(3),
+        estado=column(9).upper(),
+        regimen=column(10).upper(),
+    )
+
+
+def _fingerprint(record: Contribuyente) -> str:
+    raw = "\x1f".join(getattr(record, name) for name in _COLUMNS)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def _open_text(path: Path, encoding: str) -> Iterator[IO[str]]:
+    if not zipfile.is_zipfile(path):
+        with path.open("r", encoding=encoding, errors="replace", newline="") as handle:
+            yield handle
+        return
+    with zipfile.ZipFile(path) as archive:
+        members = [name for name in archive.namelist() if not name.endswith("/")]
+        if not members:
+            raise ValueError(f"{path} no contiene archivos")
+        with io.TextIOWrapper(archive.open(members[0]), encoding=encoding, errors="replace", newline="") as handle:
+            yield handle
+
+
+def iter_records(lines: Iterable[str], stats: ImportStats | None = None) -> Iterator[Contribuyente]:
+    """Lee filas ``|`` o ``,`` (se detecta con la primera línea) y descarta las inválidas."""
+
+    iterator = iter(lines)
+    first = next(iterator, None)
+    if first is None:
+        return
+    delimiter = "|" if "|" in first else ","
+
+    def chained() -> Iterator[str]:
+        yield first
+        yield from iterator
+
+    for fields in csv.reader(chained(), delimiter=delimiter, quoting=csv.QUOTE_NONE):
+        record = parse_line(fields)
+        if stats is not None:
+            stats.leidos += 1
+            if record is None:
+                stats.descartados += 1
+        if record is not None:
+            yield record
+
+
+class RNCRegistry:
+    """Consulta e importación del padrón de contribuyentes."""
+
+    def __init__(self, path: Path | str | None) -> None:
+        self.path = Path(path) if path else None
+        self._local = threading.local()
+
+    @property
+    def available(self) -> bool:
+        return self.path is not None and self.path.exists()
+
+    def lookup(self, rnc: str) -> Optional[Contribuyente]:
+        if not self.available:
+            return None
+        row = self._reader().execute(
+            "SELECT rnc, razon_social, nombre_comercial, actividad, estado, regimen FROM contribuyentes WHERE rnc = ?",
+            (normalize_rnc(rnc),),
+        ).fetchone()
+        return Contribuyente(*row) if row else None
+
+    def lookup_many(self, rncs: Iterable[str]) -> Dict[str, Contribuyente]:
+        keys = sorted({normalize_rnc(rnc) for rnc in rncs})
+        if not keys or not self.available:
+            return {}
+        found: Dict[str, Contribuyente] = {}
+        reader = self._reader()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for row in reader.execute(
+                "SELECT rnc, razon_social, nombre_comercial, actividad, estado, regimen "
+                f"FROM contribuyentes WHERE rnc IN ({placeholders})",
+                chunk,
+            ):
+                found[row[0]] = Contribuyente(*row)
+        return found
+
+    def razon_social(self, rnc: str) -> Optional[str]:
+        record = self.lookup(rnc)
+        return record.razon_social if record else None
+
+    def count(self) -> int:
+        if not self.available:
+            return 0
+        return int(self._reader().execute("SELECT count(*) FROM contribuyentes").fetchone()[0])
+
+    def metadata(self) -> Dict[str, str]:
+        if not self.available:
+            return {}
+        return dict(self._reader().execute("SELECT clave, valor FROM registro_meta"))
+
+    def import_file(
+        self,
+        source: Path | str,
+        *,
+        encoding: str = "latin-1",
+        partial: bool = False,
+        force: bool = False,
+    ) -> ImportStats:
+        """Importa el padrón desde ``source``.
+
+        Con ``partial=True`` el archivo se trata como un delta y los RNC ausentes
+        se conservan; en una importación completa se eliminan.
+        """
+
+        source = Path(source)
+        digest = _file_digest(source)
+        if not force and self.metadata().get("sha256") == digest:
+            return ImportStats(sin_cambios=True)
+        stats = ImportStats()
+        with _open_text(source, encoding) as handle:
+            self.import_records(iter_records(handle, stats), partial=partial, stats=stats)
+        self._set_meta(
+            {"sha256": digest, "origen": source.name, "importado": datetime.now(timezone.utc).isoformat()}
+        )
+        return stats
+
+    def import_records(
+        self,
+        records: Iterable[Contribuyente],
+        *,
+        partial: bool = False,
+        stats: ImportStats | None = None,
+    ) -> ImportStats:
+        if self.path is None:
+            raise ValueError("No hay ruta configurada para el registro de RNC")
+        stats = stats or ImportStats()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._writer()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "CREATE TEMP TABLE staging (rnc TEXT PRIMARY KEY, razon_social TEXT, nombre_comercial TEXT, "
+                "actividad TEXT, estado TEXT, regimen TEXT, huella TEXT) WITHOUT ROWID"
+            )
+            batch: List[Tuple[str, ...]] = []
+            insert = "INSERT OR REPLACE INTO staging VALUES (?, ?, ?, ?, ?, ?, ?)"
+            for record in records:
+                batch.append((*(getattr(record, name) for name in _COLUMNS), _fingerprint(record)))
+                if len(batch) >= _BATCH_SIZE:
+                    connection.executemany(insert, batch)
+                    batch.clear()
+            if batch:
+                connection.executemany(insert, batch)
+
+            stats.actualizados = connection.execute(
+                "UPDATE contribuyentes SET razon_social = s.razon_social, nombre_comercial = s.nombre_comercial, "
+                "actividad = s.actividad, estado = s.estado, regimen = s.regimen, huella = s.huella "
+                "FROM staging AS s WHERE s.rnc = contribuyentes.rnc AND s.huella != contribuyentes.huella"
+            ).rowcount
+            stats.insertados = connection.execute(
+                "INSERT INTO contribuyentes SELECT * FROM staging AS s "
+                "WHERE NOT EXISTS (SELECT 1 FROM contribuyentes AS c WHERE c.rnc = s.rnc)"
+            ).rowcount
+            if not partial:
+                stats.eliminados = connection.execute(
+                    "DELETE FROM contribuyentes WHERE rnc NOT IN (SELECT rnc FROM staging)"
+                ).rowcount
+            connection.execute("DROP TABLE staging")
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            connection.execute("DROP TABLE IF EXISTS temp.staging")
+            raise
+        return stats
+
+    def close(self) -> None:
+        for name in ("reader", "writer"):
+            connection = getattr(self._local, name, None)
+            if connection is not None:
+                connection.close()
+                setattr(self._local, name, None)
+
+    def _writer(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "writer", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._local.writer = connection
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        # Una conexión de solo lectura por hilo; con WAL ve cada importación
+        # confirmada sin bloquear al importador.
+        connection = getattr(self._local, "reader", None)
+        if connection is None:
+            self._writer()  # crea el esquema si la base es nueva
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.reader = connection
+        return connection
+
+    def _set_meta(self, values: Dict[str, str]) -> None:
+        self._writer().executemany(
+            "INSERT INTO registro_meta (clave, valor) VALUES (?, ?) "
+            "ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor",
+            list(values.items()),
+        )
+
+
+def _build_registry() -> RNCRegistry:
+    from app.core.config import settings
+
+    return RNCRegistry(settings.rnc_registry_path)
+
+
+rnc_registry = _build_registry()
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Importa el padrón de RNC de la DGII")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    importar = sub.add_parser("importar", help="Importa DGII_RNC.TXT (o su .zip)")
+    importar.add_argument("archivo", type=Path)
+    importar.add_argument("--db", type=Path, default=None, help="Ruta del índice SQLite")
+    importar.add_argument("--parcial", action="store_true", help="No elimina RNC ausentes del archivo")
+    importar.add_argument("--forzar", action="store_true", help="Importa aunque el archivo no haya cambiado")
+    importar.add_argument("--encoding", default="latin-1")
+    consultar = sub.add_parser("consultar", help="Busca un RNC en el índice")
+    consultar.add_argument("rnc")
+    consultar.add_argument("--db", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    registry = RNCRegistry(args.db) if args.db else rnc_registry
+    if registry.path is None:
+        raise SystemExit("Configure RNC_REGISTRY_PATH o indique --db")
+    if args.comando == "importar":
+        stats = registry.import_file(args.archivo, encoding=args.encoding, partial=args.parcial, force=args.forzar)
+        print(stats.as_dict())
+    else:
+        record = registry.lookup(args.rnc)
+        print(record.as_dict() if record else "RNC no encontrado")
+
+
+if __name__ == "__main__":
+    main()
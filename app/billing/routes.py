@@ -21,6 +21,7 @@ async def create_ecf(tenant: int, payload: dict) -> dict:
         encf=payload["encf"],
         rnc_emisor=payload["rnc_emisor"],
         rnc_comprador=payload["rnc_comprador"],
+        razon_social_comprador=payload.get("razon_social_comprador"),
         total=float(payload["total"]),
     )
     return {"xml": xml}
@@ -38,6 +39,7 @@ async def create_arecf(tenant: int, payload: dict) -> dict:
         encf=payload["encf"],
         rnc_emisor=payload["rnc_emisor"],
         rnc_comprador=payload["rnc_comprador"],
+        razon_social_comprador=payload.get("razon_social_comprador"),
         estado=int(payload["estado"]),
         motivo_codigo=payload.get("motivo_codigo"),
     )
@@ -50,6 +52,7 @@ async def create_acecf(tenant: int, payload: dict) -> dict:
         encf=payload["encf"],
         rnc_emisor=payload["rnc_emisor"],
         rnc_comprador=payload["rnc_comprador"],
+        razon_social_comprador=payload.get("razon_social_comprador"),
         estado=int(payload["estado"]),
         detalle_motivo=payload.get("detalle_motivo"),
     )
@@ -5,12 +5,21 @@ from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
 from fastapi import Depends
-from sqlalchemy import func, select
-from sqlalchemy.orm import Session
-
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from app.billing.usage_counters import (
+    TenantPlan,
+    add_monto_stmt,
+    increment_stmt,
+    periodo_de,
+    tenant_plan_cache,
+)
 from app.models.billing import Plan, UsageRecord
 from app.models.tenant import Tenant
-from app.shared.database import get_db
+from app.repositories import TenantRepository, UsageRepository
+from app.shared.database import get_async_db, get_db
 
 
 class BillingError(RuntimeError):
@@ -19,56 +28,62 @@ class BillingError(RuntimeError):
 
 @dataclass(slots=True)
 class BillingContext:
-    tenant: Tenant
-    plan: Plan
+    plan: TenantPlan
     now: datetime
 
 
+def prepare_context(plan: TenantPlan) -> BillingContext:
+    if plan.plan_id is None:
+        raise BillingError("El tenant no tiene un plan de facturación asignado")
+    return BillingContext(plan=plan, now=datetime.utcnow())
+
+
+def month_window(reference: datetime) -> tuple[datetime, datetime]:
+    start = reference.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+def charge_for(plan: Plan | TenantPlan, registros_mes: int) -> Decimal:
+    # Se cobra precio_por_documento a partir del documento que excede el cupo incluido.
+    if plan.documentos_incluidos and registros_mes < plan.documentos_incluidos:
+        return Decimal("0")
+    precio = plan.precio_por_documento or Decimal("0")
+    return Decimal(str(precio))
+
+
 class BillingService:
     """Reglas de negocio para registrar consumo y generar reportes."""
 
     def __init__(self, db: Session) -> None:
         self.db = db
 
-    def _resolve_tenant(self, tenant_id: int | None = None, *, rnc: str | None = None) -> Tenant:
+    def _resolve_tenant(self, tenant_id: int | None = None, *, rnc: str | None = None) -> TenantPlan:
+        cached = tenant_plan_cache.get(tenant_id, rnc=rnc)
+        if cached is not None:
+            return cached
         tenant: Tenant | None = None
         if tenant_id is not None:
-            tenant = self.db.get(Tenant, tenant_id)
+            tenant = self.db.get(Tenant, tenant_id, options=[selectinload(Tenant.plan)])
         elif rnc:
-            tenant = self.db.scalar(select(Tenant).where(Tenant.rnc == rnc))
+            tenant = self.db.scalar(select(Tenant).options(selectinload(Tenant.plan)).where(Tenant.rnc == rnc))
         if not tenant:
             raise BillingError("No se encontró el tenant asociado al envío")
-        return tenant
-
-    def _prepare_context(self, tenant: Tenant) -> BillingContext:
-        plan = tenant.plan
-        if not plan:
-            raise BillingError("El tenant no tiene un plan de facturación asignado")
-        now = datetime.utcnow()
-        return BillingContext(tenant=tenant, plan=plan, now=now)
-
-    def _month_window(self, reference: datetime) -> tuple[datetime, datetime]:
-        start = reference.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if start.month == 12:
-            end = start.replace(year=start.year + 1, month=1)
-        else:
-            end = start.replace(month=start.month + 1)
-        return start, end
+        return tenant_plan_cache.put(TenantPlan.from_tenant(tenant))
+
+    def _prepare_context(self, plan: TenantPlan) -> BillingContext:
+        return prepare_context(plan)
 
     def _compute_charge(self, context: BillingContext, invoice_id: int | None, ecf_type: str) -> Decimal:
-        start, end = self._month_window(context.now)
-        registros_mes = self.db.scalar(
-            select(func.count(UsageRecord.id)).where(
-                UsageRecord.tenant_id == context.tenant.id,
-                UsageRecord.fecha >= start,
-                UsageRecord.fecha < end,
-            )
-        ) or 0
-        # Se cobra precio_por_documento a partir del documento que excede el cupo incluido.
-        if context.plan.documentos_incluidos and registros_mes < context.plan.documentos_incluidos:
-            return Decimal("0")
-        precio = context.plan.precio_por_documento or Decimal("0")
-        return Decimal(str(precio))
+        tenant_id, periodo = context.plan.tenant_id, periodo_de(context.now)
+        documentos = self.db.scalar(increment_stmt(self.db.get_bind().dialect.name, tenant_id, periodo))
+        monto = charge_for(context.plan, documentos - 1)
+        if monto:
+            self.db.execute(add_monto_stmt(tenant_id, periodo, monto))
+        return monto
 
     def record_usage(
         self,
@@ -79,12 +94,11 @@ class BillingService:
         track_id: str | None = None,
         invoice_id: int | None = None,
     ) -> UsageRecord:
-        tenant = self._resolve_tenant(tenant_id, rnc=rnc)
-        context = self._prepare_context(tenant)
+        context = self._prepare_context(self._resolve_tenant(tenant_id, rnc=rnc))
         monto = self._compute_charge(context, invoice_id, ecf_type)
         record = UsageRecord(
-            tenant_id=tenant.id,
-            plan_id=context.plan.id,
+            tenant_id=context.plan.tenant_id,
+            plan_id=context.plan.plan_id,
             invoice_id=invoice_id,
             ecf_type=ecf_type,
             track_id=track_id,
@@ -103,3 +117,56 @@ def get_billing_service(db: Session = Depends(get_db)) -> BillingService:
     return BillingService(db)
 
 
+class AsyncBillingService:
+    """Variante async de :class:`BillingService` para rutas que corren en el event loop."""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+        self.tenants = TenantRepository(db)
+        self.usage = UsageRepository(db)
+
+    async def _resolve_tenant(self, tenant_id: int | None = None, *, rnc: str | None = None) -> TenantPlan:
+        cached = tenant_plan_cache.get(tenant_id, rnc=rnc)
+        if cached is not None:
+            return cached
+        tenant: Tenant | None = None
+        if tenant_id is not None:
+            tenant = await self.tenants.get(tenant_id)
+        elif rnc:
+            tenant = await self.tenants.get_by_rnc(rnc)
+        if not tenant:
+            raise BillingError("No se encontró el tenant asociado al envío")
+        return tenant_plan_cache.put(TenantPlan.from_tenant(tenant))
+
+    async def record_usage(
+        self,
+        *,
+        tenant_id: int | None = None,
+        rnc: str | None = None,
+        ecf_type: str,
+        track_id: str | None = None,
+        invoice_id: int | None = None,
+    ) -> UsageRecord:
+        context = prepare_context(await self._resolve_tenant(tenant_id, rnc=rnc))
+        tenant_id, periodo = context.plan.tenant_id, periodo_de(context.now)
+        documentos = await self.usage.increment_counter(tenant_id, periodo)
+        monto = charge_for(context.plan, documentos - 1)
+        if monto:
+            await self.usage.add_to_counter(tenant_id, periodo, monto)
+        record = UsageRecord(
+            tenant_id=tenant_id,
+            plan_id=context.plan.plan_id,
+            invoice_id=invoice_id,
+            ecf_type=ecf_type,
+            track_id=track_id,
+            monto_cargado=monto,
+            fecha=context.now,
+        )
+        return await self.usage.add(record)
+
+    async def record_usage_for_rnc(self, *, rnc: str, ecf_type: str, track_id: str | None = None) -> UsageRecord:
+        return await self.record_usage(rnc=rnc, ecf_type=ecf_type, track_id=track_id)
+
+
+def get_async_billing_service(db: AsyncSession = Depends(get_async_db)) -> AsyncBillingService:
+    return AsyncBillingService(db)
@@ -0,0 +1,94 @@
+"""Plantillas XML precompiladas de los generadores de comprobantes.
+
+Cada documento se define una sola vez con marcadores ``{campo}`` y se compila
+al importar el módulo en dos motores con la misma salida:
+
+* ``format``: ``str.format_map`` con cada valor escapado por ``markupsafe``
+  (implementado en C); es la ruta rápida por defecto.
+* ``jinja``: la misma plantilla como ``jinja2.Template`` con ``autoescape``.
+
+En ambos casos todo valor se escapa; ``tools/bench_billing_templates.py``
+compara los motores (y lxml) para elegir el más rápido por tipo de documento.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Literal, Mapping
+
+from jinja2 import Environment, StrictUndefined, Template
+from markupsafe import escape
+
+from app.core.config import settings
+
+Engine = Literal["format", "jinja"]
+
+_XML_DECLARATION = "<?xml version='1.0' encoding='UTF-8'?>"
+_FIELD = re.compile(r"\{(\w+)\}")
+
+_SOURCES: Dict[str, str] = {
+    "ecf": (
+        _XML_DECLARATION
+        + "\n<Factura>\n  <Encabezado>\n    <RNCEmisor>{rnc_emisor}</RNCEmisor>\n"
+        "    <RNCComprador>{rnc_comprador}</RNCComprador>\n"
+        "    <RazonSocialComprador>{razon_social_comprador}</RazonSocialComprador>\n    <ENCF>{encf}</ENCF>\n"
+        "    <FechaEmision>{fecha_emision}</FechaEmision>\n  </Encabezado>\n  <Totales>\n"
+        "    <Total>{total}</Total>\n  </Totales>\n</Factura>"
+    ),
+    "rfce": (
+        _XML_DECLARATION
+        + "<Resumen><RNCEmisor>{rnc_emisor}</RNCEmisor><ENCF>{encf}</ENCF>"
+        "<Total>{total}</Total><Fecha>{fecha}</Fecha></Resumen>"
+    ),
+    "anecf": (
+        _XML_DECLARATION
+        + "<ANECF><TipoECF>{tipo_ecf}</TipoECF><RNCEmisor>{rnc_emisor}</RNCEmisor>"
+        "<Desde>{desde}</Desde><Hasta>{hasta}</Hasta><Cantidad>{cantidad}</Cantidad>"
+        "<Fecha>{fecha}</Fecha></ANECF>"
+    ),
+    "acecf": (
+        _XML_DECLARATION
+        + "<ACECF><ENCF>{encf}</ENCF><RNCEmisor>{rnc_emisor}</RNCEmisor>"
+        "<RNCComprador>{rnc_comprador}</RNCComprador>"
+        "<RazonSocialComprador>{razon_social_comprador}</RazonSocialComprador><Estado>{estado}</Estado>"
+        "<DetalleMotivo>{detalle_motivo}</DetalleMotivo><Fecha>{fecha}</Fecha></ACECF>"
+    ),
+    "arecf": (
+        _XML_DECLARATION
+        + "<ARECF><ENCF>{encf}</ENCF><RNCEmisor>{rnc_emisor}</RNCEmisor>"
+        "<RNCComprador>{rnc_comprador}</RNCComprador>"
+        "<RazonSocialComprador>{razon_social_comprador}</RazonSocialComprador><Estado>{estado}</Estado>"
+        "<CodigoMotivo>{motivo_codigo}</CodigoMotivo><Fecha>{fecha}</Fecha></ARECF>"
+    ),
+}
+
+_env = Environment(autoescape=True, undefined=StrictUndefined, keep_trailing_newline=True)
+
+
+@dataclass(frozen=True)
+class BillingTemplate:
+    name: str
+    source: str
+    fields: frozenset[str] = field(init=False)
+    jinja: Template = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "fields", frozenset(_FIELD.findall(self.source)))
+        object.__setattr__(self, "jinja", _env.from_string(_FIELD.sub(r"{{ \1 }}", self.source)))
+
+    def render(self, context: Mapping[str, Any], engine: Engine = "format") -> str:
+        missing = self.fields - context.keys()
+        if missing:
+            raise ValueError(f"Faltan campos para {self.name}: {', '.join(sorted(missing))}")
+        if engine == "jinja":
+            return self.jinja.render(context)
+        return self.source.format_map({name: escape(context[name]) for name in self.fields})
+
+
+TEMPLATES: Dict[str, BillingTemplate] = {name: BillingTemplate(name, source) for name, source in _SOURCES.items()}
+
+
+def render_document(name: str, engine: Engine | None = None, **context: Any) -> str:
+    """Renderiza la plantilla ``name``; el motor por defecto sale de la configuración."""
+
+    return TEMPLATES[name].render(context, engine or settings.billing_template_engine)
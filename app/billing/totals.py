@@ -0,0 +1,204 @@
+"""Cálculo de totales e ITBIS de e-CF con aritmética de enteros escalados.
+
+Cada importe se convierte una sola vez a un entero con su exponente decimal y
+las operaciones se hacen en enteros de Python (precisión arbitraria, sin
+desbordamiento). El redondeo a centavos replica ``Decimal.quantize`` con
+``ROUND_HALF_EVEN`` (el contexto por defecto que usa ``decimal_to_str``), de
+modo que el resultado es idéntico al cálculo con ``Decimal``; el modo
+verificación ejecuta ambos y exige que coincidan.
+
+Reglas por línea: ``bruto = cantidad × precio``, ``neto = bruto − descuento``,
+``itbis = neto × tasa / 100``; cada valor se redondea a centavos.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Iterable, List, Sequence, Tuple
+
+from app.core.config import settings
+
+CENTAVO = Decimal("0.01")
+ITBIS_GENERAL = Decimal("18")
+
+_Scaled = Tuple[int, int]  # (coeficiente entero, exponente base 10)
+
+
+class TotalesDivergentesError(ValueError):
+    """El cálculo con enteros y el de referencia con ``Decimal`` no coinciden."""
+
+
+@dataclass(frozen=True, slots=True)
+class LineaTotal:
+    """Importes de una línea, en centavos."""
+
+    bruto: int
+    descuento: int
+    neto: int
+    itbis: int
+
+    @property
+    def total(self) -> int:
+        return self.neto + self.itbis
+
+
+@dataclass(slots=True)
+class DocumentoTotales:
+    """Totales de un comprobante, en centavos."""
+
+    lineas: List[LineaTotal] = field(default_factory=list)
+    monto_gravado: int = 0
+    monto_exento: int = 0
+    total_descuento: int = 0
+    total_itbis: int = 0
+
+    @property
+    def monto_total(self) -> int:
+        return self.monto_gravado + self.monto_exento + self.total_itbis
+
+    def as_decimals(self) -> dict[str, Decimal]:
+        return {
+            "monto_gravado": centavos_a_decimal(self.monto_gravado),
+            "monto_exento": centavos_a_decimal(self.monto_exento),
+            "total_descuento": centavos_a_decimal(self.total_descuento),
+            "total_itbis": centavos_a_decimal(self.total_itbis),
+            "monto_total": centavos_a_decimal(self.monto_total),
+        }
+
+
+def _escalar(value: Decimal | int | float | str) -> _Scaled:
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    sign, digits, exponent = value.as_tuple()
+    if not isinstance(exponent, int):
+        raise ValueError(f"Importe inválido: {value}")
+    coefficient = int("".join(map(str, digits)) or "0")
+    if sign:
+        coefficient = -coefficient
+    if exponent > 0:
+        return coefficient * 10**exponent, 0
+    return coefficient, exponent
+
+
+def _redondear(coefficient: int, exponent: int) -> int:
+    """Centavos de ``coefficient × 10**exponent`` con redondeo bancario."""
+
+    shift = -2 - exponent
+    if shift <= 0:
+        return coefficient * 10 ** (-shift)
+    divisor = 10**shift
+    quotient, remainder = divmod(coefficient, divisor)
+    twice = remainder * 2
+    if twice > divisor or (twice == divisor and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def centavos_a_decimal(cents: int) -> Decimal:
+    return Decimal(cents).scaleb(-2)
+
+
+def formatear_centavos(cents: int) -> str:
+    """Mismo texto que ``decimal_to_str`` para un importe ya redondeado."""
+
+    sign = "-" if cents < 0 else ""
+    units, rest = divmod(abs(cents), 100)
+    return f"{sign}{units}.{rest:02d}"
+
+
+def _campos(item: Any) -> Tuple[Any, Any, Any, Any]:
+    if isinstance(item, dict):
+        get = item.get
+    else:
+        def get(name: str, default: Any = None) -> Any:
+            return getattr(item, name, default)
+
+    return (
+        get("cantidad"),
+        get("precio_unitario"),
+        get("descuento") or 0,
+        get("tasa_itbis", None),
+    )
+
+
+def _linea(item: Any, tasa_default: _Scaled) -> Tuple[LineaTotal, bool]:
+    cantidad, precio, descuento, tasa = _campos(item)
+    q, q_exp = _escalar(cantidad)
+    p, p_exp = _escalar(precio)
+    bruto = _redondear(q * p, q_exp + p_exp)
+    rebaja = _redondear(*_escalar(descuento))
+    if rebaja < 0 or rebaja > bruto:
+        raise ValueError("El descuento debe estar entre cero y el monto de la línea")
+    neto = bruto - rebaja
+    t, t_exp = tasa_default if tasa is None else _escalar(tasa)
+    # neto (centavos, exp -2) × tasa/100 (exp t_exp - 2) → exp t_exp - 4
+    itbis = _redondear(neto * t, t_exp - 4) if t else 0
+    return LineaTotal(bruto=bruto, descuento=rebaja, neto=neto, itbis=itbis), bool(t)
+
+
+def calcular_totales(
+    items: Iterable[Any],
+    *,
+    tasa_itbis: Decimal = ITBIS_GENERAL,
+    verificar: bool | None = None,
+) -> DocumentoTotales:
+    """Totales de un comprobante en una sola pasada sobre sus líneas.
+
+    Cada línea aporta ``cantidad`` y ``precio_unitario`` y, opcionalmente,
+    ``descuento`` (importe) y ``tasa_itbis`` (porcentaje; ``0`` = exento).
+    """
+
+    items = items if isinstance(items, Sequence) else list(items)
+    tasa_default = _escalar(tasa_itbis)
+    totales = DocumentoTotales()
+    for item in items:
+        linea, gravada = _linea(item, tasa_default)
+        totales.lineas.append(linea)
+        totales.total_descuento += linea.descuento
+        totales.total_itbis += linea.itbis
+        if gravada:
+            totales.monto_gravado += linea.neto
+        else:
+            totales.monto_exento += linea.neto
+
+    if settings.ecf_totals_verify if verificar is None else verificar:
+        referencia = calcular_totales_decimal(items, tasa_itbis=tasa_itbis)
+        if referencia != totales:
+            raise TotalesDivergentesError("Los totales con enteros y con Decimal no coinciden")
+    return totales
+
+
+def calcular_lote(
+    documentos: Iterable[Iterable[Any]],
+    *,
+    tasa_itbis: Decimal = ITBIS_GENERAL,
+    verificar: bool | None = None,
+) -> List[DocumentoTotales]:
+    """Totales de un lote de comprobantes (una lista de líneas por comprobante)."""
+
+    return [calcular_totales(items, tasa_itbis=tasa_itbis, verificar=verificar) for items in documentos]
+
+
+def calcular_totales_decimal(items: Iterable[Any], *, tasa_itbis: Decimal = ITBIS_GENERAL) -> DocumentoTotales:
+    """Implementación de referencia con ``Decimal``; usada por el modo verificación."""
+
+    def cents(value: Decimal) -> int:
+        return int(value.quantize(CENTAVO).scaleb(2))
+
+    totales = DocumentoTotales()
+    for item in items:
+        cantidad, precio, descuento, tasa = _campos(item)
+        bruto = Decimal(str(cantidad)) * Decimal(str(precio))
+        rebaja = Decimal(str(descuento)).quantize(CENTAVO)
+        neto = bruto.quantize(CENTAVO) - rebaja
+        tasa_linea = Decimal(str(tasa_itbis if tasa is None else tasa))
+        itbis = (neto * tasa_linea / 100).quantize(CENTAVO) if tasa_linea else Decimal(0)
+        linea = LineaTotal(bruto=cents(bruto), descuento=cents(rebaja), neto=cents(neto), itbis=cents(itbis))
+        totales.lineas.append(linea)
+        totales.total_descuento += linea.descuento
+        totales.total_itbis += linea.itbis
+        if tasa_linea:
+            totales.monto_gravado += linea.neto
+        else:
+            totales.monto_exento += linea.neto
+    return totales
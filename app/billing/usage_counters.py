@@ -0,0 +1,244 @@
+"""Contadores mensuales de consumo por tenant y caché de tenant+plan.
+
+Cada ``UsageRecord`` incrementa, en la misma transacción, la fila
+``billing_usage_counters`` del tenant y el mes con un ``INSERT ... ON CONFLICT
+DO UPDATE ... RETURNING``: el cargo se calcula con el valor devuelto en lugar
+de contar los registros del mes. La fila queda bloqueada hasta el commit, por
+lo que envíos simultáneos del mismo tenant ven números consecutivos.
+
+La reconciliación compara los contadores con los registros crudos y corrige
+las diferencias; se ejecuta periódicamente desde cron::
+
+    python -m app.billing.usage_counters reconciliar --mes 2024-05
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import bind_request_context
+from app.models.billing import UsageCounter, UsageRecord
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+@dataclass(frozen=True, slots=True)
+class TenantPlan:
+    """Datos de tarifa de un tenant, desacoplados de la sesión que los cargó."""
+
+    tenant_id: int
+    rnc: str
+    plan_id: Optional[int]
+    documentos_incluidos: int
+    precio_por_documento: Decimal
+
+    @classmethod
+    def from_tenant(cls, tenant: Any) -> "TenantPlan":
+        plan = tenant.plan
+        return cls(
+            tenant_id=tenant.id,
+            rnc=tenant.rnc,
+            plan_id=plan.id if plan else None,
+            documentos_incluidos=(plan.documentos_incluidos or 0) if plan else 0,
+            precio_por_documento=Decimal(str(plan.precio_por_documento or 0)) if plan else Decimal("0"),
+        )
+
+
+class TenantPlanCache:
+    """Caché en proceso de :class:`TenantPlan` por id y por RNC, con vigencia fija.
+
+    Es local a cada worker: invalidar solo limpia el proceso que atendió el
+    cambio, y los demás siguen usando el plan anterior hasta que venza ``ttl``.
+    """
+
+    def __init__(self, ttl_seconds: float | None = None) -> None:
+        self._ttl = ttl_seconds
+        self._entries: Dict[Tuple[str, Any], Tuple[float, TenantPlan]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self) -> float:
+        return settings.billing_tenant_cache_ttl_seconds if self._ttl is None else self._ttl
+
+    def get(self, tenant_id: int | None = None, *, rnc: str | None = None) -> TenantPlan | None:
+        key = ("id", tenant_id) if tenant_id is not None else ("rnc", rnc)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def put(self, value: TenantPlan) -> TenantPlan:
+        if self.ttl <= 0:
+            return value
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[("id", value.tenant_id)] = (expires, value)
+            self._entries[("rnc", value.rnc)] = (expires, value)
+        return value
+
+    def invalidate(self, tenant_id: int | None = None) -> None:
+        """Descarta un tenant, o todo el caché si no se indica (p. ej. al editar un plan)."""
+
+        with self._lock:
+            if tenant_id is None:
+                self._entries.clear()
+                return
+            entry = self._entries.pop(("id", tenant_id), None)
+            if entry is not None:
+                self._entries.pop(("rnc", entry[1].rnc), None)
+
+    def invalidate_on_commit(self, session: Session, tenant_id: int | None = None) -> None:
+        """Como :meth:`invalidate`, pero al confirmar ``session``.
+
+        Invalidar antes del commit deja una ventana en la que otra petición
+        vuelve a cachear el plan anterior, aún visible en la base.
+        """
+
+        event.listen(session, "after_commit", lambda _session: self.invalidate(tenant_id), once=True)
+
+
+tenant_plan_cache = TenantPlanCache()
+
+
+def periodo_de(fecha: datetime | date) -> date:
+    return date(fecha.year, fecha.month, 1)
+
+
+def _siguiente_periodo(periodo: date) -> date:
+    return date(periodo.year + 1, 1, 1) if periodo.month == 12 else date(periodo.year, periodo.month + 1, 1)
+
+
+def increment_stmt(dialect: str, tenant_id: int, periodo: date) -> Any:
+    """Suma un documento al contador del mes y devuelve el total resultante."""
+
+    try:
+        insert = _INSERTS[dialect]
+    except KeyError as exc:
+        raise RuntimeError(f"Contadores de uso no soportados en {dialect}") from exc
+    now = datetime.utcnow()
+    stmt = insert(UsageCounter).values(
+        tenant_id=tenant_id,
+        periodo=periodo,
+        documentos=1,
+        monto_cargado=Decimal("0"),
+        created_at=now,
+        updated_at=now,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[UsageCounter.tenant_id, UsageCounter.periodo],
+        set_={"documentos": UsageCounter.documentos + 1, "updated_at": now},
+    ).returning(UsageCounter.documentos)
+
+
+def add_monto_stmt(tenant_id: int, periodo: date, monto: Decimal) -> Any:
+    return (
+        update(UsageCounter)
+        .where(UsageCounter.tenant_id == tenant_id, UsageCounter.periodo == periodo)
+        .values(monto_cargado=UsageCounter.monto_cargado + monto)
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class CounterDrift:
+    tenant_id: int
+    periodo: date
+    documentos_contador: int
+    documentos_reales: int
+    monto_contador: Decimal
+    monto_real: Decimal
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "tenant_id": self.tenant_id,
+            "periodo": self.periodo.isoformat(),
+            "documentos_contador": self.documentos_contador,
+            "documentos_reales": self.documentos_reales,
+            "monto_contador": str(self.monto_contador),
+            "monto_real": str(self.monto_real),
+        }
+
+
+def reconcile_usage_counters(session: Session, periodo: date | None = None, *, fix: bool = True) -> List[CounterDrift]:
+    """Contrasta los contadores de ``periodo`` (mes actual por defecto) con ``UsageRecord``.
+
+    Los contadores se bloquean antes de agregar los registros, de modo que los
+    envíos en curso terminan (o esperan) y no aparecen como diferencias.
+    """
+
+    periodo = periodo_de(periodo or datetime.utcnow())
+    siguiente = _siguiente_periodo(periodo)
+    start, end = datetime(periodo.year, periodo.month, 1), datetime(siguiente.year, siguiente.month, 1)
+    counters = {
+        counter.tenant_id: counter
+        for counter in session.scalars(
+            select(UsageCounter).where(UsageCounter.periodo == periodo).with_for_update()
+        )
+    }
+    actual = {
+        tenant_id: (int(documentos), Decimal(str(monto or 0)))
+        for tenant_id, documentos, monto in session.execute(
+            select(UsageRecord.tenant_id, func.count(UsageRecord.id), func.sum(UsageRecord.monto_cargado))
+            .where(UsageRecord.fecha >= start, UsageRecord.fecha < end)
+            .group_by(UsageRecord.tenant_id)
+        )
+    }
+
+    drifts: List[CounterDrift] = []
+    for tenant_id in sorted(counters.keys() | actual.keys()):
+        counter = counters.get(tenant_id)
+        documentos, monto = actual.get(tenant_id, (0, Decimal("0")))
+        registrados = (counter.documentos, Decimal(str(counter.monto_cargado))) if counter else (0, Decimal("0"))
+        if registrados == (documentos, monto):
+            continue
+        drifts.append(CounterDrift(tenant_id, periodo, registrados[0], documentos, registrados[1], monto))
+        if not fix:
+            continue
+        if counter is None:
+            counter = UsageCounter(tenant_id=tenant_id, periodo=periodo)
+            session.add(counter)
+        counter.documentos = documentos
+        counter.monto_cargado = monto
+
+    if drifts:
+        logger = bind_request_context(periodo=periodo.isoformat())
+        logger.warning("Contadores de uso desalineados", tenants=[drift.tenant_id for drift in drifts], corregidos=fix)
+    session.flush()
+    return drifts
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Reconciliación de contadores de uso")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    reconciliar = sub.add_parser("reconciliar", help="Compara los contadores con los registros de uso")
+    reconciliar.add_argument("--mes", default=None, help="Periodo YYYY-MM (por defecto el actual)")
+    reconciliar.add_argument("--solo-verificar", action="store_true", help="Informa sin corregir")
+    args = parser.parse_args(argv)
+
+    from app.db import SyncSessionFactory
+
+    periodo = datetime.strptime(args.mes, "%Y-%m").date() if args.mes else None
+    with SyncSessionFactory() as session:
+        drifts = reconcile_usage_counters(session, periodo, fix=not args.solo_verificar)
+        session.commit()
+    for drift in drifts:
+        print(drift.as_dict())
+    if drifts and args.solo_verificar:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
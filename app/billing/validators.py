@@ -3,6 +3,9 @@ from __future__ import annotations
 
 import re
 
+from app.billing.rnc_registry import Contribuyente, RNCRegistry, rnc_registry
+from app.core.config import settings
+
 RNC_REGEX = re.compile(r"^\d{9,11}$")
 ENCF_REGEX = re.compile(r"^[A-Z]{1}\d{12}$")
 
@@ -12,6 +15,31 @@ def validate_rnc(value: str) -> None:
         raise ValueError("RNC inválido")
 
 
+def validate_rnc_comprador(value: str, *, registry: RNCRegistry | None = None) -> Contribuyente | None:
+    """Valida el formato y, si hay padrón local importado, que el RNC exista en él.
+
+    Devuelve el contribuyente del padrón (``None`` si no hay padrón o no figura).
+    """
+
+    validate_rnc(value)
+    registry = registry or rnc_registry
+    if not registry.available:
+        return None
+    contribuyente = registry.lookup(value)
+    if contribuyente is None and settings.rnc_registry_enforce:
+        raise ValueError("RNC comprador no registrado en la DGII")
+    return contribuyente
+
+
+def resolve_razon_social_comprador(value: str, razon_social: str | None = None) -> str:
+    """Valida el RNC comprador y completa su razón social desde el padrón si el payload no la trae."""
+
+    contribuyente = validate_rnc_comprador(value)
+    if razon_social:
+        return razon_social
+    return contribuyente.razon_social if contribuyente else ""
+
+
 def validate_encf(value: str) -> None:
     if not ENCF_REGEX.match(value):
         raise ValueError("ENCF inválido")
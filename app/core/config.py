@@ -4,7 +4,7 @@ from __future__ import annotations
 from enum import Enum
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import AnyUrl, Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -46,6 +46,10 @@ class Settings(BaseSettings):
     sentry_dsn: Optional[str] = Field(None, env="SENTRY_DSN", description="DSN de Sentry opcional")
     storage_bucket: str = Field("local", description="Bucket/espacio para almacenamiento WORM")
     storage_base_path: Path = Field(Path("/var/getupnet/storage"), description="Ruta por defecto para almacenamiento local")
+    storage_backend: Literal["local", "s3"] = Field("local", alias="STORAGE_BACKEND", description="Backend del archivo de XML direccionado por contenido")
+    storage_fsync: Literal["always", "file", "none"] = Field("always", alias="STORAGE_FSYNC", description="always: archivo y directorio; file: solo archivo; none: sin fsync")
+    storage_s3_endpoint_url: Optional[str] = Field(None, alias="STORAGE_S3_ENDPOINT_URL", description="Endpoint S3 compatible (MinIO, Ceph); vacío para AWS")
+    storage_s3_prefix: str = Field("xml", alias="STORAGE_S3_PREFIX", description="Prefijo de las llaves en el bucket")
 
     # DGII specific configuration
     env: DGIIEnvironment = Field(DGIIEnvironment.PRECERT, alias="ENV", description="Ambiente DGII activo")
@@ -70,10 +74,51 @@ class Settings(BaseSettings):
     dgii_cert_p12_password: str = Field("changeit", alias="DGII_CERT_P12_PASSWORD")
     dgii_http_timeout_seconds: int = Field(30, alias="DGII_HTTP_TIMEOUT_SECONDS", ge=5, le=120)
     dgii_http_retries: int = Field(3, alias="DGII_HTTP_RETRIES", ge=0, le=5)
+    dgii_http_max_connections: int = Field(100, alias="DGII_HTTP_MAX_CONNECTIONS", ge=1, description="Conexiones máximas del pool HTTP compartido")
+    dgii_http_max_keepalive: int = Field(20, alias="DGII_HTTP_MAX_KEEPALIVE", ge=0, description="Conexiones ociosas retenidas en el pool")
+    dgii_http_keepalive_seconds: float = Field(30.0, alias="DGII_HTTP_KEEPALIVE_SECONDS", gt=0)
+    dgii_http2_enabled: bool = Field(True, alias="DGII_HTTP2_ENABLED", description="Usa HTTP/2 cuando h2 está instalado")
     ri_qr_base_url: AnyUrl = Field("https://ri.mock/qr", alias="RI_QR_BASE_URL")
 
+    # Firma XML fuera del event loop
+    signing_pool_mode: str = Field("process", alias="SIGNING_POOL_MODE", description="process, thread o inline")
+    signing_pool_workers: int = Field(2, alias="SIGNING_POOL_WORKERS", ge=1, le=64)
+    signing_pool_max_pending: int = Field(64, alias="SIGNING_POOL_MAX_PENDING", ge=1)
+
+    # Envío de e-CF por lotes
+    dgii_batch_max_items: int = Field(50_000, alias="DGII_BATCH_MAX_ITEMS", ge=1)
+    dgii_batch_prepare_concurrency: int = Field(4, alias="DGII_BATCH_PREPARE_CONCURRENCY", ge=1, le=64)
+    dgii_batch_send_concurrency: int = Field(16, alias="DGII_BATCH_SEND_CONCURRENCY", ge=1, le=256)
+
+    # e-CF con muchas líneas se serializan en streaming (etree.xmlfile)
+    ecf_streaming_min_items: int = Field(500, alias="ECF_STREAMING_MIN_ITEMS", ge=1, description="Ítems a partir de los cuales el XML se genera en streaming")
+
+    ecf_totals_verify: bool = Field(False, alias="ECF_TOTALS_VERIFY", description="Contrasta los totales con enteros contra el cálculo con Decimal")
+
+    billing_template_engine: Literal["format", "jinja"] = Field("format", alias="BILLING_TEMPLATE_ENGINE", description="Motor de plantillas XML de facturación")
+    billing_tenant_cache_ttl_seconds: float = Field(300.0, alias="BILLING_TENANT_CACHE_TTL_SECONDS", ge=0, description="Vigencia del tenant+plan en caché por RNC (0 desactiva). La caché es por worker: tras editar un plan, los demás workers pueden cobrar con el anterior durante este plazo")
+
+    # Resúmenes RFCE de facturas de consumo (tipo 32)
+    rfce_monto_limite: float = Field(250_000, alias="RFCE_MONTO_LIMITE", gt=0, description="Monto (DOP) bajo el cual la factura de consumo va en el RFCE")
+    rfce_stream_batch_size: int = Field(5_000, alias="RFCE_STREAM_BATCH_SIZE", ge=100, description="Filas por lote al leer facturas en streaming")
+
+    # Padrón local de RNC (DGII_RNC.TXT importado a SQLite)
+    rnc_registry_path: Optional[Path] = Field(None, alias="RNC_REGISTRY_PATH", description="Índice SQLite del padrón de RNC")
+    rnc_registry_enforce: bool = Field(True, alias="RNC_REGISTRY_ENFORCE", description="Rechaza RNC comprador ausente del padrón")
+
+    # Portal administrativo
+    admin_ledger_count_ttl_seconds: float = Field(60.0, alias="ADMIN_LEDGER_COUNT_TTL_SECONDS", ge=0, description="Vigencia del total de asientos con conteo=cache")
+    export_batch_size: int = Field(5_000, alias="EXPORT_BATCH_SIZE", ge=100, description="Filas por lote en las exportaciones en streaming")
+
     # Feature flags / background jobs
     jobs_enabled: bool = Field(True, description="Permite ejecutar tareas internas para reintentos")
+    jobs_backend: str = Field("memory", alias="JOBS_BACKEND", description="memory o redis")
+    jobs_concurrency: int = Field(4, alias="JOBS_CONCURRENCY", ge=1, le=64, description="Consumidores de consultas de estado")
+    jobs_visibility_timeout_seconds: float = Field(60.0, alias="JOBS_VISIBILITY_TIMEOUT_SECONDS", gt=0)
+    jobs_poll_interval_seconds: float = Field(1.0, alias="JOBS_POLL_INTERVAL_SECONDS", gt=0)
+    jobs_backoff_base_seconds: float = Field(5.0, alias="JOBS_BACKOFF_BASE_SECONDS", gt=0)
+    jobs_backoff_max_seconds: float = Field(600.0, alias="JOBS_BACKOFF_MAX_SECONDS", gt=0)
+    jobs_max_attempts: int = Field(20, alias="JOBS_MAX_ATTEMPTS", ge=1)
 
     @field_validator("cors_allow_origins", mode="before")
     @classmethod
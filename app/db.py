@@ -4,7 +4,7 @@ from __future__ import annotations
 from contextlib import asynccontextmanager, contextmanager
 from typing import AsyncIterator, Iterator
 
-from sqlalchemy import text
+from sqlalchemy import Engine, create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
@@ -22,8 +22,44 @@ else:
 
 engine: AsyncEngine = create_async_engine(ASYNC_DATABASE_URL, **engine_options)
 
-AsyncSessionFactory = async_sessionmaker(bind=engine, expire_on_commit=False)
-SyncSessionFactory = sessionmaker(bind=engine.sync_engine, autoflush=False, expire_on_commit=False, class_=Session)
+# The async engine's ``sync_engine`` cannot run blocking I/O outside a greenlet,
+# so admin reports get their own small blocking pool.
+sync_engine_options: dict[str, object] = {"pool_pre_ping": True}
+if settings.sqlalchemy_sync_url.startswith("sqlite"):
+    sync_engine_options["connect_args"] = {"check_same_thread": False}
+else:
+    sync_engine_options.update({"pool_size": 5, "max_overflow": 5, "pool_timeout": 30})
+
+sync_engine: Engine = create_engine(settings.sqlalchemy_sync_url, **sync_engine_options)
+
+
+class AppSession(Session):
+    """Session class of the application factories.
+
+    Its sessions (sync, and the sync core of ``AsyncSession``) keep the monthly
+    invoice rollups up to date on flush and drop closed billing periods whose
+    usage records were corrected. Plain ``Session`` objects are unaffected.
+    """
+
+
+def _install_listeners(session_class: type[Session]) -> None:
+    """Register the admin bookkeeping listeners on ``session_class``.
+
+    The admin modules are imported here, while the factories are built, so
+    importing the core database module does not pull in ``app.portal_admin``.
+    """
+
+    from app.portal_admin.reports import install_billing_snapshot_invalidation
+    from app.portal_admin.rollups import install_invoice_rollups
+
+    install_invoice_rollups(session_class)
+    install_billing_snapshot_invalidation(session_class)
+
+
+_install_listeners(AppSession)
+
+AsyncSessionFactory = async_sessionmaker(bind=engine, expire_on_commit=False, sync_session_class=AppSession)
+SyncSessionFactory = sessionmaker(bind=sync_engine, autoflush=False, expire_on_commit=False, class_=AppSession)
 
 
 @asynccontextmanager
@@ -0,0 +1,315 @@
+"""Staged pipeline for bulk e-CF submissions (build → validate → sign → send)."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from pydantic import ValidationError
+
+from app.core.logging import bind_request_context
+from app.dgii.schemas import ECFSubmission
+from app.services.idempotency import IdempotencyInFlightError, IdempotencyStore
+
+PrepareFn = Callable[[ECFSubmission], Awaitable[bytes]]
+SendFn = Callable[[ECFSubmission, bytes, str], Awaitable[Dict[str, Any]]]
+
+_STOP = object()
+
+
+@dataclass(slots=True)
+class BatchItemError:
+    """Item del lote que no pudo interpretarse como ECFSubmission."""
+
+    index: int
+    error: str
+
+
+@dataclass(slots=True)
+class BatchItem:
+    """Documento del lote junto a su posición en la entrada."""
+
+    index: int
+    submission: ECFSubmission
+
+
+BatchInput = BatchItem | BatchItemError
+
+
+@dataclass(slots=True)
+class BatchItemResult:
+    """Resultado individual de un documento dentro del lote."""
+
+    index: int
+    encf: str | None
+    ok: bool
+    track_id: str | None = None
+    estado: str | None = None
+    error: str | None = None
+    replay: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"index": self.index, "encf": self.encf, "ok": self.ok}
+        if self.ok:
+            payload.update(track_id=self.track_id, estado=self.estado, replay=self.replay)
+        else:
+            payload["error"] = self.error
+        return payload
+
+
+@dataclass(slots=True)
+class BatchSummary:
+    total: int = 0
+    enviados: int = 0
+    errores: int = 0
+    replays: int = 0
+
+    def add(self, result: BatchItemResult) -> None:
+        self.total += 1
+        if not result.ok:
+            self.errores += 1
+        elif result.replay:
+            self.replays += 1
+        else:
+            self.enviados += 1
+
+
+@dataclass(slots=True)
+class _WorkItem:
+    index: int
+    submission: ECFSubmission
+    idempotency_key: str
+    payload_hash: str
+    signed_xml: bytes = field(default=b"")
+    lock_token: Optional[str] = None
+
+
+def item_idempotency(submission: ECFSubmission) -> tuple[str, str]:
+    """Return the idempotency key and payload hash for a batch item."""
+
+    key = f"ecf-lote:{submission.rnc_emisor}:{submission.encf}"
+    payload = submission.model_dump_json(by_alias=True).encode("utf-8")
+    return key, hashlib.sha256(payload).hexdigest()
+
+
+async def parse_ndjson(lines: AsyncIterator[bytes], *, max_items: int) -> AsyncIterator[BatchInput]:
+    """Parse an NDJSON byte stream incrementally into submissions."""
+
+    buffer = b""
+    index = 0
+    async for chunk in lines:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            if not line.strip():
+                continue
+            if index >= max_items:
+                yield BatchItemError(index=index, error=f"El lote excede el máximo de {max_items} documentos")
+                return
+            yield _parse_item(index, line)
+            index += 1
+    if buffer.strip():
+        if index >= max_items:
+            yield BatchItemError(index=index, error=f"El lote excede el máximo de {max_items} documentos")
+            return
+        yield _parse_item(index, buffer)
+
+
+def parse_json_array(body: bytes, *, max_items: int) -> AsyncIterator[BatchInput]:
+    """Validate a JSON array body eagerly and iterate its submissions."""
+
+    try:
+        items = json.loads(body)
+    except ValueError as exc:
+        raise ValueError("El cuerpo no es un JSON válido") from exc
+    if not isinstance(items, list):
+        raise ValueError("Se esperaba un arreglo JSON de documentos")
+    if len(items) > max_items:
+        raise ValueError(f"El lote excede el máximo de {max_items} documentos")
+    return _iter_json_items(items)
+
+
+async def _iter_json_items(items: list[Any]) -> AsyncIterator[BatchInput]:
+    for index, raw in enumerate(items):
+        try:
+            yield BatchItem(index=index, submission=ECFSubmission.model_validate(raw))
+        except ValidationError as exc:
+            yield BatchItemError(index=index, error=_format_validation_error(exc))
+
+
+def _parse_item(index: int, line: bytes) -> BatchInput:
+    try:
+        return BatchItem(index=index, submission=ECFSubmission.model_validate_json(line))
+    except ValidationError as exc:
+        return BatchItemError(index=index, error=_format_validation_error(exc))
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    first = exc.errors()[0]
+    location = ".".join(str(part) for part in first.get("loc", ()))
+    return f"{location}: {first.get('msg')}" if location else str(first.get("msg"))
+
+
+class BatchPipeline:
+    """Run submissions through bounded prepare and send stages.
+
+    ``prepare`` receives the submission and returns signed XML (it is expected
+    to offload CPU work to the signing pool); ``send`` delivers it to DGII.
+    Queues between stages are bounded so a slow DGII naturally throttles how
+    fast the request body is consumed. Results are yielded as they complete.
+    """
+
+    def __init__(
+        self,
+        *,
+        prepare: PrepareFn,
+        send: SendFn,
+        prepare_concurrency: int = 4,
+        send_concurrency: int = 16,
+        idempotency: Optional[IdempotencyStore] = None,
+    ) -> None:
+        self._prepare = prepare
+        self._send = send
+        self._prepare_concurrency = max(1, prepare_concurrency)
+        self._send_concurrency = max(1, send_concurrency)
+        self._idempotency = idempotency
+        self.summary = BatchSummary()
+
+    async def run(self, items: AsyncIterator[BatchInput]) -> AsyncIterator[BatchItemResult]:
+        prepare_queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=self._prepare_concurrency * 2)
+        send_queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=self._send_concurrency * 2)
+        results: asyncio.Queue[Any] = asyncio.Queue()
+        logger = bind_request_context(pipeline="ecf_lote")
+
+        async def produce() -> None:
+            async for item in items:
+                if isinstance(item, BatchItemError):
+                    await results.put(BatchItemResult(index=item.index, encf=None, ok=False, error=item.error))
+                    continue
+                key, payload_hash = item_idempotency(item.submission)
+                await prepare_queue.put(_WorkItem(item.index, item.submission, key, payload_hash))
+            for _ in range(self._prepare_concurrency):
+                await prepare_queue.put(_STOP)
+
+        async def prepare_worker() -> None:
+            while (work := await prepare_queue.get()) is not _STOP:
+                replay = await self._lookup(work)
+                if replay is not None:
+                    await results.put(replay)
+                    continue
+                try:
+                    work.signed_xml = await self._prepare(work.submission)
+                except Exception as exc:  # noqa: BLE001 - reported per item
+                    await self._release(work)
+                    await results.put(self._failure(work, exc))
+                    continue
+                await send_queue.put(work)
+
+        async def send_worker() -> None:
+            while (work := await send_queue.get()) is not _STOP:
+                try:
+                    payload = await self._send(work.submission, work.signed_xml, work.idempotency_key)
+                except Exception as exc:  # noqa: BLE001 - reported per item
+                    await self._release(work)
+                    await results.put(self._failure(work, exc))
+                    continue
+                result = BatchItemResult(
+                    index=work.index,
+                    encf=work.submission.encf,
+                    ok=True,
+                    track_id=_first(payload, ("track_id", "trackId", "track")),
+                    estado=_first(payload, ("estado", "status", "respuesta")),
+                )
+                if self._idempotency is not None:
+                    try:
+                        await self._idempotency.set(work.idempotency_key, work.payload_hash, 202, result.to_dict())
+                    finally:
+                        await self._release(work)
+                await results.put(result)
+
+        async def supervise() -> None:
+            prepare_tasks = [asyncio.create_task(prepare_worker()) for _ in range(self._prepare_concurrency)]
+            send_tasks = [asyncio.create_task(send_worker()) for _ in range(self._send_concurrency)]
+            workers = [*prepare_tasks, *send_tasks]
+            try:
+                await produce()
+                await asyncio.gather(*prepare_tasks)
+                for _ in send_tasks:
+                    await send_queue.put(_STOP)
+                await asyncio.gather(*send_tasks)
+            except BaseException as exc:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                if not isinstance(exc, Exception):
+                    raise
+                logger.error("Pipeline de lote interrumpido", error=str(exc))
+                results.put_nowait(exc)
+            finally:
+                results.put_nowait(_STOP)
+
+        supervisor = asyncio.create_task(supervise())
+        try:
+            while (result := await results.get()) is not _STOP:
+                if isinstance(result, Exception):
+                    raise result
+                self.summary.add(result)
+                yield result
+        finally:
+            if not supervisor.done():
+                supervisor.cancel()
+                await asyncio.gather(supervisor, return_exceptions=True)
+            logger.info(
+                "Lote procesado",
+                total=self.summary.total,
+                enviados=self.summary.enviados,
+                errores=self.summary.errores,
+            )
+
+    async def _lookup(self, work: _WorkItem) -> BatchItemResult | None:
+        if self._idempotency is None:
+            return None
+        try:
+            record, work.lock_token = await self._idempotency.begin(work.idempotency_key, work.payload_hash)
+        except IdempotencyInFlightError:
+            return BatchItemResult(
+                index=work.index,
+                encf=work.submission.encf,
+                ok=False,
+                error="e-NCF en proceso en otra solicitud",
+            )
+        except ValueError:
+            return BatchItemResult(
+                index=work.index,
+                encf=work.submission.encf,
+                ok=False,
+                error="e-NCF ya enviado con un contenido distinto",
+            )
+        if record is None:
+            return None
+        body = dict(record.body)
+        return BatchItemResult(
+            index=work.index,
+            encf=work.submission.encf,
+            ok=True,
+            track_id=body.get("track_id"),
+            estado=body.get("estado"),
+            replay=True,
+        )
+
+    async def _release(self, work: _WorkItem) -> None:
+        if self._idempotency is not None and work.lock_token is not None:
+            await self._idempotency.release(work.idempotency_key, work.lock_token)
+
+    @staticmethod
+    def _failure(work: _WorkItem, exc: Exception) -> BatchItemResult:
+        return BatchItemResult(index=work.index, encf=work.submission.encf, ok=False, error=str(exc) or type(exc).__name__)
+
+
+def _first(payload: Dict[str, Any], keys: tuple[str, ...]) -> str | None:
+    for key in keys:
+        if payload.get(key) is not None:
+            return str(payload[key])
+    return None
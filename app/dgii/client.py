@@ -4,55 +4,48 @@ from __future__ import annotations
 import asyncio
 import hashlib
 import uuid
+import weakref
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Awaitable, Callable, Dict, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Tuple
 
 import httpx
 from httpx import AsyncClient, HTTPError, HTTPStatusError
 from lxml import etree
 
 from app.core.logging import bind_request_context
-from app.dgii.exceptions import DGIIAuthError, DGIIReceiptError, DGIIRetryableError
+from app.dgii.directory import DirectoryCache, directory_cache
+from app.dgii.exceptions import DGIIAuthError, DGIINotFoundError, DGIIReceiptError, DGIIRetryableError
+from app.dgii.http_pool import get_http_client
+from app.dgii.resilience import Resilience, endpoint_for, resilience
 from app.dgii.retry import async_retry
-from app.dgii.signing import sign_ecf
+from app.dgii.signing_pool import signing_pool
+from app.dgii.tokens import CachedToken, TokenManager, token_manager
 from app.infra.settings import Settings, settings
+from app.services.idempotency import IdempotencyStore, idempotency_store
 
 
 @dataclass(slots=True)
-class CachedToken:
-    access_token: str
-    expires_at: datetime
+class StatusLookup:
+    """Outcome of one track_id within :meth:`DGIIClient.get_status_many`."""
 
-    @property
-    def is_valid(self) -> bool:
-        return self.expires_at - timedelta(seconds=30) > datetime.now(timezone.utc)
-
-
-class _IdempotencyCache:
-    """Lightweight in-memory cache for DGII submissions."""
+    track_id: str
+    ok: bool
+    payload: Dict[str, Any] | None = None
+    error: str | None = None
 
-    def __init__(self) -> None:
-        self._records: Dict[str, Dict[str, Any]] = {}
-        self._lock = asyncio.Lock()
+    def to_dict(self) -> Dict[str, Any]:
+        if self.ok:
+            return {"track_id": self.track_id, "ok": True, "resultado": self.payload}
+        return {"track_id": self.track_id, "ok": False, "error": self.error}
 
-    async def get(self, key: str, payload_hash: str) -> Optional[Dict[str, Any]]:
-        async with self._lock:
-            record = self._records.get(key)
-            if not record:
-                return None
-            if record["payload_hash"] != payload_hash:
-                raise DGIIReceiptError("Payload distinto para el mismo Idempotency-Key")
-            return record["body"]
 
-    async def set(self, key: str, payload_hash: str, body: Dict[str, Any]) -> None:
-        async with self._lock:
-            self._records[key] = {
-                "payload_hash": payload_hash,
-                "body": body,
-                "stored_at": datetime.now(timezone.utc),
-            }
+# Status polls in flight per event loop, keyed by (token key, track_id), so
+# concurrent lookups of the same track_id share a single DGII call.
+_inflight_status: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], asyncio.Future[Dict[str, Any]]]]" = (
+    weakref.WeakKeyDictionary()
+)
 
 
 class _ConfigAdapter:
@@ -97,6 +90,15 @@ class _ConfigAdapter:
             return str(self.raw.dgii_auth_base_url)
         return str(self.raw.url_for("auth"))
 
+    @property
+    def dgii_status_concurrency(self) -> int:
+        return int(self._get("dgii_status_concurrency", 16))
+
+    @property
+    def dgii_env(self) -> str:
+        env = self._get("dgii_env", None) or self._get("env", "PRECERT")
+        return str(getattr(env, "value", env))
+
     @property
     def dgii_recepcion_base_url(self) -> str:
         if hasattr(self.raw, "dgii_recepcion_base_url"):
@@ -124,21 +126,32 @@ class DGIIClient:
         *,
         config: Settings | None = None,
         client: AsyncClient | None = None,
+        idempotency: IdempotencyStore | None = None,
+        tokens: TokenManager | None = None,
+        tenant: str | None = None,
+        guard: Resilience | None = None,
+        directory: DirectoryCache | None = None,
     ) -> None:
         self.config = config or settings
         self._cfg = _ConfigAdapter(self.config)
-        timeout = httpx.Timeout(self._cfg.dgii_timeout, connect=self._cfg.dgii_conn_timeout)
-        self._client = client or AsyncClient(timeout=timeout)
-        self._own_client = client is None
+        self._timeout = httpx.Timeout(self._cfg.dgii_timeout, connect=self._cfg.dgii_conn_timeout)
+        self._client = client
         self._auth_base = self._cfg.dgii_auth_base_url
         self._recepcion_base = self._cfg.dgii_recepcion_base_url
         self._recepcion_fc_base = self._cfg.dgii_recepcion_fc_base_url
         self._directorio_base = self._cfg.dgii_directorio_base_url
-        self._token: CachedToken | None = None
-        self._token_lock = asyncio.Lock()
-        self._idempotency_cache = _IdempotencyCache()
-        self._failure_count = 0
-        self._breaker_until: datetime | None = None
+        self._tokens = tokens or token_manager
+        self._tenant = tenant
+        self._token_key = TokenManager.key_for(tenant, self._cfg.dgii_env)
+        self._idempotency = idempotency or idempotency_store
+        self._resilience = guard or resilience
+        self._directory = directory or directory_cache
+        self._endpoints = {
+            "auth": self._auth_base,
+            "recepcion": self._recepcion_base,
+            "recepcion_fc": self._recepcion_fc_base,
+            "directorio": self._directorio_base,
+        }
 
     async def __aenter__(self) -> "DGIIClient":
         return self
@@ -146,30 +159,42 @@ class DGIIClient:
     async def __aexit__(self, exc_type, exc, tb) -> None:
         await self.close()
 
+    @property
+    def http(self) -> AsyncClient:
+        """Injected client, or the process-wide pooled one."""
+
+        return self._client if self._client is not None else get_http_client()
+
     async def close(self) -> None:
-        if self._own_client:
-            await self._client.aclose()
+        """The pooled client outlives this wrapper; it is closed on shutdown."""
 
     async def bearer(self, *, force_refresh: bool = False) -> str:
-        """Return a cached DGII token, refreshing when necessary."""
-
-        async with self._token_lock:
-            if not force_refresh and self._token and self._token.is_valid:
-                return self._token.access_token
-            seed = await self.get_seed()
-            signed_seed = self.sign_seed(seed)
-            token_payload = await self.get_token(signed_seed)
-            expires_at = self._parse_expiration(token_payload["expires_at"])
-            self._token = CachedToken(access_token=token_payload["access_token"], expires_at=expires_at)
-            return self._token.access_token
+        """Return the shared DGII token for this tenant, refreshing when necessary."""
+
+        return await self._tokens.get_token(self._token_key, self._fetch_token, force_refresh=force_refresh)
+
+    async def _fetch_token(self) -> CachedToken:
+        seed = await self.get_seed()
+        signed_seed = await self.sign_seed(seed)
+        token_payload = await self.get_token(signed_seed)
+        expires_at = self._parse_expiration(token_payload["expires_at"])
+        return CachedToken(access_token=token_payload["access_token"], expires_at=expires_at)
 
     async def get_seed(self) -> bytes:
         url = f"{self._auth_base}/semilla"
         response = await self._request("GET", url)
         return response.content
 
-    def sign_seed(self, seed_xml: bytes) -> bytes:
-        return sign_ecf(seed_xml, str(self._cfg.dgii_p12_path), self._cfg.dgii_p12_password)
+    async def sign_seed(self, seed_xml: bytes) -> bytes:
+        """Sign with the tenant's own bundle so its cached token is minted for it."""
+
+        if self._tenant:
+            return await signing_pool.sign_async(seed_xml, self._tenant)
+        return await signing_pool.sign_async(
+            seed_xml,
+            p12_path=str(self._cfg.dgii_p12_path),
+            password=self._cfg.dgii_p12_password,
+        )
 
     async def get_token(self, signed_seed_xml: bytes) -> Dict[str, Any]:
         url = f"{self._auth_base}/token"
@@ -266,7 +291,30 @@ class DGIIClient:
             idempotency_key=idempotency_key,
         )
 
-    async def consulta_directorio(self, rnc: str, token: str | None = None) -> Dict[str, Any]:
+    async def consulta_directorio(
+        self,
+        rnc: str,
+        token: str | None = None,
+        *,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """Directory data for ``rnc``; raises ``DGIINotFoundError`` for unknown RNCs."""
+
+        if not use_cache:
+            return await self._fetch_directorio(rnc, token)
+        return await self._directory.get(rnc, lambda key: self._fetch_directorio(key, token))
+
+    async def prefetch_directorio(
+        self,
+        rncs: Iterable[str],
+        token: str | None = None,
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Warm the directory cache for many RNCs (e.g. an invoice batch's buyers)."""
+
+        auth_token = token or await self.bearer()
+        return await self._directory.prefetch(rncs, lambda key: self._fetch_directorio(key, auth_token))
+
+    async def _fetch_directorio(self, rnc: str, token: str | None) -> Dict[str, Any]:
         auth_token = token or await self.bearer()
         url = f"{self._directorio_base}/rnc/{rnc}"
         response = await self._request("GET", url, headers=self._auth_headers(auth_token))
@@ -298,6 +346,67 @@ class DGIIClient:
         response = await self._request("GET", url, headers=self._auth_headers(auth_token))
         return self._parse_payload(response)
 
+    async def get_status_many(
+        self,
+        track_ids: Iterable[str],
+        *,
+        token: str | None = None,
+        concurrency: int | None = None,
+    ) -> AsyncIterator[StatusLookup]:
+        """Look up many track_ids, yielding results as they complete.
+
+        Duplicates are dropped, one token is shared by every call and at most
+        ``concurrency`` requests run at once over the pooled connection.
+        Failures are reported per track_id instead of aborting the stream.
+        """
+
+        pending = iter(dict.fromkeys(track_id for track_id in track_ids if track_id))
+        auth_token = token or await self.bearer()
+        results: asyncio.Queue[StatusLookup | None] = asyncio.Queue()
+        workers_count = max(1, concurrency or self._cfg.dgii_status_concurrency)
+
+        async def worker() -> None:
+            try:
+                for track_id in pending:
+                    try:
+                        payload = await self._coalesced_status(track_id, auth_token)
+                    except Exception as exc:  # noqa: BLE001 - reported per track_id
+                        await results.put(StatusLookup(track_id, ok=False, error=str(exc) or type(exc).__name__))
+                    else:
+                        await results.put(StatusLookup(track_id, ok=True, payload=payload))
+            finally:
+                await results.put(None)
+
+        workers = [asyncio.create_task(worker()) for _ in range(workers_count)]
+        try:
+            finished = 0
+            while finished < len(workers):
+                result = await results.get()
+                if result is None:
+                    finished += 1
+                    continue
+                yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _coalesced_status(self, track_id: str, token: str) -> Dict[str, Any]:
+        inflight = _inflight_status.setdefault(asyncio.get_running_loop(), {})
+        key = (self._token_key, track_id)
+        future = inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self.get_status(track_id, token))
+            inflight[key] = future
+
+            def _forget(done: asyncio.Future[Dict[str, Any]]) -> None:
+                inflight.pop(key, None)
+                if not done.cancelled():
+                    done.exception()  # waiters may all have gone; mark the error as retrieved
+
+            future.add_done_callback(_forget)
+        return await asyncio.shield(future)
+
     async def _submit(
         self,
         url: str,
@@ -308,19 +417,31 @@ class DGIIClient:
         extra_headers: Dict[str, str] | None = None,
     ) -> Dict[str, Any]:
         auth_token = token or await self.bearer()
-        payload_hash = hashlib.sha256(xml_bytes).hexdigest()
-        cache_key = idempotency_key or str(uuid.uuid4())
-        cached = await self._idempotency_cache.get(cache_key, payload_hash)
-        if cached:
-            return cached
-
-        headers = {"Content-Type": "application/xml", **self._auth_headers(auth_token), "Idempotency-Key": cache_key}
+        headers = {"Content-Type": "application/xml", **self._auth_headers(auth_token)}
         if extra_headers:
             headers.update(extra_headers)
-        response = await self._request("POST", url, content=xml_bytes, headers=headers)
-        payload = self._parse_payload(response)
-        await self._idempotency_cache.set(cache_key, payload_hash, payload)
-        return payload
+        if idempotency_key is None:
+            # Without a caller key there is nothing to replay; do not retain the response.
+            headers["Idempotency-Key"] = str(uuid.uuid4())
+            response = await self._request("POST", url, content=xml_bytes, headers=headers)
+            return self._parse_payload(response)
+
+        headers["Idempotency-Key"] = idempotency_key
+        store_key = f"dgii-envio:{idempotency_key}"
+        payload_hash = hashlib.sha256(xml_bytes).hexdigest()
+        try:
+            cached, lock_token = await self._idempotency.begin(store_key, payload_hash)
+        except ValueError as exc:
+            raise DGIIReceiptError(f"Payload distinto para el mismo Idempotency-Key: {exc}") from exc
+        if cached is not None:
+            return cached.body
+        try:
+            response = await self._request("POST", url, content=xml_bytes, headers=headers)
+            payload = self._parse_payload(response)
+            await self._idempotency.set(store_key, payload_hash, response.status_code, payload)
+            return payload
+        finally:
+            await self._idempotency.release(store_key, lock_token)
 
     async def _request(
         self,
@@ -331,33 +452,34 @@ class DGIIClient:
         content: bytes | None = None,
         params: Optional[Dict[str, Any]] = None,
     ) -> httpx.Response:
-        self._ensure_breaker_available()
-        logger = bind_request_context(url=url, method=method)
+        endpoint = endpoint_for(url, self._endpoints)
+        logger = bind_request_context(url=url, method=method, endpoint=endpoint)
         retries = self._cfg.dgii_max_retries
         async for attempt in async_retry(retries):
             with attempt:
                 try:
-                    response = await self._client.request(
-                        method,
-                        url,
-                        headers=headers,
-                        content=content,
-                        params=params,
-                    )
-                    response.raise_for_status()
-                    self._reset_breaker()
+                    async with self._resilience.guard(endpoint):
+                        response = await self.http.request(
+                            method,
+                            url,
+                            headers=headers,
+                            content=content,
+                            params=params,
+                            timeout=self._timeout,
+                        )
+                        response.raise_for_status()
                     logger.info("DGII HTTP OK", status_code=response.status_code)
                     return response
                 except HTTPStatusError as exc:
-                    self._register_failure()
                     status_code = exc.response.status_code
                     body = exc.response.text
                     logger.warning("DGII HTTP error", status_code=status_code, body=body[:250])
+                    if status_code == 404:
+                        raise DGIINotFoundError(f"DGII no encontró el recurso solicitado ({url})") from exc
                     if 400 <= status_code < 500:
                         raise DGIIReceiptError(f"DGII rechazó la solicitud ({status_code})") from exc
                     raise
                 except HTTPError as exc:
-                    self._register_failure()
                     logger.warning("DGII HTTP transitorio", error=str(exc))
                     raise DGIIRetryableError("Error de comunicación con DGII") from exc
 
@@ -393,17 +515,3 @@ class DGIIClient:
         if expires.tzinfo is None:
             expires = expires.replace(tzinfo=timezone.utc)
         return expires.astimezone(timezone.utc)
-
-    def _ensure_breaker_available(self) -> None:
-        if self._breaker_until and self._breaker_until > datetime.now(timezone.utc):
-            raise DGIIRetryableError("Circuit breaker abierto para DGII")
-
-    def _register_failure(self) -> None:
-        self._failure_count += 1
-        if self._failure_count >= self._cfg.dgii_circuit_breaker_threshold:
-            self._breaker_until = datetime.now(timezone.utc) + timedelta(seconds=self._cfg.dgii_circuit_breaker_window)
-            self._failure_count = 0
-
-    def _reset_breaker(self) -> None:
-        self._failure_count = 0
-        self._breaker_until = None
@@ -13,6 +13,8 @@ from lxml import etree
 from app.core.config import Settings, settings
 from app.core.logging import bind_request_context
 from app.dgii.exceptions import DGIIAuthError, DGIIReceiptError, DGIIRetryableError
+from app.dgii.http_pool import get_http_client
+from app.dgii.resilience import Resilience, endpoint_for, resilience
 from app.dgii.retry import async_retry
 
 
@@ -24,13 +26,19 @@ class DGIIClient:
         *,
         config: Settings | None = None,
         client: AsyncClient | None = None,
+        guard: Resilience | None = None,
     ) -> None:
         self.config = config or settings
-        self._client = client or AsyncClient(timeout=self.config.dgii_http_timeout_seconds)
-        self._own_client = client is None
+        self._client = client
+        self._resilience = guard or resilience
         self._auth_base = self.config.url_for("auth")
         self._recepcion_base = self.config.url_for("recepcion")
         self._recepcion_fc_base = self.config.url_for("recepcion_fc")
+        self._endpoints = {
+            "auth": str(self._auth_base),
+            "recepcion": str(self._recepcion_base),
+            "recepcion_fc": str(self._recepcion_fc_base),
+        }
 
     async def __aenter__(self) -> "DGIIClient":
         return self
@@ -38,9 +46,14 @@ class DGIIClient:
     async def __aexit__(self, exc_type, exc, tb) -> None:
         await self.close()
 
+    @property
+    def http(self) -> AsyncClient:
+        """Injected client, or the process-wide pooled one."""
+
+        return self._client if self._client is not None else get_http_client()
+
     async def close(self) -> None:
-        if self._own_client:
-            await self._client.aclose()
+        """The pooled client outlives this wrapper; it is closed on shutdown."""
 
     async def get_seed(self) -> bytes:
         """Fetch XML seed from DGII authentication service."""
@@ -78,9 +91,9 @@ class DGIIClient:
             raise DGIIAuthError("La respuesta de token no contiene campos requeridos")
         return {"access_token": token, "expires_at": expires}
 
-    async def send_ecf(self, xml_bytes: bytes, token: str) -> Dict[str, Any]:
+    async def send_ecf(self, xml_bytes: bytes, token: str, *, idempotency_key: str | None = None) -> Dict[str, Any]:
         url = f"{self._recepcion_base}/ecf"
-        return await self._submit(url, xml_bytes, token)
+        return await self._submit(url, xml_bytes, token, idempotency_key=idempotency_key)
 
     async def send_rfce(self, xml_bytes: bytes, token: str) -> Dict[str, Any]:
         url = f"{self._recepcion_fc_base}/rfce"
@@ -107,9 +120,16 @@ class DGIIClient:
         )
         return self._parse_payload(response)
 
-    async def _submit(self, url: str, xml_bytes: bytes, token: str) -> Dict[str, Any]:
+    async def _submit(
+        self,
+        url: str,
+        xml_bytes: bytes,
+        token: str,
+        *,
+        idempotency_key: str | None = None,
+    ) -> Dict[str, Any]:
         headers = {"Content-Type": "application/xml", **self._auth_headers(token)}
-        headers.update(self._idempotency_headers())
+        headers.update(self._idempotency_headers(idempotency_key))
         response = await self._request("POST", url, content=xml_bytes, headers=headers)
         payload = self._parse_payload(response)
         return payload
@@ -125,19 +145,22 @@ class DGIIClient:
     ) -> httpx.Response:
         """Perform an HTTP request with retries."""
 
-        logger = bind_request_context(url=url, method=method)
+        endpoint = endpoint_for(url, self._endpoints)
+        logger = bind_request_context(url=url, method=method, endpoint=endpoint)
         retries = self.config.dgii_http_retries
         async for attempt in async_retry(retries):
             with attempt:
                 try:
-                    response = await self._client.request(
-                        method,
-                        url,
-                        headers=headers,
-                        content=content,
-                        params=params,
-                    )
-                    response.raise_for_status()
+                    async with self._resilience.guard(endpoint):
+                        response = await self.http.request(
+                            method,
+                            url,
+                            headers=headers,
+                            content=content,
+                            params=params,
+                            timeout=self.config.dgii_http_timeout_seconds,
+                        )
+                        response.raise_for_status()
                     logger.info("DGII HTTP OK", status_code=response.status_code)
                     return response
                 except HTTPStatusError as exc:
@@ -156,8 +179,8 @@ class DGIIClient:
     def _auth_headers(self, token: str) -> Dict[str, str]:
         return {"Authorization": f"Bearer {token}"}
 
-    def _idempotency_headers(self) -> Dict[str, str]:
-        return {"Idempotency-Key": str(uuid.uuid4())}
+    def _idempotency_headers(self, key: str | None = None) -> Dict[str, str]:
+        return {"Idempotency-Key": key or str(uuid.uuid4())}
 
     def _parse_payload(self, response: httpx.Response) -> Dict[str, Any]:
         if response.headers.get("Content-Type", "").startswith("application/xml"):
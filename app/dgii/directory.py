@@ -0,0 +1,247 @@
+"""Two-tier cache for DGII directory (``consulta_directorio``) lookups.
+
+Directory data for an RNC changes rarely, so responses are kept in an
+in-process LRU and, when configured, in Redis for every worker. Entries are
+served fresh for ``ttl_seconds``; during the following ``stale_seconds`` the
+cached value is still returned while one background refresh replaces it.
+RNCs DGII does not know are cached negatively for ``negative_ttl_seconds``.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+
+from app.core.logging import bind_request_context
+from app.dgii.exceptions import DGIINotFoundError
+
+DirectoryFetcher = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+@dataclass(slots=True)
+class DirectoryEntry:
+    rnc: str
+    found: bool
+    payload: Optional[Dict[str, Any]]
+    fetched_at: float
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), default=str)
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> "DirectoryEntry":
+        return cls(**json.loads(raw))
+
+
+@dataclass(slots=True)
+class DirectoryStats:
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    negative_hits: int = 0
+    refreshes: int = 0
+    errors: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+def normalize_rnc(rnc: str) -> str:
+    return "".join(ch for ch in str(rnc) if ch.isdigit())
+
+
+class DirectoryCache:
+    """LRU + Redis cache with negative caching and stale-while-revalidate."""
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = 24 * 60 * 60,
+        stale_seconds: float = 24 * 60 * 60,
+        negative_ttl_seconds: float = 60 * 60,
+        max_entries: int = 50_000,
+        prefetch_concurrency: int = 8,
+        redis: Any | None = None,
+        prefix: str = "dgii:directorio",
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._ttl = ttl_seconds
+        self._stale = stale_seconds
+        self._negative_ttl = negative_ttl_seconds
+        self._max_entries = max_entries
+        self._prefetch_concurrency = max(1, prefetch_concurrency)
+        self._redis = redis
+        self._prefix = prefix
+        self._clock = clock
+        self._entries: "OrderedDict[str, DirectoryEntry]" = OrderedDict()
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future[DirectoryEntry]]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._background: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Set[asyncio.Task[None]]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.stats = DirectoryStats()
+
+    async def get(self, rnc: str, fetch: DirectoryFetcher) -> Dict[str, Any]:
+        """Return directory data for ``rnc``; raises :class:`DGIINotFoundError` if unknown."""
+
+        key = normalize_rnc(rnc)
+        entry = await self._lookup(key)
+        if entry is None:
+            self.stats.misses += 1
+            entry = await self._load(key, fetch)
+        elif self._is_fresh(entry):
+            self.stats.hits += 1
+        else:
+            self.stats.stale_hits += 1
+            self._refresh_in_background(key, fetch)
+
+        if not entry.found:
+            self.stats.negative_hits += 1
+            raise DGIINotFoundError(f"RNC {key} no encontrado en el directorio DGII")
+        return dict(entry.payload or {})
+
+    async def prefetch(self, rncs: Iterable[str], fetch: DirectoryFetcher) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Warm the cache for many RNCs with bounded concurrency.
+
+        Returns the payload per RNC (``None`` for unknown ones or failed lookups).
+        """
+
+        keys = list(dict.fromkeys(key for key in (normalize_rnc(rnc) for rnc in rncs) if key))
+        limit = asyncio.Semaphore(self._prefetch_concurrency)
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+
+        async def one(key: str) -> None:
+            async with limit:
+                try:
+                    results[key] = await self.get(key, fetch)
+                except DGIINotFoundError:
+                    results[key] = None
+                except Exception as exc:  # noqa: BLE001 - prefetch is best effort
+                    self.stats.errors += 1
+                    bind_request_context(rnc=key).warning("Prefetch de directorio DGII falló", error=str(exc))
+                    results[key] = None
+
+        await asyncio.gather(*(one(key) for key in keys))
+        return results
+
+    async def invalidate(self, rnc: str) -> None:
+        key = normalize_rnc(rnc)
+        self._entries.pop(key, None)
+        if self._redis is not None:
+            await self._redis.delete(self._redis_key(key))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def _lookup(self, key: str) -> Optional[DirectoryEntry]:
+        entry = self._entries.get(key)
+        if entry is not None and self._is_usable(entry):
+            self._entries.move_to_end(key)
+            return entry
+        if entry is not None:
+            del self._entries[key]
+        if self._redis is not None:
+            raw = await self._redis.get(self._redis_key(key))
+            if raw:
+                entry = DirectoryEntry.from_json(raw)
+                if self._is_usable(entry):
+                    self._remember(entry)
+                    return entry
+        return None
+
+    async def _load(self, key: str, fetch: DirectoryFetcher) -> DirectoryEntry:
+        """Fetch ``key`` once even when many coroutines miss at the same time."""
+
+        inflight = self._inflight.setdefault(asyncio.get_running_loop(), {})
+        future = inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(key, fetch))
+            inflight[key] = future
+
+            def _forget(done: asyncio.Future[DirectoryEntry]) -> None:
+                inflight.pop(key, None)
+                if not done.cancelled():
+                    done.exception()
+
+            future.add_done_callback(_forget)
+        return await asyncio.shield(future)
+
+    async def _fetch(self, key: str, fetch: DirectoryFetcher) -> DirectoryEntry:
+        try:
+            payload = await fetch(key)
+        except DGIINotFoundError:
+            entry = DirectoryEntry(rnc=key, found=False, payload=None, fetched_at=self._clock())
+        else:
+            entry = DirectoryEntry(rnc=key, found=True, payload=payload, fetched_at=self._clock())
+        self._remember(entry)
+        if self._redis is not None:
+            ttl = self._negative_ttl if not entry.found else self._ttl + self._stale
+            await self._redis.set(self._redis_key(key), entry.to_json(), px=max(1, int(ttl * 1000)))
+        return entry
+
+    def _refresh_in_background(self, key: str, fetch: DirectoryFetcher) -> None:
+        inflight = self._inflight.setdefault(asyncio.get_running_loop(), {})
+        if key in inflight:
+            return
+
+        async def refresh() -> None:
+            try:
+                await self._load(key, fetch)
+                self.stats.refreshes += 1
+            except Exception as exc:  # noqa: BLE001 - the stale entry keeps being served
+                self.stats.errors += 1
+                bind_request_context(rnc=key).warning("Revalidación de directorio DGII falló", error=str(exc))
+
+        # Keep a strong reference so the loop does not collect the refresh mid-flight.
+        background = self._background.setdefault(asyncio.get_running_loop(), set())
+        task = asyncio.create_task(refresh())
+        background.add(task)
+        task.add_done_callback(background.discard)
+
+    def _remember(self, entry: DirectoryEntry) -> None:
+        self._entries[entry.rnc] = entry
+        self._entries.move_to_end(entry.rnc)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def _age(self, entry: DirectoryEntry) -> float:
+        return self._clock() - entry.fetched_at
+
+    def _is_fresh(self, entry: DirectoryEntry) -> bool:
+        return self._age(entry) < (self._ttl if entry.found else self._negative_ttl)
+
+    def _is_usable(self, entry: DirectoryEntry) -> bool:
+        if not entry.found:
+            return self._age(entry) < self._negative_ttl
+        return self._age(entry) < self._ttl + self._stale
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self._prefix}:{key}"
+
+
+def build_directory_cache(config: Any | None = None) -> DirectoryCache:
+    """Build the cache selected by ``dgii_directory_cache`` in the settings."""
+
+    if config is None:
+        from app.infra.settings import settings as config
+
+    redis_client = None
+    if config.dgii_directory_cache == "redis":
+        import redis.asyncio as redis  # type: ignore[import-not-found]
+
+        redis_client = redis.from_url(config.redis_url, decode_responses=True)
+    return DirectoryCache(
+        ttl_seconds=config.dgii_directory_ttl_seconds,
+        stale_seconds=config.dgii_directory_stale_seconds,
+        negative_ttl_seconds=config.dgii_directory_negative_ttl_seconds,
+        max_entries=config.dgii_directory_max_entries,
+        redis=redis_client,
+    )
+
+
+directory_cache = build_directory_cache()
@@ -18,5 +18,17 @@ class DGIIReceiptError(DGIIError):
     """Raised when the DGII reception service returns an error."""
 
 
+class DGIINotFoundError(DGIIReceiptError):
+    """Raised when DGII answers 404 for the requested resource (e.g. an unknown RNC)."""
+
+
 class DGIIRetryableError(DGIIError):
     """Indicates that the operation can be retried (e.g. transient HTTP issues)."""
+
+
+class CircuitOpenError(DGIIRetryableError):
+    """Raised without calling DGII while the endpoint's circuit breaker is open."""
+
+
+class RateLimitExceededError(DGIIRetryableError):
+    """Raised when the rate governor cannot grant a slot within its wait budget."""
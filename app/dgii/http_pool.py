@@ -0,0 +1,148 @@
+"""Process-wide pooled ``httpx.AsyncClient`` shared by every DGII integration.
+
+Each DGII call previously opened its own client and paid a TCP+TLS handshake.
+The pool keeps one keep-alive client per event loop (HTTP/2 when ``h2`` is
+installed) and exposes connection utilisation through Prometheus.
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import time
+import weakref
+from typing import Any, Dict
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.config import Settings, settings
+from app.core.logging import bind_request_context
+
+HTTP_INFLIGHT = Gauge("dgii_http_inflight_requests", "Peticiones HTTP a DGII en curso", ["host"])
+HTTP_REQUESTS = Counter("dgii_http_requests_total", "Peticiones HTTP a DGII", ["host", "outcome"])
+HTTP_DURATION = Histogram("dgii_http_request_seconds", "Duración de peticiones HTTP a DGII", ["host"])
+HTTP_POOL_CONNECTIONS = Gauge("dgii_http_pool_connections", "Conexiones del pool HTTP de DGII", ["state"])
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Wraps the pooled transport to record in-flight requests and pool usage."""
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        outcome = "error"
+        HTTP_INFLIGHT.labels(host=host).inc()
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+            outcome = str(response.status_code)
+            return response
+        finally:
+            HTTP_INFLIGHT.labels(host=host).dec()
+            HTTP_DURATION.labels(host=host).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(host=host, outcome=outcome).inc()
+            self._record_pool_state()
+
+    def connection_stats(self) -> Dict[str, int]:
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", ()))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"connections": len(connections), "idle": idle, "active": len(connections) - idle}
+
+    def _record_pool_state(self) -> None:
+        stats = self.connection_stats()
+        HTTP_POOL_CONNECTIONS.labels(state="active").set(stats["active"])
+        HTTP_POOL_CONNECTIONS.labels(state="idle").set(stats["idle"])
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class HTTPClientPool:
+    """Lazily builds one pooled client per running event loop.
+
+    ``httpx`` clients are bound to the loop that opened their connections, so
+    the pool never hands a client across loops (tests and worker threads run
+    their own loops).
+    """
+
+    def __init__(self, config: Settings | None = None) -> None:
+        self.config = config or settings
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def http2(self) -> bool:
+        return self.config.dgii_http2_enabled and http2_available()
+
+    def get(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = self._build()
+            self._clients[loop] = client
+            bind_request_context(component="dgii_http_pool").info(
+                "Cliente HTTP DGII creado",
+                http2=self.http2,
+                max_connections=self.config.dgii_http_max_connections,
+            )
+        return client
+
+    def _build(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=self.config.dgii_http_max_connections,
+            max_keepalive_connections=self.config.dgii_http_max_keepalive,
+            keepalive_expiry=self.config.dgii_http_keepalive_seconds,
+        )
+        transport = httpx.AsyncHTTPTransport(limits=limits, http2=self.http2, retries=0)
+        return httpx.AsyncClient(
+            transport=_InstrumentedTransport(transport),
+            timeout=httpx.Timeout(self.config.dgii_http_timeout_seconds),
+            follow_redirects=False,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            client = self._clients.get(asyncio.get_running_loop())
+        except RuntimeError:
+            client = None
+        transport = getattr(client, "_transport", None)
+        connections = (
+            transport.connection_stats()
+            if isinstance(transport, _InstrumentedTransport)
+            else {"connections": 0, "idle": 0, "active": 0}
+        )
+        return {
+            "http2": self.http2,
+            "max_connections": self.config.dgii_http_max_connections,
+            "max_keepalive": self.config.dgii_http_max_keepalive,
+            **connections,
+        }
+
+    async def aclose(self) -> None:
+        """Close the client bound to the current loop; others die with their loop."""
+
+        try:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        except RuntimeError:  # pragma: no cover - called outside a loop
+            client = None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+
+http_pool = HTTPClientPool()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    return http_pool.get()
+
+
+async def close_http_pool() -> None:
+    await http_pool.aclose()
@@ -1,65 +1,329 @@
-"""Simple background dispatcher for DGII follow-up jobs."""
+"""Durable background dispatcher for DGII status-polling jobs.
+
+Jobs live in a store (in memory for tests, Redis in production) so they
+survive restarts and are shared across workers. Each ``track_id`` is queued
+once; consumers claim due jobs under a visibility timeout, poll DGII and
+either record a terminal ``estado`` on the invoice or reschedule the job with
+exponential backoff. Jobs whose consumer died reappear when their visibility
+timeout expires. Bearer tokens are never persisted: a job keeps only the
+tenant key and resolves a current token through ``token_manager`` at poll time.
+"""
 from __future__ import annotations
 
 import asyncio
+import heapq
+import json
+import time
 from contextlib import suppress
-from typing import Tuple
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol, Tuple
 
 from app.core.config import Settings, settings
 from app.core.logging import bind_request_context
-from app.dgii.clients import DGIIClient
+from app.dgii.client import DGIIClient
+from app.dgii.http_pool import get_http_client
+
+TERMINAL_STATES = frozenset({"ACEPTADO", "RECHAZADO", "ACEPTADO_CONDICIONAL"})
+
+StatusFetcher = Callable[["StatusJob"], Awaitable[Dict[str, Any]]]
+StatusWriter = Callable[[str, str], Awaitable[None]]
+
+
+@dataclass(slots=True)
+class StatusJob:
+    track_id: str
+    tenant: str | None = None
+    attempts: int = 0
+    last_estado: str | None = None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> "StatusJob":
+        data = json.loads(raw)
+        data.pop("token", None)  # jobs queued before tokens stopped being stored
+        return cls(**data)
+
+
+def normalize_estado(value: Any) -> str:
+    return str(value or "desconocido").strip().upper().replace(" ", "_")
+
+
+class JobStore(Protocol):
+    async def schedule(self, job: StatusJob, run_at: float) -> bool: ...
+
+    async def claim(self, now: float, visibility_timeout: float) -> Optional[StatusJob]: ...
+
+    async def retry(self, job: StatusJob, run_at: float) -> None: ...
+
+    async def complete(self, track_id: str) -> None: ...
+
+    async def requeue_expired(self, now: float) -> int: ...
+
+    async def counts(self) -> Dict[str, int]: ...
+
+    async def clear(self) -> None: ...
+
+
+class MemoryJobStore:
+    """Single-process store; operations never await, so the loop serialises them."""
+
+    def __init__(self) -> None:
+        self._jobs: Dict[str, StatusJob] = {}
+        self._scheduled: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._inflight: Dict[str, float] = {}
+
+    async def schedule(self, job: StatusJob, run_at: float) -> bool:
+        if job.track_id in self._jobs:
+            return False
+        self._jobs[job.track_id] = job
+        self._push(job.track_id, run_at)
+        return True
+
+    async def claim(self, now: float, visibility_timeout: float) -> Optional[StatusJob]:
+        while self._heap and self._heap[0][0] <= now:
+            run_at, track_id = heapq.heappop(self._heap)
+            if self._scheduled.get(track_id) != run_at:
+                continue  # stale heap entry
+            del self._scheduled[track_id]
+            self._inflight[track_id] = now + visibility_timeout
+            return self._jobs[track_id]
+        return None
+
+    async def retry(self, job: StatusJob, run_at: float) -> None:
+        self._inflight.pop(job.track_id, None)
+        self._jobs[job.track_id] = job
+        self._push(job.track_id, run_at)
+
+    async def complete(self, track_id: str) -> None:
+        self._inflight.pop(track_id, None)
+        self._scheduled.pop(track_id, None)
+        self._jobs.pop(track_id, None)
+
+    async def requeue_expired(self, now: float) -> int:
+        expired = [track_id for track_id, deadline in self._inflight.items() if deadline <= now]
+        for track_id in expired:
+            del self._inflight[track_id]
+            self._push(track_id, now)
+        return len(expired)
+
+    async def counts(self) -> Dict[str, int]:
+        return {"scheduled": len(self._scheduled), "inflight": len(self._inflight)}
+
+    async def clear(self) -> None:
+        self._jobs.clear()
+        self._scheduled.clear()
+        self._heap.clear()
+        self._inflight.clear()
+
+    def _push(self, track_id: str, run_at: float) -> None:
+        self._scheduled[track_id] = run_at
+        heapq.heappush(self._heap, (run_at, track_id))
+
+
+_CLAIM_SCRIPT = """
+local due = redis.call("zrangebyscore", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, 1)
+if #due == 0 then
+    return false
+end
+redis.call("zrem", KEYS[1], due[1])
+redis.call("zadd", KEYS[2], ARGV[2], due[1])
+return redis.call("hget", KEYS[3], due[1])
+"""
+
+_REQUEUE_SCRIPT = """
+local expired = redis.call("zrangebyscore", KEYS[1], "-inf", ARGV[1])
+for _, track_id in ipairs(expired) do
+    redis.call("zrem", KEYS[1], track_id)
+    redis.call("zadd", KEYS[2], ARGV[1], track_id)
+end
+return #expired
+"""
+
+
+class RedisJobStore:
+    """Shared store: job hash, ``scheduled`` and ``inflight`` sorted sets keyed by time."""
+
+    def __init__(self, redis: Any, *, prefix: str = "dgii:jobs:status") -> None:
+        self._redis = redis
+        self._data = f"{prefix}:data"
+        self._scheduled = f"{prefix}:scheduled"
+        self._inflight = f"{prefix}:inflight"
+
+    async def schedule(self, job: StatusJob, run_at: float) -> bool:
+        if not await self._redis.hsetnx(self._data, job.track_id, job.to_json()):
+            return False
+        await self._redis.zadd(self._scheduled, {job.track_id: run_at})
+        return True
+
+    async def claim(self, now: float, visibility_timeout: float) -> Optional[StatusJob]:
+        raw = await self._redis.eval(
+            _CLAIM_SCRIPT, 3, self._scheduled, self._inflight, self._data, now, now + visibility_timeout
+        )
+        return StatusJob.from_json(raw) if raw else None
+
+    async def retry(self, job: StatusJob, run_at: float) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._data, job.track_id, job.to_json())
+            pipe.zrem(self._inflight, job.track_id)
+            pipe.zadd(self._scheduled, {job.track_id: run_at})
+            await pipe.execute()
+
+    async def complete(self, track_id: str) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self._inflight, track_id)
+            pipe.zrem(self._scheduled, track_id)
+            pipe.hdel(self._data, track_id)
+            await pipe.execute()
+
+    async def requeue_expired(self, now: float) -> int:
+        return int(await self._redis.eval(_REQUEUE_SCRIPT, 2, self._inflight, self._scheduled, now))
+
+    async def counts(self) -> Dict[str, int]:
+        return {
+            "scheduled": int(await self._redis.zcard(self._scheduled)),
+            "inflight": int(await self._redis.zcard(self._inflight)),
+        }
+
+    async def clear(self) -> None:
+        await self._redis.delete(self._data, self._scheduled, self._inflight)
 
 
 class DGIIJobDispatcher:
-    def __init__(self, config: Settings | None = None) -> None:
+    def __init__(
+        self,
+        config: Settings | None = None,
+        *,
+        store: JobStore | None = None,
+        fetch_status: StatusFetcher | None = None,
+        write_estado: StatusWriter | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
         self.config = config or settings
-        self._queue: asyncio.Queue[Tuple[str, str]] = asyncio.Queue()
-        self._worker: asyncio.Task[None] | None = None
+        self.store: JobStore = store if store is not None else _build_store(self.config)
+        self._fetch_status = fetch_status or _fetch_status
+        self._write_estado = write_estado or _write_invoice_estado
+        self._clock = clock
+        self._workers: List[asyncio.Task[None]] = []
         self._running = False
 
     async def start(self) -> None:
         if not self.config.jobs_enabled or self._running:
             return
         self._running = True
-        self._worker = asyncio.create_task(self._consume())
+        self._workers = [
+            asyncio.create_task(self._consume(index)) for index in range(self.config.jobs_concurrency)
+        ]
+        self._workers.append(asyncio.create_task(self._reap()))
 
     async def stop(self) -> None:
+        """Stop consumers; pending jobs stay in the store for the next start."""
+
         self._running = False
-        if self._worker:
-            self._worker.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
             with suppress(asyncio.CancelledError):
-                await self._worker
-            self._worker = None
-        while not self._queue.empty():
-            try:
-                self._queue.get_nowait()
-                self._queue.task_done()
-            except asyncio.QueueEmpty:  # pragma: no cover - race guard
-                break
+                await worker
+        self._workers = []
 
-    async def enqueue_status_check(self, track_id: str, token: str) -> None:
-        if not self.config.jobs_enabled:
-            return
-        await self._queue.put((track_id, token))
+    async def enqueue_status_check(self, track_id: str, tenant: str | None = None) -> bool:
+        """Schedule polling for ``track_id``; duplicates of a queued job are ignored."""
+
+        if not self.config.jobs_enabled or not track_id:
+            return False
+        return await self.store.schedule(StatusJob(track_id=track_id, tenant=tenant), self._clock())
+
+    async def run_once(self) -> bool:
+        """Claim and process one due job. Returns ``False`` when none was due."""
 
-    async def _consume(self) -> None:
+        job = await self.store.claim(self._clock(), self.config.jobs_visibility_timeout_seconds)
+        if job is None:
+            return False
+        await self._process(job)
+        return True
+
+    def backoff(self, attempts: int) -> float:
+        delay = self.config.jobs_backoff_base_seconds * (2 ** max(0, attempts - 1))
+        return min(delay, self.config.jobs_backoff_max_seconds)
+
+    async def _consume(self, index: int) -> None:
         while True:
             try:
-                track_id, token = await self._queue.get()
-                await self._poll_status(track_id, token)
+                if not await self.run_once():
+                    await asyncio.sleep(self.config.jobs_poll_interval_seconds)
             except asyncio.CancelledError:
                 raise
             except Exception as exc:  # pragma: no cover - defensive logging
-                bind_request_context(job="dgii_status").error("Fallo en job DGII", error=str(exc))
-            finally:
-                self._queue.task_done()
-
-    async def _poll_status(self, track_id: str, token: str) -> None:
-        bind_request_context(job="dgii_status", track_id=track_id)
-        async with DGIIClient(config=self.config) as client:
-            result = await client.get_status(track_id, token)
-            estado = result.get("estado") or result.get("status")
-            bind_request_context(estado=estado or "desconocido").info("Estado DGII consultado")
+                bind_request_context(job="dgii_status", consumer=index).error("Fallo en job DGII", error=str(exc))
+                await asyncio.sleep(self.config.jobs_poll_interval_seconds)
+
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.jobs_visibility_timeout_seconds / 2)
+            try:
+                requeued = await self.store.requeue_expired(self._clock())
+            except Exception as exc:  # pragma: no cover - defensive logging
+                bind_request_context(job="dgii_status").error("Fallo reencolando jobs DGII", error=str(exc))
+                continue
+            if requeued:
+                bind_request_context(job="dgii_status").warning("Jobs DGII reencolados", cantidad=requeued)
+
+    async def _process(self, job: StatusJob) -> None:
+        logger = bind_request_context(job="dgii_status", track_id=job.track_id)
+        job.attempts += 1
+        try:
+            result = await asyncio.wait_for(
+                self._fetch_status(job), timeout=self.config.jobs_visibility_timeout_seconds
+            )
+        except Exception as exc:  # noqa: BLE001 - retried with backoff
+            logger.warning("Consulta de estado DGII falló", error=str(exc), intento=job.attempts)
+            await self._reschedule(job)
+            return
+
+        estado = normalize_estado(result.get("estado") or result.get("status"))
+        job.last_estado = estado
+        if estado in TERMINAL_STATES:
+            await self._write_estado(job.track_id, estado)
+            await self.store.complete(job.track_id)
+            logger.info("Estado DGII final", estado=estado, intentos=job.attempts)
+            return
+        await self._reschedule(job)
+
+    async def _reschedule(self, job: StatusJob) -> None:
+        if job.attempts >= self.config.jobs_max_attempts:
+            if job.last_estado:
+                await self._write_estado(job.track_id, job.last_estado)
+            await self.store.complete(job.track_id)
+            bind_request_context(job="dgii_status", track_id=job.track_id).error(
+                "Job DGII abandonado", intentos=job.attempts, estado=job.last_estado
+            )
+            return
+        await self.store.retry(job, self._clock() + self.backoff(job.attempts))
+
+
+async def _fetch_status(job: StatusJob) -> Dict[str, Any]:
+    async with DGIIClient(config=settings, client=get_http_client(), tenant=job.tenant) as client:
+        return await client.get_status(job.track_id, await client.bearer())
+
+
+async def _write_invoice_estado(track_id: str, estado: str) -> None:
+    from app.db import AsyncSessionFactory
+    from app.repositories import InvoiceRepository
+
+    async with AsyncSessionFactory() as session:
+        await InvoiceRepository(session).update_estado(track_id, estado)
+        await session.commit()
+
+
+def _build_store(config: Settings) -> JobStore:
+    if config.jobs_backend == "redis":
+        import redis.asyncio as redis  # type: ignore[import-not-found]
+
+        return RedisJobStore(redis.from_url(config.redis_url, decode_responses=True))
+    return MemoryJobStore()
 
 
 dispatcher = DGIIJobDispatcher()
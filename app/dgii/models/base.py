@@ -1,18 +1,23 @@
 """Base utilities for DGII XML payloads."""
 from __future__ import annotations
 
+import io
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import Iterable, Tuple
+from pathlib import Path
+from typing import IO, ClassVar, Iterable, Tuple
 
 from lxml import etree
 from pydantic import BaseModel, ConfigDict
 
+_CENT = Decimal("0.01")
+
 
 def decimal_to_str(value: Decimal | float | int) -> str:
     """Format decimals using two decimal places."""
 
-    quantized = Decimal(str(value)).quantize(Decimal("0.01"))
+    amount = value if isinstance(value, Decimal) else Decimal(str(value))
+    quantized = amount.quantize(_CENT)
     return f"{quantized:.2f}"
 
 
@@ -28,7 +33,7 @@ class BaseDGIIModel(BaseModel):
 
     model_config = ConfigDict(str_strip_whitespace=True, populate_by_name=True, arbitrary_types_allowed=True)
 
-    xml_config: XMLSerializerConfig
+    xml_config: ClassVar[XMLSerializerConfig]
 
     def _create_root(self) -> etree._Element:
         cfg = self.xml_config
@@ -45,10 +50,40 @@ class BaseDGIIModel(BaseModel):
 
         raise NotImplementedError
 
-    def to_xml_bytes(self) -> bytes:
+    def _stream_contents(self, xf: etree.xmlfile) -> None:
+        """Write the root's children incrementally; override for large documents."""
+
+        for child in self._build_tree():
+            xf.write(child)
+
+    def _use_streaming(self) -> bool:
+        return False
+
+    def to_xml_bytes(self, *, streaming: bool | None = None) -> bytes:
+        """Serialize the document; ``streaming`` defaults to what the document size calls for.
+
+        Both modes produce byte-identical output.
+        """
+
+        if streaming is None:
+            streaming = self._use_streaming()
+        if streaming:
+            buffer = io.BytesIO()
+            self.write_xml(buffer)
+            return buffer.getvalue()
         root = self._build_tree()
         return etree.tostring(root, encoding="utf-8", xml_declaration=True, pretty_print=False)
 
+    def write_xml(self, target: str | Path | IO[bytes]) -> None:
+        """Stream the document to a path or binary file without building the full tree."""
+
+        cfg = self.xml_config
+        tag = f"{{{cfg.namespace}}}{cfg.root_tag}" if cfg.namespace else cfg.root_tag
+        with etree.xmlfile(str(target) if isinstance(target, Path) else target, encoding="utf-8") as xf:
+            xf.write_declaration()
+            with xf.element(tag, nsmap=cfg.nsmap):
+                self._stream_contents(xf)
+
     def _build_key_values(self, parent: etree._Element, rows: Iterable[Tuple[str, str]]) -> None:
         for tag, value in rows:
             self._append(parent, tag, value)
@@ -8,6 +8,8 @@ from typing import List
 from lxml import etree
 from pydantic import Field
 
+from app.billing.totals import calcular_totales, formatear_centavos
+from app.core.config import settings
 from app.dgii.models.base import BaseDGIIModel, XMLSerializerConfig, decimal_to_str
 
 
@@ -20,7 +22,7 @@ class ECFLineItem(BaseDGIIModel):
     cantidad: Decimal = Field(..., gt=0)
     precio_unitario: Decimal = Field(..., gt=0, alias="precioUnitario")
 
-    def _build_tree(self) -> etree._Element:
+    def _build_tree(self, total: str | None = None) -> etree._Element:
         root = self._create_root()
         self._build_key_values(
             root,
@@ -28,7 +30,7 @@ class ECFLineItem(BaseDGIIModel):
                 ("Descripcion", self.descripcion),
                 ("Cantidad", decimal_to_str(self.cantidad)),
                 ("PrecioUnitario", decimal_to_str(self.precio_unitario)),
-                ("Total", decimal_to_str(self.cantidad * self.precio_unitario)),
+                ("Total", total or decimal_to_str(self.cantidad * self.precio_unitario)),
             ],
         )
         return root
@@ -50,7 +52,30 @@ class ECFRequest(BaseDGIIModel):
 
     def _build_tree(self) -> etree._Element:
         root = self._create_root()
-        encabezado = etree.SubElement(root, "Encabezado")
+        root.append(self._build_encabezado())
+        if self.items:
+            detalle = etree.SubElement(root, "Detalle")
+            for item, total in zip(self.items, self._line_totals()):
+                detalle.append(item._build_tree(total))
+        return root
+
+    def _stream_contents(self, xf: etree.xmlfile) -> None:
+        # Only one line item is materialised as an lxml element at a time.
+        xf.write(self._build_encabezado())
+        if self.items:
+            with xf.element("Detalle"):
+                for item, total in zip(self.items, self._line_totals()):
+                    xf.write(item._build_tree(total))
+
+    def _line_totals(self) -> list[str]:
+        # One scaled-integer pass over every line instead of a Decimal product per item.
+        return [formatear_centavos(linea.bruto) for linea in calcular_totales(self.items).lineas]
+
+    def _use_streaming(self) -> bool:
+        return len(self.items) >= settings.ecf_streaming_min_items
+
+    def _build_encabezado(self) -> etree._Element:
+        encabezado = etree.Element("Encabezado")
         self._build_key_values(
             encabezado,
             [
@@ -63,9 +88,4 @@ class ECFRequest(BaseDGIIModel):
                 ("Moneda", self.moneda),
             ],
         )
-
-        if self.items:
-            detalle = etree.SubElement(root, "Detalle")
-            for item in self.items:
-                detalle.append(item._build_tree())
-        return root
+        return encabezado
@@ -0,0 +1,339 @@
+"""Circuit breakers and rate governing shared by every DGII HTTP client.
+
+Each DGII endpoint (``auth``, ``recepcion``, ``recepcion_fc``, ``directorio``,
+or the bare host for other URLs) gets:
+
+* a :class:`CircuitBreaker` that opens on the error rate observed over a
+  sliding time window, lets a single probe through once the open period ends
+  (half-open) and closes again when the probe succeeds;
+* a token bucket in :class:`RateGovernor` that spaces requests out before
+  DGII starts rejecting them.
+
+With Redis configured, an open breaker and the token buckets are shared by all
+gunicorn workers; otherwise both are kept in process.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Mapping, Optional, Tuple
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.logging import bind_request_context
+from app.dgii.exceptions import CircuitOpenError, DGIIRetryableError, RateLimitExceededError
+
+BREAKER_STATE = Gauge("dgii_circuit_state", "Estado del circuito DGII (0=cerrado, 1=semiabierto, 2=abierto)", ["endpoint"])
+BREAKER_TRANSITIONS = Counter("dgii_circuit_transitions_total", "Cambios de estado del circuito DGII", ["endpoint", "state"])
+GOVERNOR_WAIT = Histogram(
+    "dgii_rate_governor_wait_seconds",
+    "Espera impuesta por el limitador de tasa DGII",
+    ["endpoint"],
+    buckets=(0, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+
+DEFAULT_RATE_LIMITS: Dict[str, float] = {"auth": 5.0, "recepcion": 50.0, "recepcion_fc": 50.0, "directorio": 20.0}
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+
+_STATE_VALUES = {BreakerState.CLOSED: 0, BreakerState.HALF_OPEN: 1, BreakerState.OPEN: 2}
+
+
+def endpoint_for(url: str | httpx.URL, bases: Mapping[str, str] | None = None) -> str:
+    """Name the DGII endpoint ``url`` belongs to (longest matching base), else its host."""
+
+    text = str(url)
+    best: Tuple[int, str] | None = None
+    for name, base in (bases or {}).items():
+        base = str(base).rstrip("/")
+        if base and text.startswith(base) and (best is None or len(base) > best[0]):
+            best = (len(base), name)
+    if best is not None:
+        return best[1]
+    return httpx.URL(text).host or "desconocido"
+
+
+def counts_as_failure(exc: BaseException) -> bool:
+    """Only server-side trouble trips the breaker; DGII rejecting a document does not."""
+
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return isinstance(exc, (httpx.TransportError, DGIIRetryableError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker with half-open probing."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_rate_threshold: float = 0.5,
+        min_calls: int = 5,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+        redis: Any | None = None,
+        prefix: str = "dgii:breaker",
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.name = name
+        self._threshold = failure_rate_threshold
+        self._min_calls = min_calls
+        self._window = window_seconds
+        self._open_seconds = open_seconds
+        self._half_open_max = half_open_max_calls
+        self._redis = redis
+        self._open_key = f"{prefix}:{name}:open_until"
+        self._probe_key = f"{prefix}:{name}:probe"
+        self._clock = clock
+        self._calls: Deque[Tuple[float, bool]] = deque()
+        self._state = BreakerState.CLOSED
+        self._open_until = 0.0
+        self._probes = 0
+        BREAKER_STATE.labels(endpoint=name).set(0)
+
+    @property
+    def state(self) -> BreakerState:
+        return self._state
+
+    def error_rate(self) -> float:
+        self._prune(self._clock())
+        if not self._calls:
+            return 0.0
+        return sum(1 for _ts, ok in self._calls if not ok) / len(self._calls)
+
+    async def allow(self) -> None:
+        """Raise :class:`CircuitOpenError` unless a call may go through now."""
+
+        now = self._clock()
+        if self._redis is not None and self._state is BreakerState.CLOSED:
+            shared_until = await self._redis.get(self._open_key)
+            if shared_until and float(shared_until) > now:
+                self._transition(BreakerState.OPEN)
+                self._open_until = float(shared_until)
+
+        if self._state is BreakerState.OPEN:
+            if now < self._open_until:
+                raise CircuitOpenError(f"Circuito abierto para DGII ({self.name})")
+            self._transition(BreakerState.HALF_OPEN)
+            self._probes = 0
+
+        if self._state is BreakerState.HALF_OPEN:
+            if self._probes >= self._half_open_max:
+                raise CircuitOpenError(f"Circuito semiabierto para DGII ({self.name}); sondeo en curso")
+            if self._redis is not None:
+                ttl_ms = max(1, int(self._open_seconds * 1000))
+                if not await self._redis.set(self._probe_key, "1", nx=True, px=ttl_ms):
+                    raise CircuitOpenError(f"Circuito semiabierto para DGII ({self.name}); sondeo en curso")
+            self._probes += 1
+
+    async def record_success(self) -> None:
+        if self._state is BreakerState.HALF_OPEN:
+            self._calls.clear()
+            self._transition(BreakerState.CLOSED)
+            if self._redis is not None:
+                await self._redis.delete(self._open_key, self._probe_key)
+            return
+        self._record(True)
+
+    async def record_failure(self) -> None:
+        if self._state is BreakerState.HALF_OPEN:
+            await self._trip()
+            return
+        self._record(False)
+        if len(self._calls) >= self._min_calls and self.error_rate() >= self._threshold:
+            await self._trip()
+
+    async def record_release(self) -> None:
+        """Release a half-open probe slot when the call was neither success nor failure."""
+
+        if self._state is BreakerState.HALF_OPEN and self._probes:
+            self._probes -= 1
+            if self._redis is not None:
+                await self._redis.delete(self._probe_key)
+
+    def _record(self, ok: bool) -> None:
+        now = self._clock()
+        self._calls.append((now, ok))
+        self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        horizon = now - self._window
+        while self._calls and self._calls[0][0] < horizon:
+            self._calls.popleft()
+
+    async def _trip(self) -> None:
+        self._open_until = self._clock() + self._open_seconds
+        self._calls.clear()
+        self._transition(BreakerState.OPEN)
+        if self._redis is not None:
+            ttl_ms = max(1, int(self._open_seconds * 1000))
+            await self._redis.set(self._open_key, repr(self._open_until), px=ttl_ms)
+            await self._redis.delete(self._probe_key)
+
+    def _transition(self, state: BreakerState) -> None:
+        if state is self._state:
+            return
+        self._state = state
+        BREAKER_STATE.labels(endpoint=self.name).set(_STATE_VALUES[state])
+        BREAKER_TRANSITIONS.labels(endpoint=self.name, state=state.value).inc()
+        bind_request_context(endpoint=self.name).warning("Circuito DGII cambia de estado", estado=state.value)
+
+
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call("hmget", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call("hset", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("pexpire", KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RateGovernor:
+    """Token bucket per endpoint; callers wait for a token instead of hammering DGII."""
+
+    def __init__(
+        self,
+        rates: Mapping[str, float] | None = None,
+        *,
+        burst_seconds: float = 1.0,
+        max_wait_seconds: float = 10.0,
+        redis: Any | None = None,
+        prefix: str = "dgii:rate",
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._rates = dict(DEFAULT_RATE_LIMITS if rates is None else rates)
+        self._burst_seconds = burst_seconds
+        self._max_wait = max_wait_seconds
+        self._redis = redis
+        self._prefix = prefix
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def acquire(self, endpoint: str) -> float:
+        """Take one token for ``endpoint``; returns the seconds spent waiting."""
+
+        rate = self._rates.get(endpoint)
+        if not rate:
+            return 0.0
+        burst = max(1.0, rate * self._burst_seconds)
+        waited = 0.0
+        while True:
+            wait = await self._take(endpoint, rate, burst)
+            if wait <= 0:
+                GOVERNOR_WAIT.labels(endpoint=endpoint).observe(waited)
+                return waited
+            if waited + wait > self._max_wait:
+                raise RateLimitExceededError(f"Límite de tasa DGII excedido para {endpoint}")
+            await asyncio.sleep(wait)
+            waited += wait
+
+    async def _take(self, endpoint: str, rate: float, burst: float) -> float:
+        now = self._clock()
+        if self._redis is not None:
+            key = f"{self._prefix}:{endpoint}"
+            return float(await self._redis.eval(_TOKEN_BUCKET_SCRIPT, 1, key, rate, burst, now))
+        tokens, ts = self._buckets.get(endpoint, (burst, now))
+        tokens = min(burst, tokens + max(0.0, now - ts) * rate)
+        if tokens >= 1:
+            self._buckets[endpoint] = (tokens - 1, now)
+            return 0.0
+        self._buckets[endpoint] = (tokens, now)
+        return (1 - tokens) / rate
+
+
+class Resilience:
+    """Entry point used by the HTTP clients: one guard per outgoing attempt."""
+
+    def __init__(
+        self,
+        *,
+        governor: RateGovernor | None = None,
+        breaker_factory: Callable[[str], CircuitBreaker] | None = None,
+    ) -> None:
+        self.governor = governor or RateGovernor()
+        self._breaker_factory = breaker_factory or CircuitBreaker
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = self._breaker_factory(endpoint)
+        return breaker
+
+    def states(self) -> Dict[str, str]:
+        return {name: breaker.state.value for name, breaker in self._breakers.items()}
+
+    @asynccontextmanager
+    async def guard(self, endpoint: str) -> AsyncIterator[None]:
+        breaker = self.breaker(endpoint)
+        await breaker.allow()
+        try:
+            await self.governor.acquire(endpoint)
+        except BaseException:
+            await breaker.record_release()
+            raise
+        try:
+            yield
+        except BaseException as exc:
+            if counts_as_failure(exc):
+                await breaker.record_failure()
+            elif isinstance(exc, Exception):
+                # A 4xx means DGII is up and answering.
+                await breaker.record_success()
+            else:
+                await breaker.record_release()
+            raise
+        await breaker.record_success()
+
+
+def build_resilience(config: Any | None = None) -> Resilience:
+    """Build the shared component from ``dgii_*`` settings."""
+
+    if config is None:
+        from app.infra.settings import settings as config
+
+    redis_client: Optional[Any] = None
+    if config.dgii_resilience_backend == "redis":
+        import redis.asyncio as redis  # type: ignore[import-not-found]
+
+        redis_client = redis.from_url(config.redis_url, decode_responses=True)
+
+    def make_breaker(endpoint: str) -> CircuitBreaker:
+        return CircuitBreaker(
+            endpoint,
+            failure_rate_threshold=config.dgii_breaker_failure_rate,
+            min_calls=config.dgii_circuit_breaker_threshold,
+            window_seconds=config.dgii_circuit_breaker_window,
+            open_seconds=config.dgii_breaker_open_seconds,
+            redis=redis_client,
+        )
+
+    return Resilience(
+        governor=RateGovernor(config.dgii_rate_limits, redis=redis_client),
+        breaker_factory=make_breaker,
+    )
+
+
+resilience = build_resilience()
@@ -7,10 +7,13 @@ from typing import Any, Type
 from httpx import HTTPError, HTTPStatusError
 from tenacity import AsyncRetrying, RetryCallState, RetryError, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 
-from app.dgii.exceptions import DGIIRetryableError
+from app.dgii.exceptions import CircuitOpenError, DGIIRetryableError, RateLimitExceededError
 
 
 def _is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (CircuitOpenError, RateLimitExceededError)):
+        # Retrying immediately cannot help; callers decide when to come back.
+        return False
     if isinstance(exc, DGIIRetryableError):
         return True
     if isinstance(exc, HTTPStatusError):
@@ -5,7 +5,9 @@ from datetime import date, datetime
 from decimal import Decimal
 from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from app.billing.validators import validate_rnc_comprador
 
 from app.dgii.models import (
     ACECFRequest,
@@ -49,6 +51,12 @@ class ECFSubmission(BaseModel):
     moneda: str = Field("DOP", max_length=3)
     items: List[ECFItem] = Field(default_factory=list)
 
+    @field_validator("rnc_receptor")
+    @classmethod
+    def _check_rnc_receptor(cls, value: str) -> str:
+        validate_rnc_comprador(value)
+        return value
+
     def to_model(self) -> ECFRequest:
         return ECFRequest(
             encf=self.encf,
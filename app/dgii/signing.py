@@ -7,21 +7,28 @@ from signxml import (
     CanonicalizationMethod,
     SignatureConstructionMethod,
 )
-from cryptography.hazmat.primitives.serialization import pkcs12
+
+from app.dgii.exceptions import DGIISignError
+from app.security.keystore import KeyStoreError, key_cache
+
 
 class XMLSigningService:
-    def __init__(self, p12_path: str, p12_password: str):
+    def __init__(self, p12_path: str, p12_password: str, *, tenant: str | None = None):
         """
         Initializes the XML signing service with a PKCS#12 certificate.
 
+        The decoded key material is shared through the process-wide key cache,
+        so constructing the service repeatedly does not re-parse the bundle.
+
         :param p12_path: The path to the PKCS#12 file (.p12).
         :param p12_password: The password for the PKCS#12 file.
+        :param tenant: Optional tenant identifier used to scope the cache entry.
         """
-        with open(p12_path, "rb") as f:
-            p12 = pkcs12.load_key_and_certificates(f.read(), p12_password.encode())
+        material = key_cache.load(p12_path, p12_password, tenant=tenant)
 
-        self.private_key = p12[0]
-        self.certificate = p12[1]
+        self.private_key = material.private_key
+        self.certificate = material.certificate
+        self.cert_pem = material.cert_pem
 
     def sign_xml(self, xml_content: bytes) -> bytes:
         """
@@ -42,12 +49,30 @@ class XMLSigningService:
         signed_root = signer.sign(
             root,
             key=self.private_key,
-            cert=self.certificate.public_bytes(pkcs12.Encoding.PEM),
-            reference_uri="",
+            cert=self.cert_pem,
         )
 
         return etree.tostring(signed_root, encoding="utf-8")
 
+
+def sign_ecf(xml_bytes: bytes, p12_path: str, p12_password: str, *, tenant: str | None = None) -> bytes:
+    """
+    Signs an e-CF document with the given PKCS#12 bundle.
+
+    :param xml_bytes: The XML document to sign.
+    :param p12_path: The path to the PKCS#12 file (.p12).
+    :param p12_password: The password for the PKCS#12 file.
+    :param tenant: Optional tenant identifier used to scope the key cache.
+    :return: The signed XML content, as bytes.
+    """
+    try:
+        return XMLSigningService(p12_path, p12_password, tenant=tenant).sign_xml(xml_bytes)
+    except KeyStoreError as exc:
+        raise DGIISignError(str(exc)) from exc
+    except etree.XMLSyntaxError as exc:
+        raise DGIISignError("Documento XML inválido para firma") from exc
+
+
 def verify_xml_signature(signed_xml_content: bytes, certificate: bytes) -> bool:
     """
     Verifies the digital signature of an XML document.
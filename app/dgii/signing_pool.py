@@ -0,0 +1,197 @@
+"""Bounded worker pool that keeps XML signing off the event loop."""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.config import Settings, settings
+from app.core.logging import bind_request_context
+from app.dgii.exceptions import DGIISignError
+from app.dgii.signing import sign_ecf
+from app.security.keystore import key_cache
+
+SIGNING_INFLIGHT = Gauge("dgii_signing_pool_inflight", "Firmas en cola o en ejecución", ["pool"])
+SIGNING_REJECTED = Counter("dgii_signing_pool_rejected_total", "Firmas rechazadas por saturación", ["pool"])
+SIGNING_DURATION = Histogram(
+    "dgii_signing_duration_seconds",
+    "Duración de firma incluyendo espera en cola",
+    ["pool"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+_MODES = {"process", "thread", "inline"}
+
+
+class SigningBackpressureError(DGIISignError):
+    """Raised when the signing pool queue is full."""
+
+
+@dataclass(frozen=True, slots=True)
+class SigningCredentials:
+    p12_path: str
+    password: str
+
+
+def _preload_keys(credentials: Tuple[Tuple[str, str, str], ...]) -> None:
+    """Worker initializer: warm the process-local key cache."""
+
+    for tenant, p12_path, password in credentials:
+        try:
+            key_cache.load(p12_path, password, tenant=tenant or None)
+        except Exception:  # noqa: BLE001 - a bad bundle must not kill the worker
+            continue
+
+
+def _sign_in_worker(xml_bytes: bytes, p12_path: str, password: str, tenant: str | None) -> bytes:
+    return sign_ecf(xml_bytes, p12_path, password, tenant=tenant)
+
+
+class SigningPool:
+    """Async facade over a process/thread pool with a bounded backlog."""
+
+    def __init__(
+        self,
+        *,
+        name: str = "default",
+        mode: str = "process",
+        max_workers: int = 2,
+        max_pending: int = 64,
+        default_credentials: SigningCredentials | None = None,
+        config: Settings | None = None,
+    ) -> None:
+        if mode not in _MODES:
+            raise ValueError(f"Modo de pool de firma no soportado: {mode}")
+        self.config = config or settings
+        self.name = name
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._default_credentials = default_credentials
+        self._tenants: Dict[str, SigningCredentials] = {}
+        self._executor: Executor | None = None
+        self._pending = 0
+        self._processed = 0
+        self._rejected = 0
+
+    def register_tenant(self, tenant: str, p12_path: str, password: str) -> None:
+        """Associate a tenant with its own PKCS#12 bundle."""
+
+        self._tenants[tenant] = SigningCredentials(p12_path=str(p12_path), password=password)
+
+    def start(self) -> None:
+        """Create the executor eagerly so workers preload keys before traffic."""
+
+        if self._executor is not None or self.mode == "inline":
+            return
+        initargs = (self._preload_spec(),)
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_preload_keys,
+                initargs=initargs,
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=f"signing-{self.name}",
+                initializer=_preload_keys,
+                initargs=initargs,
+            )
+        bind_request_context(pool=self.name, mode=self.mode, workers=self.max_workers).info("Pool de firma iniciado")
+
+    def stop(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def sign_async(
+        self,
+        xml_bytes: bytes,
+        tenant: str | None = None,
+        *,
+        p12_path: str | None = None,
+        password: str | None = None,
+    ) -> bytes:
+        """Sign ``xml_bytes`` in the pool, failing fast when the backlog is full."""
+
+        credentials = self._resolve_credentials(tenant, p12_path, password)
+        cache_scope = tenant if tenant in self._tenants else None
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            SIGNING_REJECTED.labels(self.name).inc()
+            raise SigningBackpressureError("Cola de firma saturada, intente nuevamente")
+
+        self._pending += 1
+        SIGNING_INFLIGHT.labels(self.name).inc()
+        started = time.perf_counter()
+        try:
+            if self.mode == "inline":
+                return _sign_in_worker(xml_bytes, credentials.p12_path, credentials.password, cache_scope)
+            self.start()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor,
+                _sign_in_worker,
+                xml_bytes,
+                credentials.p12_path,
+                credentials.password,
+                cache_scope,
+            )
+        finally:
+            self._pending -= 1
+            self._processed += 1
+            SIGNING_INFLIGHT.labels(self.name).dec()
+            SIGNING_DURATION.labels(self.name).observe(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, int | str]:
+        return {
+            "pool": self.name,
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "processed": self._processed,
+            "rejected": self._rejected,
+        }
+
+    def _resolve_credentials(
+        self, tenant: str | None, p12_path: Optional[str], password: Optional[str]
+    ) -> SigningCredentials:
+        if p12_path is not None:
+            return SigningCredentials(p12_path=str(p12_path), password=password or "")
+        if tenant and tenant in self._tenants:
+            return self._tenants[tenant]
+        if self._default_credentials is not None:
+            return self._default_credentials
+        return SigningCredentials(
+            p12_path=str(self.config.dgii_cert_p12_path),
+            password=self.config.dgii_cert_p12_password,
+        )
+
+    def _preload_spec(self) -> Tuple[Tuple[str, str, str], ...]:
+        default = self._resolve_credentials(None, None, None)
+        spec = [("", default.p12_path, default.password)]
+        spec.extend((tenant, creds.p12_path, creds.password) for tenant, creds in self._tenants.items())
+        return tuple(spec)
+
+
+signing_pool = SigningPool(
+    mode=settings.signing_pool_mode,
+    max_workers=settings.signing_pool_workers,
+    max_pending=settings.signing_pool_max_pending,
+)
+
+
+async def start_signing_pool() -> None:
+    signing_pool.start()
+
+
+async def stop_signing_pool() -> None:
+    signing_pool.stop()
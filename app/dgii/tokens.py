@@ -0,0 +1,227 @@
+"""DGII bearer token cache shared across requests, coroutines and workers."""
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+import weakref
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.logging import bind_request_context
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass(slots=True)
+class CachedToken:
+    access_token: str
+    expires_at: datetime
+
+    @property
+    def is_valid(self) -> bool:
+        return self.expires_at - timedelta(seconds=30) > datetime.now(timezone.utc)
+
+    def remaining(self) -> float:
+        return (self.expires_at - datetime.now(timezone.utc)).total_seconds()
+
+    def to_json(self) -> str:
+        return json.dumps({"access_token": self.access_token, "expires_at": self.expires_at.isoformat()})
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> "CachedToken":
+        data = json.loads(raw)
+        return cls(access_token=data["access_token"], expires_at=datetime.fromisoformat(data["expires_at"]))
+
+
+TokenFetcher = Callable[[], Awaitable[CachedToken]]
+
+
+class TokenManager:
+    """Caches DGII tokens per ``tenant:environment`` key.
+
+    Lookups go to the in-process cache, then Redis (when configured). Only one
+    coroutine per process and, through a Redis ``SET NX`` lock, one worker in
+    the cluster runs the seed → sign → token exchange for a key; the others
+    wait for the token it publishes. Tokens entering the refresh margin are
+    still served while a single background refresh replaces them.
+    """
+
+    def __init__(
+        self,
+        *,
+        redis: Any | None = None,
+        prefix: str = "dgii:token",
+        refresh_margin_seconds: float = 120.0,
+        min_validity_seconds: float = 30.0,
+        lock_ttl_seconds: float = 30.0,
+        wait_seconds: float = 15.0,
+        poll_seconds: float = 0.1,
+    ) -> None:
+        self._redis = redis
+        self._prefix = prefix
+        self._refresh_margin = refresh_margin_seconds
+        self._min_validity = min_validity_seconds
+        self._lock_ttl_ms = max(1, int(lock_ttl_seconds * 1000))
+        self._wait_seconds = wait_seconds
+        self._poll_seconds = poll_seconds
+        self._tokens: Dict[str, CachedToken] = {}
+        self._loop_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.refreshes = 0
+
+    @staticmethod
+    def key_for(tenant: str | None, environment: str) -> str:
+        return f"{tenant or 'default'}:{environment}".lower()
+
+    async def get_token(self, key: str, fetch: TokenFetcher, *, force_refresh: bool = False) -> str:
+        """Return a usable token for ``key``, running ``fetch`` at most once concurrently."""
+
+        if not force_refresh:
+            token = self._usable(self._tokens.get(key))
+            if token is not None:
+                self._maybe_refresh_in_background(key, token, fetch)
+                return token.access_token
+
+        state = self._state()
+        async with state.lock(key):
+            if not force_refresh:
+                token = self._usable(self._tokens.get(key)) or self._usable(await self._load_shared(key))
+                if token is not None:
+                    self._tokens[key] = token
+                    return token.access_token
+            token = await self._refresh(key, fetch)
+            return token.access_token
+
+    async def invalidate(self, key: str, access_token: str | None = None) -> None:
+        """Drop the cached token (only if it still is ``access_token`` when given)."""
+
+        current = self._tokens.get(key)
+        if current is not None and access_token in (None, current.access_token):
+            self._tokens.pop(key, None)
+        if self._redis is not None:
+            shared = await self._load_shared(key)
+            if shared is not None and access_token in (None, shared.access_token):
+                await self._redis.delete(self._token_key(key))
+
+    def clear(self) -> None:
+        self._tokens.clear()
+
+    def _usable(self, token: CachedToken | None) -> CachedToken | None:
+        if token is None or token.remaining() <= self._min_validity:
+            return None
+        return token
+
+    def _maybe_refresh_in_background(self, key: str, token: CachedToken, fetch: TokenFetcher) -> None:
+        if token.remaining() > self._refresh_margin:
+            return
+        state = self._state()
+        task = state.background.get(key)
+        if task is not None and not task.done():
+            return
+
+        async def refresh() -> None:
+            try:
+                async with state.lock(key):
+                    current = self._tokens.get(key)
+                    if current is not None and current.remaining() > self._refresh_margin:
+                        return
+                    await self._refresh(key, fetch)
+            except Exception as exc:  # noqa: BLE001 - the current token is still valid
+                bind_request_context(token_key=key).warning("Renovación anticipada de token DGII falló", error=str(exc))
+
+        state.background[key] = asyncio.create_task(refresh())
+
+    async def _refresh(self, key: str, fetch: TokenFetcher) -> CachedToken:
+        if self._redis is None:
+            return await self._fetch_and_store(key, fetch)
+
+        lock_key = f"{self._token_key(key)}:lock"
+        owner = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._wait_seconds
+        while True:
+            if await self._redis.set(lock_key, owner, nx=True, px=self._lock_ttl_ms):
+                try:
+                    shared = await self._load_shared(key)
+                    if shared is not None and shared.remaining() > self._refresh_margin:
+                        self._tokens[key] = shared
+                        return shared
+                    return await self._fetch_and_store(key, fetch)
+                finally:
+                    await self._redis.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, owner)
+            # Another worker is refreshing; pick its token up once published.
+            await asyncio.sleep(self._poll_seconds)
+            shared = self._usable(await self._load_shared(key))
+            current = self._tokens.get(key)
+            if shared is not None and (current is None or shared.access_token != current.access_token):
+                self._tokens[key] = shared
+                return shared
+            if loop.time() >= deadline:
+                bind_request_context(token_key=key).warning("Espera de token DGII agotada; se renueva localmente")
+                return await self._fetch_and_store(key, fetch)
+
+    async def _fetch_and_store(self, key: str, fetch: TokenFetcher) -> CachedToken:
+        token = await fetch()
+        self.refreshes += 1
+        self._tokens[key] = token
+        if self._redis is not None:
+            ttl_ms = int(token.remaining() * 1000)
+            if ttl_ms > 0:
+                await self._redis.set(self._token_key(key), token.to_json(), px=ttl_ms)
+        bind_request_context(token_key=key).info("Token DGII renovado", expires_at=token.expires_at.isoformat())
+        return token
+
+    async def _load_shared(self, key: str) -> Optional[CachedToken]:
+        if self._redis is None:
+            return None
+        raw = await self._redis.get(self._token_key(key))
+        return CachedToken.from_json(raw) if raw else None
+
+    def _token_key(self, key: str) -> str:
+        return f"{self._prefix}:{key}"
+
+    def _state(self) -> "_LoopState":
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.get(loop)
+        if state is None:
+            state = self._loop_state[loop] = _LoopState()
+        return state
+
+
+class _LoopState:
+    """asyncio primitives are loop-bound, so locks and tasks are kept per loop."""
+
+    def __init__(self) -> None:
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.background: Dict[str, asyncio.Task[None]] = {}
+
+    def lock(self, key: str) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+
+def build_token_manager(config: Any | None = None) -> TokenManager:
+    """Build the manager selected by ``dgii_token_cache`` in the settings."""
+
+    if config is None:
+        from app.infra.settings import settings as config
+
+    redis_client = None
+    if config.dgii_token_cache == "redis":
+        import redis.asyncio as redis  # type: ignore[import-not-found]
+
+        redis_client = redis.from_url(config.redis_url, decode_responses=True)
+    return TokenManager(redis=redis_client, refresh_margin_seconds=config.dgii_token_refresh_margin_seconds)
+
+
+token_manager = build_token_manager()
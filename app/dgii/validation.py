@@ -1,22 +1,162 @@
-from lxml import etree
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, FrozenSet
+
+import structlog
+from lxml import etree
 
 XSD_DIR = Path(__file__).parent.parent.parent / "xsd"
 
+_XSD_NS = "{http://www.w3.org/2001/XMLSchema}"
+
+logger = structlog.get_logger(__name__)
+
+
+class XSDValidationError(ValueError):
+    """Raised when a document does not conform to its XSD schema."""
+
+
+@dataclass
+class CompiledSchema:
+    """A compiled ``etree.XMLSchema`` plus metadata gathered at compile time."""
+
+    name: str
+    path: Path
+    schema: etree.XMLSchema
+    compile_seconds: float
+    root_elements: FrozenSet[str]
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def validate(self, document: etree._Element | etree._ElementTree) -> None:
+        """
+        Validates a parsed document, raising ``XSDValidationError`` on failure.
+
+        libxml2 keeps per-schema validation state, so validations against the
+        same compiled schema are serialized.
+
+        :param document: The parsed XML document or root element.
+        """
+        with self._lock:
+            if self.schema.validate(document):
+                return
+            error = self.schema.error_log.last_error
+        message = error.message if error is not None else "Documento inválido"
+        raise XSDValidationError(f"{self.name}: {message}")
+
+    def is_valid(self, document: etree._Element | etree._ElementTree) -> bool:
+        try:
+            self.validate(document)
+        except XSDValidationError:
+            return False
+        return True
+
+
+class SchemaRegistry:
+    """Process-wide registry compiling each XSD under ``xsd/`` at most once."""
+
+    def __init__(self, base_dir: Path = XSD_DIR):
+        self.base_dir = base_dir
+        self._schemas: Dict[str, CompiledSchema] = {}
+        self._lock = threading.Lock()
+
+    def get(self, xsd_file: str) -> CompiledSchema:
+        """
+        Returns the compiled schema for ``xsd_file``, compiling it on first use.
+
+        :param xsd_file: Filename relative to the XSD directory (matched case-insensitively).
+        """
+        compiled = self._schemas.get(xsd_file)
+        if compiled is not None:
+            return compiled
+        with self._lock:
+            compiled = self._schemas.get(xsd_file)
+            if compiled is None:
+                xsd_path = self.resolve(xsd_file)
+                compiled = self._schemas.get(xsd_path.name) or self._compile(xsd_path)
+                self._schemas[xsd_path.name] = compiled
+                self._schemas[xsd_file] = compiled
+        return compiled
+
+    def resolve(self, xsd_file: str) -> Path:
+        xsd_path = self.base_dir / xsd_file
+        if xsd_path.exists():
+            return xsd_path
+        wanted = Path(xsd_file).name.lower()
+        for candidate in self.base_dir.glob("*.xsd"):
+            if candidate.name.lower() == wanted:
+                return candidate
+        raise FileNotFoundError(f"XSD schema not found at: {xsd_path}")
+
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Compiles every schema in the XSD directory.
+
+        Intended for gunicorn's ``post_fork`` hook so workers never pay the
+        compile cost on a live request.
+
+        :return: Compile time in seconds per schema file.
+        """
+        for xsd_path in sorted(self.base_dir.glob("*.xsd")):
+            try:
+                self.get(xsd_path.name)
+            except etree.XMLSchemaParseError as exc:
+                # A broken schema must not prevent the worker from booting.
+                logger.error("xsd.registry.invalid_schema", schema=xsd_path.name, error=str(exc))
+        timings = self.timings()
+        logger.info("xsd.registry.warmed", schemas=len(timings), seconds=round(sum(timings.values()), 4))
+        return timings
+
+    def timings(self) -> Dict[str, float]:
+        with self._lock:
+            return {name: compiled.compile_seconds for name, compiled in self._schemas.items() if name == compiled.name}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._schemas.clear()
+
+    def _compile(self, xsd_path: Path) -> CompiledSchema:
+        started = time.perf_counter()
+        schema_doc = etree.parse(str(xsd_path))
+        schema = etree.XMLSchema(schema_doc)
+        elapsed = time.perf_counter() - started
+        roots = frozenset(
+            element.get("name")
+            for element in schema_doc.getroot().iterchildren(f"{_XSD_NS}element")
+            if element.get("name")
+        )
+        logger.info("xsd.registry.compiled", schema=xsd_path.name, seconds=round(elapsed, 4))
+        return CompiledSchema(
+            name=xsd_path.name,
+            path=xsd_path,
+            schema=schema,
+            compile_seconds=elapsed,
+            root_elements=roots,
+        )
+
+
+schema_registry = SchemaRegistry()
+
+
+def warm_up_schemas() -> Dict[str, float]:
+    """Compiles all known schemas in the current process."""
+
+    return schema_registry.warm_up()
+
+
 class XSDValidator:
     def __init__(self, xsd_file: str):
         """
         Initializes the XSD validator with a specific XSD schema.
 
+        The compiled schema is shared through ``schema_registry``.
+
         :param xsd_file: The filename of the XSD schema to use for validation.
         """
-        xsd_path = XSD_DIR / xsd_file
-        if not xsd_path.exists():
-            raise FileNotFoundError(f"XSD schema not found at: {xsd_path}")
-
-        with open(xsd_path, "rb") as f:
-            xmlschema_doc = etree.parse(f)
-        self.schema = etree.XMLSchema(xmlschema_doc)
+        self.compiled = schema_registry.get(xsd_file)
+        self.schema = self.compiled.schema
 
     def validate_xml(self, xml_content: bytes) -> bool:
         """
@@ -27,36 +167,59 @@ class XSDValidator:
         """
         try:
             xml_doc = etree.fromstring(xml_content)
-            self.schema.assertValid(xml_doc)
-            return True
-        except etree.DocumentInvalid:
-            return False
         except etree.XMLSyntaxError:
             return False
+        return self.compiled.is_valid(xml_doc)
+
+
+SCHEMA_MAP = {
+    "31": "e-CF 31 v.1.0.xsd",
+    "32": "e-CF 32 v.1.0.xsd",
+    "33": "e-CF 33 v.1.0.xsd",
+    "34": "e-CF 34 v.1.0.xsd",
+    "41": "e-CF 41 v.1.0.xsd",
+    "43": "e-CF 43 v.1.0.xsd",
+    "44": "e-CF 44 v.1.0.xsd",
+    "45": "e-CF 45 v.1.0.xsd",
+    "46": "e-CF 46 v.1.0.xsd",
+    "47": "e-CF 47 v.1.0.xsd",
+    "ARECF": "ARECF v1.0.xsd",
+    "ACECF": "ACECF v.1.0.xsd",
+    "ANECF": "ANECF v.1.0.xsd",
+    "RFCE": "RFCE 32 v.1.0.xsd",
+}
+
+
+@lru_cache(maxsize=None)
+def _validator_for_file(xsd_file: str) -> XSDValidator:
+    return XSDValidator(xsd_file)
+
 
 def get_validator_for(e_cf_type: str) -> XSDValidator:
     """
     Factory function to get a validator for a specific e-CF type.
     """
-    schema_map = {
-        "31": "e-CF 31 v.1.0.xsd",
-        "32": "e-CF 32 v.1.0.xsd",
-        "33": "e-CF 33 v.1.0.xsd",
-        "34": "e-CF 34 v.1.0.xsd",
-        "41": "e-CF 41 v.1.0.xsd",
-        "43": "e-CF 43 v.1.0.xsd",
-        "44": "e-CF 44 v.1.0.xsd",
-        "45": "e-CF 45 v.1.0.xsd",
-        "46": "e-CF 46 v.1.0.xsd",
-        "47": "e-CF 47 v.1.0.xsd",
-        "ARECF": "ARECF v1.0.xsd",
-        "ACECF": "ACECF v.1.0.xsd",
-        "ANECF": "ANECF v.1.0.xsd",
-        "RFCE": "RFCE 32 v.1.0.xsd",
-    }
-
-    xsd_file = schema_map.get(e_cf_type)
+    xsd_file = SCHEMA_MAP.get(e_cf_type)
     if not xsd_file:
         raise ValueError(f"Unknown e-CF type: {e_cf_type}")
 
-    return XSDValidator(xsd_file)
+    return _validator_for_file(xsd_file)
+
+
+def validate_xml(xml_content: bytes | etree._Element, xsd_file: str) -> etree._Element:
+    """
+    Validates a document against a registered schema, raising on failure.
+
+    Raw bytes are parsed with the hardened parser from ``app.security.xml``.
+
+    :param xml_content: Raw XML bytes or an already parsed root element.
+    :param xsd_file: Schema filename inside the XSD directory.
+    :return: The validated root element.
+    """
+    compiled = schema_registry.get(xsd_file)
+    if isinstance(xml_content, (bytes, bytearray)):
+        from app.security.xml import parse_secure
+
+        xml_content = parse_secure(bytes(xml_content))
+    compiled.validate(xml_content)
+    return xml_content
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from functools import lru_cache
-from typing import List, Set
+from typing import Dict, List, Literal, Set
 
 from pydantic import AliasChoices, AnyUrl, Field, computed_field, constr, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -48,9 +48,32 @@ class Settings(BaseSettings):
     dgii_max_retries: int = Field(default=3, ge=0)
     dgii_circuit_breaker_threshold: int = Field(default=5, ge=1)
     dgii_circuit_breaker_window: int = Field(default=60, ge=1)
+    dgii_breaker_failure_rate: float = Field(default=0.5, gt=0, le=1)
+    dgii_breaker_open_seconds: float = Field(default=30.0, gt=0)
+    dgii_resilience_backend: Literal["memory", "redis"] = Field(default="memory")
+    dgii_rate_limits: Dict[str, float] = Field(
+        default_factory=lambda: {"auth": 5.0, "recepcion": 50.0, "recepcion_fc": 50.0, "directorio": 20.0}
+    )
+
+    dgii_token_cache: Literal["memory", "redis"] = Field(default="memory")
+    dgii_token_refresh_margin_seconds: float = Field(default=120.0, ge=0)
+    dgii_status_concurrency: int = Field(default=16, ge=1, le=256)
+    dgii_directory_cache: Literal["memory", "redis"] = Field(default="memory")
+    dgii_directory_ttl_seconds: float = Field(default=24 * 60 * 60, gt=0)
+    dgii_directory_stale_seconds: float = Field(default=24 * 60 * 60, ge=0)
+    dgii_directory_negative_ttl_seconds: float = Field(default=60 * 60, ge=0)
+    dgii_directory_max_entries: int = Field(default=50_000, ge=1)
 
     dgii_p12_path: str = Field(default="/secrets/cert.p12")
     dgii_p12_password: str = Field(default="changeit")
+    signing_key_cache_ttl_seconds: float = Field(default=3600.0, gt=0)
+    signing_key_cache_max_entries: int = Field(default=32, ge=1)
+
+    idempotency_backend: Literal["memory", "redis"] = Field(default="memory")
+    idempotency_ttl_seconds: float = Field(default=24 * 60 * 60, gt=0)
+    idempotency_max_entries: int = Field(default=10_000, ge=1)
+    idempotency_lock_ttl_seconds: float = Field(default=60.0, gt=0)
+    idempotency_wait_seconds: float = Field(default=30.0, ge=0)
 
     @computed_field
     @property
@@ -58,17 +81,25 @@ class Settings(BaseSettings):
         """Ensure the SQLAlchemy URL uses an async driver."""
 
         url = make_url(self.database_url)
-        if url.drivername.endswith("+asyncpg"):
+        dialect = url.drivername.split("+", 1)[0]
+        driver = "aiosqlite" if dialect == "sqlite" else "asyncpg"
+        if url.drivername == f"{dialect}+{driver}":
             return self.database_url
 
-        if "+" in url.drivername:
-            dialect, _driver = url.drivername.split("+", 1)
-        else:
-            dialect = url.drivername
-
-        async_url = url.set(drivername=f"{dialect}+asyncpg")
+        async_url = url.set(drivername=f"{dialect}+{driver}")
         return async_url.render_as_string(hide_password=False)
 
+    @computed_field
+    @property
+    def sqlalchemy_sync_url(self) -> str:
+        """Blocking driver URL for admin reports and CLI tools."""
+
+        url = make_url(self.database_url)
+        dialect = url.drivername.split("+", 1)[0]
+        driver = "psycopg" if dialect == "postgresql" else None
+        sync_url = url.set(drivername=f"{dialect}+{driver}" if driver else dialect)
+        return sync_url.render_as_string(hide_password=False)
+
     @field_validator("cors_allow_origins", mode="before")
     @classmethod
     def _parse_origins(cls, value: List[str] | str) -> List[str]:
@@ -16,6 +16,9 @@ from app.api.router import api_router
 from app.routers import admin as admin_router
 from app.routers import cliente as cliente_router
 from app.db import check_database_connection
+from app.dgii.http_pool import close_http_pool
+from app.dgii.jobs import start_dispatcher, stop_dispatcher
+from app.dgii.signing_pool import start_signing_pool, stop_signing_pool
 from app.infra.logging import configure_logging
 from app.infra.settings import settings
 from app.security.auth import setup_security
@@ -95,10 +98,15 @@ def create_app() -> FastAPI:
         except Exception as exc:  # pragma: no cover - fail fast
             LOGGER.exception("Failed to initialise rate limiter", extra={"redis_url": settings.redis_url})
             raise RuntimeError("Redis connection failed during startup") from exc
+        await start_dispatcher()
+        await start_signing_pool()
 
     @app.on_event("shutdown")
     async def on_shutdown() -> None:
         await shutdown_rate_limiter(app)
+        await stop_dispatcher()
+        await stop_signing_pool()
+        await close_http_pool()
 
     @app.get("/health", tags=["infra"], include_in_schema=False)
     async def health() -> dict[str, str]:
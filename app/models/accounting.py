@@ -1,10 +1,11 @@
 """Modelos para contabilidad y configuración de tenants."""
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
 from typing import Optional, TYPE_CHECKING
 
-from sqlalchemy import DateTime, ForeignKey, Numeric, String, UniqueConstraint
+from sqlalchemy import Date, DateTime, ForeignKey, Index, Numeric, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
@@ -38,7 +39,7 @@ class InvoiceLedgerEntry(Base):
 
     __tablename__ = "invoice_ledger_entries"
 
-    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), index=True)
+    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"))
     invoice_id: Mapped[int | None] = mapped_column(ForeignKey("invoices.id", ondelete="SET NULL"), nullable=True)
     referencia: Mapped[str] = mapped_column(String(64))
     cuenta: Mapped[str] = mapped_column(String(64))
@@ -49,3 +50,29 @@ class InvoiceLedgerEntry(Base):
 
     tenant: Mapped[Tenant] = relationship(backref="ledger_entries")
     invoice: Mapped["Invoice | None"] = relationship(back_populates="ledger_entries")
+
+
+# Listado por tenant con paginación por cursor: (tenant_id, fecha DESC, id DESC)
+# cubre orden y filtro; invoice_id incluido para el join sin leer la tabla.
+Index(
+    "ix_invoice_ledger_entries_tenant_fecha",
+    InvoiceLedgerEntry.tenant_id,
+    InvoiceLedgerEntry.fecha.desc(),
+    InvoiceLedgerEntry.id.desc(),
+    postgresql_include=["invoice_id"],
+)
+
+
+class InvoiceRollup(Base):
+    """Totales mensuales de comprobantes por tenant, mantenidos al guardar cada ``Invoice``."""
+
+    __tablename__ = "invoice_monthly_rollups"
+    __table_args__ = (UniqueConstraint("tenant_id", "periodo", name="uq_invoice_monthly_rollups_periodo"),)
+
+    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"))
+    periodo: Mapped[date] = mapped_column(Date)  # primer día del mes de emisión
+    emitidos: Mapped[int] = mapped_column(default=0)
+    aceptados: Mapped[int] = mapped_column(default=0)
+    rechazados: Mapped[int] = mapped_column(default=0)
+    contabilizados: Mapped[int] = mapped_column(default=0)
+    monto: Mapped[Decimal] = mapped_column(Numeric(18, 2), default=Decimal("0"))
@@ -1,11 +1,11 @@
 """Modelos de planes de facturación y registros de uso."""
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import List, Optional
 
-from sqlalchemy import ForeignKey, Numeric, String
+from sqlalchemy import Date, ForeignKey, Index, Numeric, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
@@ -42,3 +42,40 @@ class UsageRecord(Base):
     tenant: Mapped["Tenant"] = relationship("Tenant", back_populates="usage_records")
     plan: Mapped[Optional[Plan]] = relationship("Plan", back_populates="usage_records")
     invoice: Mapped[Optional["Invoice"]] = relationship("Invoice")
+
+
+class UsageCounter(Base):
+    """Documentos y monto cargado por tenant en un mes; se actualiza junto a cada ``UsageRecord``."""
+
+    __tablename__ = "billing_usage_counters"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "periodo", name="uq_billing_usage_counters_periodo"),
+        Index("ix_billing_usage_counters_periodo", "periodo"),
+    )
+
+    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"))
+    periodo: Mapped[date] = mapped_column(Date)  # primer día del mes
+    documentos: Mapped[int] = mapped_column(default=0)
+    monto_cargado: Mapped[Decimal] = mapped_column(Numeric(16, 4), default=Decimal("0"))
+
+
+class BillingPeriod(Base):
+    """Mes de facturación cerrado; sus totales quedan en ``BillingPeriodSnapshot``."""
+
+    __tablename__ = "billing_periods"
+
+    periodo: Mapped[date] = mapped_column(Date, unique=True)
+    closed_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+
+
+class BillingPeriodSnapshot(Base):
+    """Resumen de facturación de un mes cerrado, una fila por tenant."""
+
+    __tablename__ = "billing_period_snapshots"
+    __table_args__ = (UniqueConstraint("periodo", "tenant_id", name="uq_billing_period_snapshots_tenant"),)
+
+    periodo: Mapped[date] = mapped_column(Date)
+    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"))
+    tenant_name: Mapped[str] = mapped_column(String(255))
+    invoice_count: Mapped[int] = mapped_column(default=0)
+    total_amount: Mapped[Decimal] = mapped_column(Numeric(16, 4), default=Decimal("0"))
@@ -4,7 +4,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import List
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Numeric, String
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Numeric, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
@@ -15,18 +15,22 @@ class Invoice(Base):
     """Representa un e-CF emitido por la plataforma."""
 
     __tablename__ = "invoices"
+    # Filtro por contabilizado del libro de asientos resuelto solo con el índice.
+    __table_args__ = (Index("ix_invoices_id_contabilizado", "id", "contabilizado"),)
 
-    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"))
+    # Las columnas con active_history alimentan los totales mensuales: el flush
+    # necesita su valor anterior aunque el atributo esté expirado.
+    tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"), active_history=True)
     encf: Mapped[str] = mapped_column(String(20), index=True)
     tipo_ecf: Mapped[str] = mapped_column(String(3))
     xml_path: Mapped[str] = mapped_column(String(255))
     xml_hash: Mapped[str] = mapped_column(String(128))
-    estado_dgii: Mapped[str] = mapped_column(String(30), default="pendiente")
+    estado_dgii: Mapped[str] = mapped_column(String(30), default="pendiente", active_history=True)
     track_id: Mapped[str | None] = mapped_column(String(64))
     codigo_seguridad: Mapped[str | None] = mapped_column(String(6))
-    total: Mapped[float] = mapped_column(Numeric(16, 2))
-    fecha_emision: Mapped[datetime] = mapped_column(default=datetime.utcnow)
-    contabilizado: Mapped[bool] = mapped_column(Boolean, default=False)
+    total: Mapped[float] = mapped_column(Numeric(16, 2), active_history=True)
+    fecha_emision: Mapped[datetime] = mapped_column(default=datetime.utcnow, active_history=True)
+    contabilizado: Mapped[bool] = mapped_column(Boolean, default=False, active_history=True)
     accounted_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     asiento_referencia: Mapped[str | None] = mapped_column(String(64))
 
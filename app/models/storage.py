@@ -1,6 +1,8 @@
 """Modelos para almacenamiento de XML y representaciones impresas."""
 from __future__ import annotations
 
+from typing import Optional
+
 from sqlalchemy import ForeignKey, String
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -15,8 +17,9 @@ class XMLStore(Base):
     tenant_id: Mapped[int] = mapped_column(ForeignKey("tenants.id", ondelete="CASCADE"))
     encf: Mapped[str] = mapped_column(String(20), index=True)
     kind: Mapped[str] = mapped_column(String(20))
-    path: Mapped[str] = mapped_column(String(255))
-    sha256: Mapped[str] = mapped_column(String(64))
+    path: Mapped[str] = mapped_column(String(255))  # llave en el archivo direccionado por contenido
+    sha256: Mapped[str] = mapped_column(String(64), index=True)
+    size_bytes: Mapped[Optional[int]] = mapped_column()
 
 
 class RIStore(Base):
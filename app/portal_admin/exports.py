@@ -0,0 +1,244 @@
+"""Exportación en streaming de comprobantes, asientos y consumo por tenant.
+
+Las filas se leen con un cursor del servidor (``yield_per``) y se serializan
+por lotes a CSV, NDJSON o Parquet, de modo que la memoria usada depende del
+tamaño del lote y no del rango exportado. Parquet requiere ``pyarrow``
+(extra opcional ``parquet``); cada lote se escribe como un *row group*.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Literal, Sequence, Tuple
+
+from sqlalchemy import Boolean, DateTime, Integer, Numeric, select
+from sqlalchemy.orm import InstrumentedAttribute, Session
+
+from app.core.config import settings
+from app.models.accounting import InvoiceLedgerEntry
+from app.models.billing import UsageRecord
+from app.models.invoice import Invoice
+
+Formato = Literal["csv", "ndjson", "parquet"]
+SessionFactory = Callable[[], AbstractContextManager[Session]]
+
+MEDIA_TYPES: Dict[str, str] = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+_CHUNK_BYTES = 64 * 1024
+
+
+class ExportUnavailableError(RuntimeError):
+    """El formato solicitado depende de un paquete no instalado."""
+
+
+@dataclass(frozen=True)
+class ExportSpec:
+    tenant_column: InstrumentedAttribute
+    date_column: InstrumentedAttribute
+    columns: Tuple[InstrumentedAttribute, ...]
+
+    @property
+    def names(self) -> List[str]:
+        return [column.key for column in self.columns]
+
+
+EXPORTS: Dict[str, ExportSpec] = {
+    "facturas": ExportSpec(
+        Invoice.tenant_id,
+        Invoice.fecha_emision,
+        (
+            Invoice.id,
+            Invoice.encf,
+            Invoice.tipo_ecf,
+            Invoice.estado_dgii,
+            Invoice.track_id,
+            Invoice.total,
+            Invoice.fecha_emision,
+            Invoice.contabilizado,
+            Invoice.accounted_at,
+            Invoice.asiento_referencia,
+        ),
+    ),
+    "asientos": ExportSpec(
+        InvoiceLedgerEntry.tenant_id,
+        InvoiceLedgerEntry.fecha,
+        (
+            InvoiceLedgerEntry.id,
+            InvoiceLedgerEntry.invoice_id,
+            InvoiceLedgerEntry.referencia,
+            InvoiceLedgerEntry.cuenta,
+            InvoiceLedgerEntry.descripcion,
+            InvoiceLedgerEntry.debit,
+            InvoiceLedgerEntry.credit,
+            InvoiceLedgerEntry.fecha,
+        ),
+    ),
+    "consumo": ExportSpec(
+        UsageRecord.tenant_id,
+        UsageRecord.fecha,
+        (
+            UsageRecord.id,
+            UsageRecord.invoice_id,
+            UsageRecord.plan_id,
+            UsageRecord.ecf_type,
+            UsageRecord.track_id,
+            UsageRecord.monto_cargado,
+            UsageRecord.fecha,
+        ),
+    ),
+}
+
+
+def iter_batches(
+    session: Session,
+    spec: ExportSpec,
+    tenant_id: int,
+    desde: date,
+    hasta: date,
+    *,
+    batch_size: int | None = None,
+) -> Iterator[Sequence[Any]]:
+    """Lotes de filas del tenant entre ``desde`` y ``hasta`` (inclusive), en orden de fecha."""
+
+    size = batch_size or settings.export_batch_size
+    stmt = (
+        select(*spec.columns)
+        .where(
+            spec.tenant_column == tenant_id,
+            spec.date_column >= datetime.combine(desde, time.min),
+            spec.date_column < datetime.combine(hasta + timedelta(days=1), time.min),
+        )
+        .order_by(spec.date_column, spec.columns[0])
+        .execution_options(yield_per=size)
+    )
+    yield from session.execute(stmt).partitions(size)
+
+
+def _texto(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _csv(spec: ExportSpec, batches: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(spec.names)
+    for batch in batches:
+        writer.writerows([_texto(value) for value in row] for row in batch)
+        if buffer.tell() >= _CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _ndjson(spec: ExportSpec, batches: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    names = spec.names
+    for batch in batches:
+        lines = (json.dumps(dict(zip(names, map(_texto, row))), ensure_ascii=False) for row in batch)
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _Drain(io.RawIOBase):
+    """Destino de escritura que entrega y descarta lo escrito tras cada row group."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(pa: Any, spec: ExportSpec) -> Any:
+    fields = []
+    for column in spec.columns:
+        sql_type = column.expression.type
+        if isinstance(sql_type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(sql_type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(sql_type, Numeric):
+            arrow_type = pa.decimal128(sql_type.precision or 38, sql_type.scale or 0)
+        elif isinstance(sql_type, DateTime):
+            arrow_type = pa.timestamp("us")
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.key, arrow_type))
+    return pa.schema(fields)
+
+
+def _parquet(spec: ExportSpec, batches: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa, spec)
+    sink = _Drain()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in batches:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+_WRITERS = {"csv": _csv, "ndjson": _ndjson, "parquet": _parquet}
+
+
+def ensure_available(formato: Formato) -> None:
+    """Falla antes de iniciar la respuesta si el formato no puede generarse."""
+
+    if formato == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as exc:
+            raise ExportUnavailableError("La exportación Parquet requiere pyarrow (extra 'parquet')") from exc
+
+
+def export_stream(
+    dataset: str,
+    tenant_id: int,
+    desde: date,
+    hasta: date,
+    formato: Formato = "csv",
+    *,
+    session_factory: SessionFactory | None = None,
+    batch_size: int | None = None,
+) -> Iterator[bytes]:
+    """Genera el archivo por partes; abre su propia sesión porque vive más que la petición."""
+
+    spec = EXPORTS[dataset]
+    if session_factory is None:
+        from app.shared.database import session_scope as session_factory
+
+    with session_factory() as session:
+        batches = iter_batches(session, spec, tenant_id, desde, hasta, batch_size=batch_size)
+        for chunk in _WRITERS[formato](spec, batches):
+            if chunk:
+                yield chunk
@@ -0,0 +1,70 @@
+"""Paginación por cursor y conteos en caché del libro de asientos por tenant.
+
+El cursor codifica la clave ``(fecha, id)`` del último asiento entregado; la
+página siguiente se obtiene con ``(fecha, id) < cursor`` sobre el índice
+``(tenant_id, fecha DESC, id DESC)``, sin ``OFFSET``, por lo que su costo no
+depende de la profundidad.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+Cursor = Tuple[datetime, int]
+
+
+class InvalidCursorError(ValueError):
+    """El cursor recibido no fue emitido por este servicio o está dañado."""
+
+
+def encode_cursor(fecha: datetime, entry_id: int) -> str:
+    raw = json.dumps({"f": fecha.isoformat(), "i": entry_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["f"]), int(data["i"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursorError("Cursor inválido") from exc
+
+
+class LedgerCountCache:
+    """Totales por ``(tenant, filtro)`` reutilizados durante ``ttl`` segundos."""
+
+    def __init__(self, ttl_seconds: float | None = None) -> None:
+        self._ttl = ttl_seconds
+        self._entries: Dict[Tuple[int, Optional[bool]], Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self) -> float:
+        return settings.admin_ledger_count_ttl_seconds if self._ttl is None else self._ttl
+
+    def get(self, tenant_id: int, contabilizado: Optional[bool]) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get((tenant_id, contabilizado))
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def put(self, tenant_id: int, contabilizado: Optional[bool], total: int) -> int:
+        with self._lock:
+            self._entries[(tenant_id, contabilizado)] = (time.monotonic() + self.ttl, total)
+        return total
+
+    def invalidate(self, tenant_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == tenant_id]:
+                del self._entries[key]
+
+
+ledger_count_cache = LedgerCountCache()
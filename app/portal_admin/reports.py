@@ -1,52 +1,177 @@
-"""Generación de reportes de facturación para el portal administrativo."""
+"""Generación de reportes de facturación para el portal administrativo.
+
+El mes en curso se lee de ``billing_usage_counters`` (una fila por tenant,
+actualizada con cada cargo). Al cerrar un mes sus totales se copian a
+``billing_period_snapshots`` y el reporte pasa a ser una lectura por
+``periodo``. Corregir registros de uso de un mes (modificar o borrar un
+``UsageRecord``, o insertarlo con fecha de un mes cerrado) invalida el cierre
+al confirmar la transacción: se reconcilian los contadores y el siguiente
+reporte vuelve a cerrar el mes. Cierre explícito (cron, día 1)::
+
+    python -m app.portal_admin.reports cerrar --mes 2024-05
+"""
 from __future__ import annotations
 
-from datetime import datetime
+import argparse
+from datetime import date, datetime
 from decimal import Decimal
-from typing import List
+from itertools import chain
+from typing import Any, List, Set
 
-from sqlalchemy import func, select
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, attributes
 
-from app.models.billing import UsageRecord
+from app.billing.usage_counters import periodo_de, reconcile_usage_counters
+from app.models.billing import BillingPeriod, BillingPeriodSnapshot, UsageCounter, UsageRecord
 from app.models.tenant import Tenant
 
-
-def _month_range(month: datetime) -> tuple[datetime, datetime]:
-    start = month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    if start.month == 12:
-        end = start.replace(year=start.year + 1, month=1)
-    else:
-        end = start.replace(month=start.month + 1)
-    return start, end
+_STALE_PERIODS = "billing_periods_stale"
+_CORRECTED = ("tenant_id", "fecha", "monto_cargado")
 
 
-def billing_summary(db: Session, month: datetime) -> List[dict]:
-    """Retorna métricas agrupadas por tenant para el periodo solicitado."""
-
-    start, end = _month_range(month)
+def _from_counters(db: Session, periodo: date) -> List[dict]:
     stmt = (
-        select(
-            Tenant.id.label("tenant_id"),
-            Tenant.name.label("tenant_name"),
-            func.count(UsageRecord.id).label("invoice_count"),
-            func.coalesce(func.sum(UsageRecord.monto_cargado), 0).label("total_amount"),
-        )
-        .join(Tenant, Tenant.id == UsageRecord.tenant_id)
-        .where(UsageRecord.fecha >= start, UsageRecord.fecha < end)
-        .group_by(Tenant.id, Tenant.name)
+        select(Tenant.id, Tenant.name, UsageCounter.documentos, UsageCounter.monto_cargado)
+        .join(Tenant, Tenant.id == UsageCounter.tenant_id)
+        .where(UsageCounter.periodo == periodo, UsageCounter.documentos > 0)
         .order_by(Tenant.name)
     )
+    return [
+        {
+            "client_id": tenant_id,
+            "client_name": name,
+            "invoice_count": int(documentos or 0),
+            "total_amount_due": Decimal(str(monto or Decimal("0"))),
+        }
+        for tenant_id, name, documentos, monto in db.execute(stmt)
+    ]
 
-    results = db.execute(stmt).all()
-    payload: List[dict] = []
-    for row in results:
-        payload.append(
-            {
-                "client_id": row.tenant_id,
-                "client_name": row.tenant_name,
-                "invoice_count": int(row.invoice_count or 0),
-                "total_amount_due": Decimal(str(row.total_amount or Decimal("0"))),
-            }
+
+def _from_snapshot(db: Session, periodo: date) -> List[dict]:
+    rows = db.scalars(
+        select(BillingPeriodSnapshot)
+        .where(BillingPeriodSnapshot.periodo == periodo)
+        .order_by(BillingPeriodSnapshot.tenant_name)
+    )
+    return [
+        {
+            "client_id": row.tenant_id,
+            "client_name": row.tenant_name,
+            "invoice_count": row.invoice_count,
+            "total_amount_due": Decimal(str(row.total_amount)),
+        }
+        for row in rows
+    ]
+
+
+def close_billing_period(db: Session, periodo: date) -> int:
+    """Congela los totales de ``periodo`` (tras reconciliar sus contadores); devuelve los tenants."""
+
+    periodo = periodo_de(periodo)
+    reconcile_usage_counters(db, periodo)
+    rows = _from_counters(db, periodo)
+    db.execute(delete(BillingPeriodSnapshot).where(BillingPeriodSnapshot.periodo == periodo))
+    db.execute(delete(BillingPeriod).where(BillingPeriod.periodo == periodo))
+    if rows:
+        db.execute(
+            insert(BillingPeriodSnapshot),
+            [
+                {
+                    "periodo": periodo,
+                    "tenant_id": row["client_id"],
+                    "tenant_name": row["client_name"],
+                    "invoice_count": row["invoice_count"],
+                    "total_amount": row["total_amount_due"],
+                }
+                for row in rows
+            ],
         )
-    return payload
+    db.add(BillingPeriod(periodo=periodo))
+    db.flush()
+    return len(rows)
+
+
+def invalidate_billing_period(db: Session, periodo: date) -> None:
+    """Descarta el cierre de ``periodo`` y reconcilia sus contadores con los registros."""
+
+    periodo = periodo_de(periodo)
+    db.execute(delete(BillingPeriodSnapshot).where(BillingPeriodSnapshot.periodo == periodo))
+    db.execute(delete(BillingPeriod).where(BillingPeriod.periodo == periodo))
+    reconcile_usage_counters(db, periodo)
+
+
+def billing_summary(db: Session, month: datetime) -> List[dict]:
+    """Retorna métricas agrupadas por tenant para el periodo solicitado."""
+
+    periodo = periodo_de(month)
+    if periodo >= periodo_de(datetime.utcnow()):
+        return _from_counters(db, periodo)
+
+    if db.scalar(select(BillingPeriod.id).where(BillingPeriod.periodo == periodo)) is None:
+        try:
+            with db.begin_nested():
+                close_billing_period(db, periodo)
+        except IntegrityError:
+            pass  # otra petición cerró el mes al mismo tiempo
+    return _from_snapshot(db, periodo)
+
+
+def _after_flush(session: Session, flush_context: Any) -> None:
+    mes_actual = periodo_de(datetime.utcnow())
+    stale: Set[date] = session.info.setdefault(_STALE_PERIODS, set())
+    for obj in session.new:
+        # Los cargos del mes en curso ya actualizan su contador; solo importan los retroactivos.
+        if isinstance(obj, UsageRecord) and obj.fecha and periodo_de(obj.fecha) < mes_actual:
+            stale.add(periodo_de(obj.fecha))
+    for obj in chain(session.dirty, session.deleted):
+        if not isinstance(obj, UsageRecord):
+            continue
+        if obj in session.dirty and not any(
+            attributes.get_history(obj, name).has_changes() for name in _CORRECTED
+        ):
+            continue
+        history = attributes.get_history(obj, "fecha")
+        for fecha in chain(history.deleted or (), history.unchanged or (), history.added or ()):
+            if fecha:
+                stale.add(periodo_de(fecha))
+
+
+def _before_commit(session: Session) -> None:
+    # Incluye lo pendiente de flush para no perder correcciones sin flush previo.
+    session.flush()
+    for periodo in sorted(session.info.pop(_STALE_PERIODS, ())):
+        invalidate_billing_period(session, periodo)
+
+
+def install_billing_snapshot_invalidation(target: Any) -> None:
+    """Registra los listeners en ``target`` (una subclase de ``Session``); es idempotente."""
+
+    if not event.contains(target, "after_flush", _after_flush):
+        event.listen(target, "after_flush", _after_flush)
+        event.listen(target, "before_commit", _before_commit)
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Cierre de periodos de facturación")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    cerrar = sub.add_parser("cerrar", help="Congela el resumen de un mes")
+    cerrar.add_argument("--mes", required=True, help="Periodo YYYY-MM")
+    invalidar = sub.add_parser("invalidar", help="Descarta el cierre de un mes tras corregir registros")
+    invalidar.add_argument("--mes", required=True, help="Periodo YYYY-MM")
+    args = parser.parse_args(argv)
+
+    from app.db import SyncSessionFactory
+
+    periodo = datetime.strptime(args.mes, "%Y-%m").date()
+    with SyncSessionFactory() as session:
+        if args.comando == "cerrar":
+            print({"periodo": args.mes, "tenants": close_billing_period(session, periodo)})
+        else:
+            invalidate_billing_period(session, periodo)
+            print({"periodo": args.mes, "invalidado": True})
+        session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Totales mensuales de comprobantes por tenant (``invoice_monthly_rollups``).
+
+Un listener ``after_flush`` de las sesiones de la aplicación (``AppSession``)
+convierte cada alta, cambio (estado, contabilización, total, fecha o tenant) o
+baja de ``Invoice`` en deltas por tenant y mes, y los aplica con un upsert
+dentro de la misma transacción. Las sentencias masivas ``update()``/``delete()``
+sobre ``invoices`` no pasan por la sesión; tras una carga de ese tipo se
+reconstruye (la migración siembra la tabla con la misma agregación)::
+
+    python -m app.portal_admin.rollups reconstruir [--tenant 12]
+"""
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import Date, DateTime, case, cast, delete, event, func, insert, literal, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, attributes
+
+from app.models.accounting import InvoiceRollup
+from app.models.invoice import Invoice
+
+ESTADO_ACEPTADO = "ACEPTADO"
+ESTADO_RECHAZADO = "RECHAZADO"
+
+_TRACKED = ("tenant_id", "fecha_emision", "estado_dgii", "contabilizado", "total")
+_COUNTERS = ("emitidos", "aceptados", "rechazados", "contabilizados", "monto")
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+_Key = Tuple[int, date]
+
+
+def _periodo(fecha: datetime | date | str | None) -> date:
+    if isinstance(fecha, str):
+        fecha = date.fromisoformat(fecha[:10])
+    fecha = fecha or datetime.utcnow()
+    return date(fecha.year, fecha.month, 1)
+
+
+def _apply(deltas: Dict[_Key, List[Any]], values: Dict[str, Any], sign: int) -> None:
+    delta = deltas[(values["tenant_id"], _periodo(values["fecha_emision"]))]
+    delta[0] += sign
+    delta[1] += sign * (values["estado_dgii"] == ESTADO_ACEPTADO)
+    delta[2] += sign * (values["estado_dgii"] == ESTADO_RECHAZADO)
+    delta[3] += sign * bool(values["contabilizado"])
+    delta[4] += sign * Decimal(str(values["total"] or 0))
+
+
+def _committed(invoice: Invoice) -> Dict[str, Any]:
+    values: Dict[str, Any] = {}
+    for name in _TRACKED:
+        history = attributes.get_history(invoice, name)
+        previous = history.deleted or history.unchanged
+        values[name] = previous[0] if previous else None
+    return values
+
+
+def _current(invoice: Invoice) -> Dict[str, Any]:
+    return {name: getattr(invoice, name) for name in _TRACKED}
+
+
+def _after_flush(session: Session, flush_context: Any) -> None:
+    # En after_flush new/dirty/deleted y el historial conservan el estado previo al flush.
+    deltas: Dict[_Key, List[Any]] = defaultdict(lambda: [0, 0, 0, 0, Decimal("0")])
+    for obj in session.new:
+        if isinstance(obj, Invoice):
+            _apply(deltas, _current(obj), 1)
+    for obj in session.dirty:
+        if isinstance(obj, Invoice) and any(attributes.get_history(obj, name).has_changes() for name in _TRACKED):
+            _apply(deltas, _committed(obj), -1)
+            _apply(deltas, _current(obj), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Invoice):
+            _apply(deltas, _committed(obj), -1)
+
+    changed = {key: delta for key, delta in deltas.items() if any(delta)}
+    if changed:
+        _upsert(session, changed)
+
+
+def _upsert(session: Session, deltas: Dict[_Key, List[Any]]) -> None:
+    dialect = session.get_bind().dialect.name
+    try:
+        insert_for = _INSERTS[dialect]
+    except KeyError as exc:
+        raise RuntimeError(f"Totales mensuales no soportados en {dialect}") from exc
+    now = datetime.utcnow()
+    for (tenant_id, periodo), delta in sorted(deltas.items()):
+        stmt = insert_for(InvoiceRollup).values(
+            tenant_id=tenant_id,
+            periodo=periodo,
+            created_at=now,
+            updated_at=now,
+            **dict(zip(_COUNTERS, delta)),
+        )
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[InvoiceRollup.tenant_id, InvoiceRollup.periodo],
+                set_={
+                    "updated_at": now,
+                    **{name: getattr(InvoiceRollup, name) + getattr(stmt.excluded, name) for name in _COUNTERS},
+                },
+            )
+        )
+
+
+def install_invoice_rollups(target: Any) -> None:
+    """Registra el listener en ``target`` (una subclase de ``Session``); es idempotente."""
+
+    if not event.contains(target, "after_flush", _after_flush):
+        event.listen(target, "after_flush", _after_flush)
+
+
+def monthly_rollups(db: Session, tenant_id: int) -> List[InvoiceRollup]:
+    return list(db.scalars(select(InvoiceRollup).where(InvoiceRollup.tenant_id == tenant_id).order_by(InvoiceRollup.periodo)))
+
+
+def _mes(dialect: str) -> Any:
+    if dialect == "postgresql":
+        return cast(func.date_trunc("month", Invoice.fecha_emision), Date)
+    if dialect == "sqlite":
+        return func.strftime("%Y-%m-01", Invoice.fecha_emision)
+    raise RuntimeError(f"Totales mensuales no soportados en {dialect}")
+
+
+def rebuild_rollups(session: Session, tenant_id: int | None = None) -> int:
+    """Recalcula los totales desde ``invoices`` con una sola agregación; devuelve las filas escritas.
+
+    En PostgreSQL la tabla de totales se bloquea hasta el commit: los flush
+    concurrentes esperan y aplican su delta sobre el resultado reconstruido, y
+    la agregación (un ``INSERT ... SELECT``) ve todo lo confirmado antes.
+    """
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        session.execute(text(f"LOCK TABLE {InvoiceRollup.__tablename__} IN EXCLUSIVE MODE"))
+    mes = _mes(dialect)
+    now = datetime.utcnow()
+    stmt = (
+        select(
+            literal(now, DateTime),
+            literal(now, DateTime),
+            Invoice.tenant_id,
+            mes,
+            func.count(Invoice.id),
+            func.sum(case((Invoice.estado_dgii == ESTADO_ACEPTADO, 1), else_=0)),
+            func.sum(case((Invoice.estado_dgii == ESTADO_RECHAZADO, 1), else_=0)),
+            func.sum(case((Invoice.contabilizado.is_(True), 1), else_=0)),
+            func.coalesce(func.sum(Invoice.total), 0),
+        )
+        .group_by(Invoice.tenant_id, mes)
+    )
+    clear = delete(InvoiceRollup)
+    if tenant_id is not None:
+        stmt = stmt.where(Invoice.tenant_id == tenant_id)
+        clear = clear.where(InvoiceRollup.tenant_id == tenant_id)
+
+    session.execute(clear)
+    result = session.execute(
+        insert(InvoiceRollup).from_select(["created_at", "updated_at", "tenant_id", "periodo", *_COUNTERS], stmt)
+    )
+    session.flush()
+    return result.rowcount
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Totales mensuales de comprobantes")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    reconstruir = sub.add_parser("reconstruir", help="Recalcula los totales desde la tabla de comprobantes")
+    reconstruir.add_argument("--tenant", type=int, default=None, help="Solo este tenant")
+    args = parser.parse_args(argv)
+
+    from app.db import SyncSessionFactory
+
+    with SyncSessionFactory() as session:
+        escritas = rebuild_rollups(session, args.tenant)
+        session.commit()
+    print({"filas": escritas})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""Repositorios asíncronos (``AsyncSession``) usados por las rutas async."""
+from app.repositories.billing import UsageRepository
+from app.repositories.invoice import InvoiceRepository
+from app.repositories.storage import XMLStoreRepository
+from app.repositories.tenant import TenantRepository
+
+__all__ = [
+    "InvoiceRepository",
+    "TenantRepository",
+    "UsageRepository",
+    "XMLStoreRepository",
+]
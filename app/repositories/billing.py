@@ -0,0 +1,39 @@
+"""Consultas asíncronas de consumo facturable."""
+from __future__ import annotations
+
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.billing.usage_counters import add_monto_stmt, increment_stmt
+from app.models.billing import UsageRecord
+
+
+class UsageRepository:
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def count_between(self, tenant_id: int, start: datetime, end: datetime) -> int:
+        total = await self.db.scalar(
+            select(func.count(UsageRecord.id)).where(
+                UsageRecord.tenant_id == tenant_id,
+                UsageRecord.fecha >= start,
+                UsageRecord.fecha < end,
+            )
+        )
+        return int(total or 0)
+
+    async def increment_counter(self, tenant_id: int, periodo: date) -> int:
+        """Suma un documento al contador mensual y devuelve el total del mes."""
+
+        return int(await self.db.scalar(increment_stmt(self.db.get_bind().dialect.name, tenant_id, periodo)))
+
+    async def add_to_counter(self, tenant_id: int, periodo: date, monto: Decimal) -> None:
+        await self.db.execute(add_monto_stmt(tenant_id, periodo, monto))
+
+    async def add(self, record: UsageRecord) -> UsageRecord:
+        self.db.add(record)
+        await self.db.flush()
+        return record
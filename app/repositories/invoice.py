@@ -0,0 +1,34 @@
+"""Consultas asíncronas de comprobantes emitidos."""
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.invoice import Invoice
+
+
+class InvoiceRepository:
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def get(self, invoice_id: int) -> Invoice | None:
+        return await self.db.get(Invoice, invoice_id)
+
+    async def get_by_encf(self, tenant_id: int, encf: str) -> Invoice | None:
+        return await self.db.scalar(select(Invoice).where(Invoice.tenant_id == tenant_id, Invoice.encf == encf))
+
+    async def get_by_track_id(self, track_id: str) -> Invoice | None:
+        return await self.db.scalar(select(Invoice).where(Invoice.track_id == track_id))
+
+    async def add(self, invoice: Invoice) -> Invoice:
+        self.db.add(invoice)
+        await self.db.flush()
+        return invoice
+
+    async def update_estado(self, track_id: str, estado: str) -> int:
+        # Cambio vía ORM (no ``update()`` masivo) para que el flush mantenga los totales mensuales.
+        invoices = list(await self.db.scalars(select(Invoice).where(Invoice.track_id == track_id)))
+        for invoice in invoices:
+            invoice.estado_dgii = estado
+        await self.db.flush()
+        return len(invoices)
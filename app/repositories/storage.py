@@ -0,0 +1,47 @@
+"""Consultas asíncronas del almacén de XML."""
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.storage import XMLStore
+from app.shared.storage import ContentAddressedStore, Payload, content_store
+
+
+class XMLStoreRepository:
+    def __init__(self, db: AsyncSession, store: ContentAddressedStore | None = None) -> None:
+        self.db = db
+        self.store = store or content_store
+
+    async def add(self, entry: XMLStore) -> XMLStore:
+        self.db.add(entry)
+        await self.db.flush()
+        return entry
+
+    async def archive(self, tenant_id: int, encf: str, kind: str, payload: Payload) -> XMLStore:
+        """Guarda el XML en el archivo (fuera del event loop) y lo indexa en ``xml_store``."""
+
+        blob = await asyncio.to_thread(self.store.put, payload)
+        return await self.add(
+            XMLStore(tenant_id=tenant_id, encf=encf, kind=kind, path=blob.key, sha256=blob.sha256, size_bytes=blob.size)
+        )
+
+    async def read(self, entry: XMLStore) -> bytes:
+        return await asyncio.to_thread(self.store.read, entry.sha256)
+
+    async def get(self, tenant_id: int, encf: str, kind: str) -> XMLStore | None:
+        return await self.db.scalar(
+            select(XMLStore)
+            .where(XMLStore.tenant_id == tenant_id, XMLStore.encf == encf, XMLStore.kind == kind)
+            .order_by(XMLStore.id.desc())
+            .limit(1)
+        )
+
+    async def list_for_encf(self, tenant_id: int, encf: str) -> List[XMLStore]:
+        result = await self.db.scalars(
+            select(XMLStore).where(XMLStore.tenant_id == tenant_id, XMLStore.encf == encf).order_by(XMLStore.id)
+        )
+        return list(result)
@@ -0,0 +1,21 @@
+"""Consultas asíncronas de tenants."""
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models.tenant import Tenant
+
+
+class TenantRepository:
+    """Carga tenants con su plan ya resuelto (no hay lazy-load en sesiones async)."""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def get(self, tenant_id: int) -> Tenant | None:
+        return await self.db.get(Tenant, tenant_id, options=[selectinload(Tenant.plan)])
+
+    async def get_by_rnc(self, rnc: str) -> Tenant | None:
+        return await self.db.scalar(select(Tenant).options(selectinload(Tenant.plan)).where(Tenant.rnc == rnc))
@@ -1,18 +1,20 @@
 """Endpoints administrativos para contabilidad y configuración de empresas."""
 from __future__ import annotations
 
-from collections import defaultdict
-from datetime import datetime
+import json
+from datetime import date, datetime
 from decimal import Decimal
-from typing import List, Optional
+from typing import AsyncIterator, List, Literal, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
-from sqlalchemy import func, select
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.orm import Session
 
 from app.admin.schemas import (
     BillingSummaryItem,
     BillingSummaryResponse,
+    DGIIStatusLookupRequest,
     LedgerEntryCreate,
     LedgerEntryItem,
     LedgerPaginatedResponse,
@@ -28,13 +30,18 @@ from app.admin.schemas import (
     TenantSettingsPayload,
     TenantSettingsResponse,
 )
+from app.billing.usage_counters import tenant_plan_cache
 from app.core.auth import get_current_user, require_role
+from app.dgii.client import DGIIClient
 from app.models.billing import Plan
 from app.models.accounting import InvoiceLedgerEntry, TenantSettings
 from app.models.invoice import Invoice
 from app.models.tenant import Tenant
 from app.shared.database import get_db
+from app.portal_admin.exports import MEDIA_TYPES, ExportUnavailableError, ensure_available, export_stream
+from app.portal_admin.ledger import InvalidCursorError, decode_cursor, encode_cursor, ledger_count_cache
 from app.portal_admin.reports import billing_summary
+from app.portal_admin.rollups import monthly_rollups
 
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -55,6 +62,22 @@ def aprobar_factura_portal(payload: dict, user=Depends(get_current_user)) -> dic
     return {"approved": True, "by": user["id"], "input": payload}
 
 
+@router.post("/dgii/estatus", dependencies=[Depends(require_role("admin"))])
+async def consultar_estatus_dgii(payload: DGIIStatusLookupRequest) -> StreamingResponse:
+    """Consulta en lote el estado de muchos track_id y transmite NDJSON a medida que responden."""
+
+    async def _stream() -> AsyncIterator[str]:
+        total = errores = 0
+        async with DGIIClient() as client:
+            async for result in client.get_status_many(payload.track_ids, concurrency=payload.concurrency):
+                total += 1
+                errores += 0 if result.ok else 1
+                yield json.dumps(result.to_dict(), ensure_ascii=False, default=str) + "\n"
+        yield json.dumps({"resumen": {"total": total, "errores": errores}}) + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
 def _get_tenant_or_404(db: Session, tenant_id: int) -> Tenant:
     tenant = db.get(Tenant, tenant_id)
     if not tenant:
@@ -94,6 +117,7 @@ def update_plan(plan_id: int, payload: PlanUpdate, db: Session = Depends(get_db)
     for field, value in payload.model_dump(exclude_none=True).items():
         setattr(plan, field, value)
     db.flush()
+    tenant_plan_cache.invalidate_on_commit(db)
     return PlanResponse.model_validate(plan, from_attributes=True)
 
 
@@ -104,6 +128,7 @@ def delete_plan(plan_id: int, db: Session = Depends(get_db)) -> Response:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plan no encontrado")
     db.delete(plan)
     db.flush()
+    tenant_plan_cache.invalidate_on_commit(db)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -111,34 +136,21 @@ def delete_plan(plan_id: int, db: Session = Depends(get_db)) -> Response:
 def get_accounting_summary(tenant_id: int, db: Session = Depends(get_db)) -> LedgerSummaryResponse:
     _get_tenant_or_404(db, tenant_id)
 
-    total_emitidos = db.scalar(select(func.count()).where(Invoice.tenant_id == tenant_id)) or 0
-    total_aceptados = db.scalar(select(func.count()).where(Invoice.tenant_id == tenant_id, Invoice.estado_dgii == "ACEPTADO")) or 0
-    total_rechazados = db.scalar(select(func.count()).where(Invoice.tenant_id == tenant_id, Invoice.estado_dgii == "RECHAZADO")) or 0
-    total_monto = db.scalar(select(func.coalesce(func.sum(Invoice.total), 0)).where(Invoice.tenant_id == tenant_id)) or Decimal("0")
-
-    contabilizados = db.scalar(select(func.count()).where(Invoice.tenant_id == tenant_id, Invoice.contabilizado.is_(True))) or 0
-
-    series_data: dict[str, dict[str, Decimal | int]] = defaultdict(lambda: {"monto": Decimal("0"), "cantidad": 0})
-    rows = db.execute(select(Invoice.fecha_emision, Invoice.total).where(Invoice.tenant_id == tenant_id)).all()
-    for fecha_emision, total in rows:
-        if not fecha_emision:
-            continue
-        periodo = fecha_emision.strftime("%Y-%m")
-        bucket = series_data[periodo]
-        bucket["cantidad"] = int(bucket["cantidad"]) + 1
-        bucket["monto"] = bucket["monto"] + Decimal(str(total))
-
+    rollups = monthly_rollups(db, tenant_id)
+    total_emitidos = sum(rollup.emitidos for rollup in rollups)
+    contabilizados = sum(rollup.contabilizados for rollup in rollups)
     series = [
-        LedgerMonthlyStat(periodo=periodo, cantidad=bucket["cantidad"], monto=bucket["monto"])
-        for periodo, bucket in sorted(series_data.items())
+        LedgerMonthlyStat(periodo=rollup.periodo.strftime("%Y-%m"), cantidad=rollup.emitidos, monto=Decimal(str(rollup.monto)))
+        for rollup in rollups
+        if rollup.emitidos
     ]
 
     return LedgerSummaryResponse(
         totales=LedgerTotals(
             total_emitidos=total_emitidos,
-            total_aceptados=total_aceptados,
-            total_rechazados=total_rechazados,
-            total_monto=Decimal(str(total_monto)),
+            total_aceptados=sum(rollup.aceptados for rollup in rollups),
+            total_rechazados=sum(rollup.rechazados for rollup in rollups),
+            total_monto=sum((Decimal(str(rollup.monto)) for rollup in rollups), Decimal("0")),
         ),
         contabilidad=LedgerStatusBreakdown(
             contabilizados=contabilizados,
@@ -155,6 +167,9 @@ def list_ledger_entries(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
     contabilizado: Optional[bool] = Query(None),
+    paginacion: Literal["offset", "cursor"] = Query("offset"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior; implica paginacion=cursor"),
+    conteo: Literal["exacto", "cache", "ninguno"] = Query("exacto"),
 ) -> LedgerPaginatedResponse:
     _get_tenant_or_404(db, tenant_id)
 
@@ -167,15 +182,33 @@ def list_ledger_entries(
     if contabilizado is not None:
         base_query = base_query.where(Invoice.contabilizado.is_(contabilizado))
 
-    total = db.scalar(select(func.count()).select_from(base_query.subquery())) or 0
-
-    stmt = (
-        base_query.order_by(InvoiceLedgerEntry.fecha.desc())
-        .offset((page - 1) * size)
-        .limit(size)
-    )
+    stmt = base_query.order_by(InvoiceLedgerEntry.fecha.desc(), InvoiceLedgerEntry.id.desc())
+    keyset = paginacion == "cursor" or cursor is not None
+    if keyset:
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except InvalidCursorError as exc:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+            stmt = stmt.where(tuple_(InvoiceLedgerEntry.fecha, InvoiceLedgerEntry.id) < after)
+        stmt = stmt.limit(size + 1)
+    else:
+        stmt = stmt.offset((page - 1) * size).limit(size)
 
     entries = db.execute(stmt).all()
+    next_cursor: Optional[str] = None
+    if keyset and len(entries) > size:
+        entries = entries[:size]
+        last = entries[-1][0]
+        next_cursor = encode_cursor(last.fecha, last.id)
+
+    total: Optional[int] = None
+    if conteo == "cache":
+        total = ledger_count_cache.get(tenant_id, contabilizado)
+    if total is None and conteo != "ninguno":
+        total = _count_ledger_entries(db, tenant_id, contabilizado)
+        if conteo == "cache":
+            ledger_count_cache.put(tenant_id, contabilizado, total)
 
     items: list[LedgerEntryItem] = []
     for entry, invoice in entries:
@@ -193,7 +226,24 @@ def list_ledger_entries(
             )
         )
 
-    return LedgerPaginatedResponse(items=items, total=total, page=page, size=size)
+    return LedgerPaginatedResponse(
+        items=items,
+        total=total,
+        page=page,
+        size=size,
+        next_cursor=next_cursor,
+        total_exacto=conteo == "exacto",
+    )
+
+
+def _count_ledger_entries(db: Session, tenant_id: int, contabilizado: Optional[bool]) -> int:
+    stmt = select(func.count(InvoiceLedgerEntry.id)).where(InvoiceLedgerEntry.tenant_id == tenant_id)
+    if contabilizado is not None:
+        # Solo el filtro necesita el join (inner: sin comprobante no hay estado contable).
+        stmt = stmt.join(Invoice, InvoiceLedgerEntry.invoice_id == Invoice.id).where(
+            Invoice.contabilizado.is_(contabilizado)
+        )
+    return db.scalar(stmt) or 0
 
 
 @router.post("/tenants/{tenant_id}/accounting/ledger", response_model=LedgerEntryItem, status_code=status.HTTP_201_CREATED)
@@ -228,6 +278,7 @@ def create_ledger_entry(
         invoice.asiento_referencia = payload.referencia
 
     db.flush()
+    ledger_count_cache.invalidate(tenant_id)
 
     return LedgerEntryItem(
         id=entry.id,
@@ -242,6 +293,33 @@ def create_ledger_entry(
     )
 
 
+@router.get("/tenants/{tenant_id}/export/{dataset}")
+def export_tenant_data(
+    tenant_id: int,
+    dataset: Literal["facturas", "asientos", "consumo"],
+    desde: date,
+    hasta: date,
+    formato: Literal["csv", "ndjson", "parquet"] = Query("csv"),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    """Descarga completa del rango en streaming; la memoria no depende de la cantidad de filas."""
+
+    _get_tenant_or_404(db, tenant_id)
+    if hasta < desde:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Rango de fechas inválido")
+    try:
+        ensure_available(formato)
+    except ExportUnavailableError as exc:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(exc)) from exc
+
+    filename = f"{dataset}_{tenant_id}_{desde.isoformat()}_{hasta.isoformat()}.{formato}"
+    return StreamingResponse(
+        export_stream(dataset, tenant_id, desde, hasta, formato),
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get("/tenants/{tenant_id}/settings", response_model=TenantSettingsResponse)
 def get_tenant_settings(tenant_id: int, db: Session = Depends(get_db)) -> TenantSettingsResponse:
     _get_tenant_or_404(db, tenant_id)
@@ -276,6 +354,7 @@ def assign_tenant_plan(
         tenant.plan = None
         tenant.plan_id = None
     db.flush()
+    tenant_plan_cache.invalidate_on_commit(db, tenant.id)
     response_plan = PlanResponse.model_validate(plan, from_attributes=True) if plan else None
     return TenantPlanResponse(tenant_id=tenant.id, plan=response_plan)
 
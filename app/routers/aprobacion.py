@@ -3,13 +3,16 @@ from __future__ import annotations
 
 from fastapi import APIRouter, Depends, status
 
-from app.core.config import settings
 from app.core.logging import bind_request_context
 from app.dgii.clients import DGIIClient
 from app.dgii.schemas import ACECFPayload, SubmissionResponse
-from app.dgii.signing import sign_ecf
-from app.dgii.validation import validate_xml
-from app.routers.dependencies import BearerToken, DGIIClientDep, bind_request_headers
+from app.routers.dependencies import (
+    BearerToken,
+    DGIIClientDep,
+    bind_request_headers,
+    sign_document,
+    validate_document,
+)
 from app.routers.recepcion import _build_submission_response
 
 router = APIRouter(prefix="/dgii/aprobacion", tags=["DGII ACECF"])
@@ -24,8 +27,8 @@ async def enviar_acecf(
 ) -> SubmissionResponse:
     document = payload.to_model()
     xml = document.to_xml_bytes()
-    validate_xml(xml, "ACECF.xsd")
-    signed_xml = sign_ecf(xml, str(settings.dgii_cert_p12_path), settings.dgii_cert_p12_password)
+    validate_document(xml, "ACECF.xsd")
+    signed_xml = await sign_document(xml, payload.rnc_emisor)
     bind_request_context(encf=document.encf, tipo_ecf="ACECF")
     result = await client.send_acecf(signed_xml, token)
     return _build_submission_response(result)
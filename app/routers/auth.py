@@ -8,7 +8,7 @@ from fastapi import APIRouter, Depends
 from app.core.logging import bind_request_context
 from app.dgii.clients import DGIIClient
 from app.dgii.schemas import TokenResponse
-from app.routers.dependencies import DGIIClientDep, bind_request_headers
+from app.routers.dependencies import DGIIClientDep, bind_request_headers, sign_document
 
 router = APIRouter(prefix="/dgii/auth", tags=["DGII Auth"])
 
@@ -20,7 +20,7 @@ async def obtain_token(
 ) -> TokenResponse:
     seed_xml = await client.get_seed()
     bind_request_context(seed="obtenida")
-    signed_seed = client.sign_seed(seed_xml)
+    signed_seed = await sign_document(seed_xml)
     data = await client.get_token(signed_seed)
     expires_at = _parse_datetime(data["expires_at"])
     return TokenResponse(access_token=data["access_token"], expires_at=expires_at)
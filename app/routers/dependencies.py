@@ -6,6 +6,9 @@ from typing import AsyncIterator
 from fastapi import Depends, Header, HTTPException, status
 
 from app.dgii.clients import DGIIClient
+from app.dgii.http_pool import get_http_client
+from app.dgii.signing_pool import SigningBackpressureError, signing_pool
+from app.dgii.validation import XSDValidationError, validate_xml
 from app.core.config import settings
 from app.core.logging import bind_request_context
 
@@ -20,13 +23,35 @@ async def get_bearer_token(authorization: str = Header(...)) -> str:
 
 
 async def get_dgii_client() -> AsyncIterator[DGIIClient]:
-    client = DGIIClient()
+    client = DGIIClient(client=get_http_client())
     try:
         yield client
     finally:
         await client.close()
 
 
+async def sign_document(xml_bytes: bytes, tenant: str | None = None) -> bytes:
+    """Sign through the shared pool, mapping saturation to HTTP 503."""
+
+    try:
+        return await signing_pool.sign_async(xml_bytes, tenant)
+    except SigningBackpressureError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+            headers={"Retry-After": "1"},
+        ) from exc
+
+
+def validate_document(xml_bytes: bytes, xsd_file: str) -> None:
+    """Validate against the XSD, mapping schema errors to HTTP 422."""
+
+    try:
+        validate_xml(xml_bytes, xsd_file)
+    except XSDValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)) from exc
+
+
 def bind_request_headers(
     request_id: str | None = Header(default=None, alias=settings.request_id_header)
 ) -> None:
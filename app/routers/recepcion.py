@@ -1,17 +1,33 @@
 """Recepción de e-CF y consulta de estado."""
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+from dataclasses import asdict
+from typing import AsyncIterator
 
-from app.billing.services import BillingError, BillingService, get_billing_service
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.billing.services import AsyncBillingService, BillingError, get_async_billing_service
 from app.core.config import settings
 from app.core.logging import bind_request_context
+from app.db import AsyncSessionFactory
+from app.dgii.batch import BatchPipeline, parse_json_array, parse_ndjson
 from app.dgii.clients import DGIIClient
 from app.dgii.jobs import dispatcher
 from app.dgii.schemas import ECFSubmission, StatusResponse, SubmissionResponse
-from app.dgii.signing import sign_ecf
+from app.dgii.signing_pool import signing_pool
 from app.dgii.validation import validate_xml
-from app.routers.dependencies import BearerToken, DGIIClientDep, bind_request_headers
+from app.routers.dependencies import (
+    BearerToken,
+    DGIIClientDep,
+    bind_request_headers,
+    sign_document,
+    validate_document,
+)
+from app.services.idempotency import idempotency_store
 
 router = APIRouter(prefix="/dgii/recepcion", tags=["DGII Recepción"])
 
@@ -21,29 +37,60 @@ async def enviar_ecf(
     payload: ECFSubmission,
     token: str = BearerToken,
     client: DGIIClient = DGIIClientDep,
-    billing_service: BillingService = Depends(get_billing_service),
+    billing_service: AsyncBillingService = Depends(get_async_billing_service),
     _trace = Depends(bind_request_headers),
 ) -> SubmissionResponse:
     document = payload.to_model()
     xml = document.to_xml_bytes()
-    validate_xml(xml, "ECF.xsd")
-    signed_xml = sign_ecf(xml, str(settings.dgii_cert_p12_path), settings.dgii_cert_p12_password)
+    validate_document(xml, "ECF.xsd")
+    signed_xml = await sign_document(xml, payload.rnc_emisor)
     bind_request_context(tipo_ecf=document.tipo_ecf, encf=document.encf)
-    async def _usage_callback(result: dict) -> None:
-        track_id = _extract_first(result, ["track_id", "trackId", "track"])
+    result = await client.send_ecf(signed_xml, token)
+    try:
+        await billing_service.record_usage_for_rnc(
+            rnc=payload.rnc_emisor,
+            ecf_type=payload.tipo_ecf,
+            track_id=_extract_first(result, ["track_id", "trackId", "track"]),
+        )
+    except BillingError as exc:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc)) from exc
+    response = _build_submission_response(result)
+    await dispatcher.enqueue_status_check(response.track_id, payload.rnc_emisor)
+    return response
+
+
+@router.post("/ecf/lote", status_code=status.HTTP_200_OK)
+async def enviar_ecf_lote(
+    request: Request,
+    token: str = BearerToken,
+    _trace = Depends(bind_request_headers),
+) -> StreamingResponse:
+    """Recibe un lote NDJSON o arreglo JSON de e-CF y transmite un resultado por documento."""
+
+    max_items = settings.dgii_batch_max_items
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type:
+        items = parse_ndjson(request.stream(), max_items=max_items)
+    else:
         try:
-            billing_service.record_usage_for_rnc(
-                rnc=payload.rnc_emisor,
-                ecf_type=payload.tipo_ecf,
-                track_id=track_id,
+            items = parse_json_array(await request.body(), max_items=max_items)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+    async def _stream() -> AsyncIterator[str]:
+        async with DGIIClient() as client:
+            pipeline = BatchPipeline(
+                prepare=_prepare_document,
+                send=lambda submission, signed, key: _send_document(client, token, submission, signed, key),
+                prepare_concurrency=settings.dgii_batch_prepare_concurrency,
+                send_concurrency=settings.dgii_batch_send_concurrency,
+                idempotency=idempotency_store,
             )
-        except BillingError as exc:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc)) from exc
+            async for result in pipeline.run(items):
+                yield json.dumps(result.to_dict(), ensure_ascii=False) + "\n"
+            yield json.dumps({"resumen": asdict(pipeline.summary)}) + "\n"
 
-    result = await client.send_ecf(signed_xml, token, usage_callback=_usage_callback)
-    response = _build_submission_response(result)
-    await dispatcher.enqueue_status_check(response.track_id, token)
-    return response
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
 
 
 @router.get("/status/{track_id}", response_model=StatusResponse)
@@ -57,6 +104,47 @@ async def estado_recepcion(
     return _build_status_response(track_id, result)
 
 
+def _build_and_validate(submission: ECFSubmission) -> bytes:
+    xml = submission.to_model().to_xml_bytes()
+    validate_xml(xml, "ECF.xsd")
+    return xml
+
+
+async def _prepare_document(submission: ECFSubmission) -> bytes:
+    loop = asyncio.get_running_loop()
+    xml = await loop.run_in_executor(None, _build_and_validate, submission)
+    return await signing_pool.sign_async(xml, submission.rnc_emisor)
+
+
+async def _send_document(
+    client: DGIIClient,
+    token: str,
+    submission: ECFSubmission,
+    signed_xml: bytes,
+    idempotency_key: str,
+) -> dict:
+    result = await client.send_ecf(signed_xml, token, idempotency_key=idempotency_key)
+    track_id = _extract_first(result, ["track_id", "trackId", "track"])
+    try:
+        await _record_usage(submission, track_id)
+    except (BillingError, SQLAlchemyError, OSError) as exc:
+        # El documento ya fue aceptado por DGII; el consumo se concilia luego.
+        bind_request_context(encf=submission.encf).warning("Consumo no registrado en lote", error=str(exc))
+    if track_id:
+        await dispatcher.enqueue_status_check(track_id, submission.rnc_emisor)
+    return result
+
+
+async def _record_usage(submission: ECFSubmission, track_id: str | None) -> None:
+    async with AsyncSessionFactory() as session:
+        await AsyncBillingService(session).record_usage_for_rnc(
+            rnc=submission.rnc_emisor,
+            ecf_type=submission.tipo_ecf,
+            track_id=track_id,
+        )
+        await session.commit()
+
+
 def _build_submission_response(payload: dict) -> SubmissionResponse:
     track_id = _extract_first(payload, ["track_id", "trackId", "track"])
     status_value = _extract_first(payload, ["status", "estado", "respuesta"])
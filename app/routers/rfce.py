@@ -3,13 +3,16 @@ from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, status
 
-from app.core.config import settings
 from app.core.logging import bind_request_context
 from app.dgii.clients import DGIIClient
 from app.dgii.schemas import RFCEPayload, RFCESubmissionResponse
-from app.dgii.signing import sign_ecf
-from app.dgii.validation import validate_xml
-from app.routers.dependencies import BearerToken, DGIIClientDep, bind_request_headers
+from app.routers.dependencies import (
+    BearerToken,
+    DGIIClientDep,
+    bind_request_headers,
+    sign_document,
+    validate_document,
+)
 
 router = APIRouter(prefix="/dgii/rfce", tags=["DGII RFCE"])
 
@@ -23,8 +26,8 @@ async def enviar_rfce(
 ) -> RFCESubmissionResponse:
     document = payload.to_model()
     xml = document.to_xml_bytes()
-    validate_xml(xml, "RFCE.xsd")
-    signed_xml = sign_ecf(xml, str(settings.dgii_cert_p12_path), settings.dgii_cert_p12_password)
+    validate_document(xml, "RFCE.xsd")
+    signed_xml = await sign_document(xml, payload.rnc_emisor)
     bind_request_context(encf=document.encf, tipo_ecf="RFCE")
     result = await client.send_rfce(signed_xml, token)
     return _build_rfce_response(result)
@@ -1,19 +1,17 @@
-"""HTTP client hardened against SSRF with retry and circuit breaker."""
+"""HTTP client hardened against SSRF with retry, circuit breaker and rate governing."""
 from __future__ import annotations
 
 import ipaddress
 import socket
-import time
-from collections import defaultdict
-from typing import Dict
 
 import httpx
 from tenacity import AsyncRetrying, RetryError, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 
+from app.dgii.exceptions import CircuitOpenError, RateLimitExceededError
+from app.dgii.http_pool import get_http_client
+from app.dgii.resilience import endpoint_for, resilience
 from app.infra.settings import settings
 
-_circuit_breaker: Dict[str, Dict[str, float]] = defaultdict(lambda: {"failures": 0, "opened_at": 0.0})
-
 
 class SSRFProtectionError(RuntimeError):
     """Raised when a request violates SSRF protections."""
@@ -38,16 +36,19 @@ def _ensure_allowed(url: httpx.URL) -> None:
     _resolve_public_host(host)
 
 
+def _endpoint_bases() -> dict[str, str]:
+    configured = {
+        "auth": settings.dgii_token_url,
+        "recepcion": settings.dgii_submission_url,
+        "recepcion_estado": settings.dgii_status_url,
+    }
+    return {name: str(url) for name, url in configured.items() if url}
+
+
 async def _request(method: str, url: str, **kwargs) -> httpx.Response:
     parsed_url = httpx.URL(url)
     _ensure_allowed(parsed_url)
 
-    circuit = _circuit_breaker[parsed_url.host]
-    if circuit["failures"] >= settings.dgii_circuit_breaker_threshold:
-        if time.time() - circuit["opened_at"] < settings.dgii_circuit_breaker_window:
-            raise RuntimeError("Circuit breaker open")
-        circuit["failures"] = 0
-
     async for attempt in AsyncRetrying(
         retry=retry_if_exception_type(httpx.HTTPError),
         stop=stop_after_attempt(settings.dgii_max_retries),
@@ -55,14 +56,16 @@ async def _request(method: str, url: str, **kwargs) -> httpx.Response:
         reraise=True,
     ):
         with attempt:
-            async with httpx.AsyncClient(
-                timeout=httpx.Timeout(settings.dgii_timeout, connect=settings.dgii_conn_timeout),
-                follow_redirects=False,
-            ) as client:
-                response = await client.request(method, url, **kwargs)
+            async with resilience.guard(endpoint_for(parsed_url, _endpoint_bases())):
+                response = await get_http_client().request(
+                    method,
+                    url,
+                    timeout=httpx.Timeout(settings.dgii_timeout, connect=settings.dgii_conn_timeout),
+                    follow_redirects=False,
+                    **kwargs,
+                )
                 response.raise_for_status()
-                circuit["failures"] = 0
-                return response
+            return response
 
     raise RuntimeError("Unexpected retry exhaustion")
 
@@ -70,18 +73,12 @@ async def _request(method: str, url: str, **kwargs) -> httpx.Response:
 async def post_xml(url: str, data: bytes, headers: dict[str, str]) -> httpx.Response:
     try:
         return await _request("POST", url, content=data, headers=headers)
-    except RetryError as exc:
-        circuit = _circuit_breaker[httpx.URL(url).host]
-        circuit["failures"] += 1
-        circuit["opened_at"] = time.time()
+    except (RetryError, CircuitOpenError, RateLimitExceededError) as exc:
         raise RuntimeError("DGII service unavailable") from exc
 
 
 async def get_json(url: str, headers: dict[str, str]) -> httpx.Response:
     try:
         return await _request("GET", url, headers=headers)
-    except RetryError as exc:
-        circuit = _circuit_breaker[httpx.URL(url).host]
-        circuit["failures"] += 1
-        circuit["opened_at"] = time.time()
+    except (RetryError, CircuitOpenError, RateLimitExceededError) as exc:
         raise RuntimeError("DGII status unavailable") from exc
@@ -0,0 +1,152 @@
+"""Process-wide cache of PKCS#12 key material used for XML signing."""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import structlog
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.serialization import Encoding, pkcs12
+
+logger = structlog.get_logger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+
+class KeyStoreError(RuntimeError):
+    """Raised when a PKCS#12 bundle cannot be loaded."""
+
+
+@dataclass(frozen=True, slots=True)
+class KeyMaterial:
+    """Private key and certificate decoded from a PKCS#12 bundle."""
+
+    private_key: Any
+    certificate: Any
+    cert_pem: bytes
+    fingerprint: str
+    path: str
+    mtime_ns: int
+    size: int
+    loaded_at: float
+
+
+class KeyMaterialCache:
+    """LRU + TTL cache of decoded PKCS#12 bundles keyed by tenant and file.
+
+    Each lookup re-stats the bundle so a certificate rotated on disk (new
+    ``mtime`` or size) is transparently reloaded, while the expensive
+    PKCS#12 decode and PEM serialization happen once per bundle.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 32,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[CacheKey, KeyMaterial]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def load(self, p12_path: str | os.PathLike[str], password: Optional[str | bytes], *, tenant: str | None = None) -> KeyMaterial:
+        """Return the cached key material, decoding the bundle when required."""
+
+        path = str(Path(p12_path).resolve())
+        secret = password.encode() if isinstance(password, str) else password
+        key = (tenant or "", path, hashlib.sha256(secret or b"").hexdigest())
+        try:
+            stat = os.stat(path)
+        except OSError as exc:
+            raise KeyStoreError("Unable to read PKCS#12 bundle") from exc
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and self._is_fresh(cached, stat):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return cached
+            self._misses += 1
+
+        material = self._decode(path, secret, stat)
+        with self._lock:
+            self._entries[key] = material
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        logger.info("keystore.loaded", path=path, tenant=tenant, fingerprint=material.fingerprint)
+        return material
+
+    def invalidate(self, p12_path: str | os.PathLike[str] | None = None, *, tenant: str | None = None) -> int:
+        """Drop entries matching the given path and/or tenant. Returns the number removed."""
+
+        path = str(Path(p12_path).resolve()) if p12_path is not None else None
+        with self._lock:
+            stale = [
+                key
+                for key in self._entries
+                if (path is None or key[1] == path) and (tenant is None or key[0] == tenant)
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self._hits, "misses": self._misses}
+
+    def _is_fresh(self, material: KeyMaterial, stat: os.stat_result) -> bool:
+        if material.mtime_ns != stat.st_mtime_ns or material.size != stat.st_size:
+            return False
+        return self._clock() - material.loaded_at < self._ttl
+
+    def _decode(self, path: str, secret: Optional[bytes], stat: os.stat_result) -> KeyMaterial:
+        try:
+            bundle = Path(path).read_bytes()
+        except OSError as exc:
+            raise KeyStoreError("Unable to read PKCS#12 bundle") from exc
+        try:
+            private_key, certificate, _ = pkcs12.load_key_and_certificates(bundle, secret)
+        except Exception as exc:  # noqa: BLE001
+            raise KeyStoreError("Invalid PKCS#12 bundle or password") from exc
+        if not private_key or not certificate:
+            raise KeyStoreError("PKCS#12 bundle missing private key or certificate")
+        return KeyMaterial(
+            private_key=private_key,
+            certificate=certificate,
+            cert_pem=certificate.public_bytes(Encoding.PEM),
+            fingerprint=certificate.fingerprint(hashes.SHA256()).hex(),
+            path=path,
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            loaded_at=self._clock(),
+        )
+
+
+def _build_cache() -> KeyMaterialCache:
+    from app.infra.settings import settings
+
+    return KeyMaterialCache(
+        ttl_seconds=settings.signing_key_cache_ttl_seconds,
+        max_entries=settings.signing_key_cache_max_entries,
+    )
+
+
+key_cache = _build_cache()
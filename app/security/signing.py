@@ -1,13 +1,12 @@
 """XML Digital Signature helpers."""
 from __future__ import annotations
 
-from pathlib import Path
 from typing import Optional
 
-from cryptography.hazmat.primitives.serialization import Encoding, pkcs12
 from lxml import etree
 from signxml import XMLSigner, methods
 
+from app.security.keystore import KeyStoreError, key_cache
 from app.security.xml import parse_secure
 
 
@@ -15,23 +14,22 @@ class SigningError(RuntimeError):
     """Raised when digital signing fails."""
 
 
-def sign_xml_enveloped(xml_bytes: bytes, p12_path: str, password: Optional[str], reference_uri: str = "") -> bytes:
+def sign_xml_enveloped(
+    xml_bytes: bytes,
+    p12_path: str,
+    password: Optional[str],
+    reference_uri: str = "",
+    *,
+    tenant: str | None = None,
+) -> bytes:
     """Sign XML using RSA-SHA256 enveloped signature."""
 
     root = parse_secure(xml_bytes)
 
     try:
-        bundle = Path(p12_path).read_bytes()
-    except OSError as exc:
-        raise SigningError("Unable to read PKCS#12 bundle") from exc
-
-    try:
-        private_key, certificate, _ = pkcs12.load_key_and_certificates(bundle, password.encode() if password else None)
-    except Exception as exc:  # noqa: BLE001
-        raise SigningError("Invalid PKCS#12 bundle or password") from exc
-
-    if not private_key or not certificate:
-        raise SigningError("PKCS#12 bundle missing private key or certificate")
+        material = key_cache.load(p12_path, password or None, tenant=tenant)
+    except KeyStoreError as exc:
+        raise SigningError(str(exc)) from exc
 
     signer = XMLSigner(
         method=methods.enveloped,
@@ -43,9 +41,9 @@ def sign_xml_enveloped(xml_bytes: bytes, p12_path: str, password: Optional[str],
     try:
         signed = signer.sign(
             root,
-            key=private_key,
-            cert=certificate.public_bytes(Encoding.PEM),
-            reference_uri=reference_uri,
+            key=material.private_key,
+            cert=material.cert_pem,
+            reference_uri=reference_uri or None,
         )
     except Exception as exc:  # noqa: BLE001
         raise SigningError("Error signing XML document") from exc
@@ -1,81 +1,94 @@
-"""Secure XML utilities with lightweight schema checks."""
+"""Secure XML parsing and schema validation."""
 from __future__ import annotations
 
 from pathlib import Path
 from typing import Iterable
 
-from defusedxml.ElementTree import fromstring as secure_fromstring
-from xml.etree import ElementTree as ET
+from lxml import etree
+
+from app.dgii.validation import XSDValidationError, schema_registry
 
 MAX_XML_BYTES = 2_000_000  # 2 MB
 MAX_XML_DEPTH = 64
+_FEED_CHUNK = 64 * 1024
+
+_PARSER_OPTIONS = {
+    "resolve_entities": False,
+    "no_network": True,
+    "load_dtd": False,
+    "dtd_validation": False,
+    "huge_tree": False,
+    "remove_blank_text": False,
+}
 
 
 class XMLSecurityError(ValueError):
     """Raised when XML violates security policies."""
 
 
-def _depth(node: ET.Element, level: int = 0) -> int:
-    children = list(node)
-    if not children:
-        return level
-    return max(_depth(child, level + 1) for child in children)
-
+def parse_secure(xml_bytes: bytes) -> etree._Element:
+    """Parse XML bytes once with a hardened lxml parser.
 
-def parse_secure(xml_bytes: bytes) -> ET.Element:
-    """Parse XML bytes with XXE protections and depth/size limits."""
+    Size is checked before parsing; nesting depth is enforced while the
+    parser emits events, so over-deep documents are rejected without being
+    fully materialised. DTDs and entity declarations are refused outright.
+    """
 
     if len(xml_bytes) > MAX_XML_BYTES:
         raise XMLSecurityError("XML demasiado grande")
 
-    root = secure_fromstring(xml_bytes)
-    if _depth(root) > MAX_XML_DEPTH:
-        raise XMLSecurityError("XML demasiado profundo")
+    parser = etree.XMLPullParser(events=("start", "end"), **_PARSER_OPTIONS)
+    depth = 0
+    try:
+        for offset in range(0, len(xml_bytes), _FEED_CHUNK):
+            parser.feed(xml_bytes[offset : offset + _FEED_CHUNK])
+            for event, _element in parser.read_events():
+                if event == "start":
+                    depth += 1
+                    if depth > MAX_XML_DEPTH + 1:
+                        raise XMLSecurityError("XML demasiado profundo")
+                else:
+                    depth -= 1
+        root = parser.close()
+    except etree.XMLSyntaxError as exc:
+        raise XMLSecurityError(f"XML mal formado: {exc}") from exc
+
+    docinfo = root.getroottree().docinfo
+    if docinfo.doctype or docinfo.internalDTD is not None:
+        raise XMLSecurityError("XML con DTD no permitido")
     return root
 
 
-def _require_paths(root: ET.Element, paths: Iterable[str]) -> None:
+def _require_paths(root: etree._Element, paths: Iterable[str]) -> None:
     for path in paths:
         if root.find(path) is None:
             raise XMLSecurityError(f"XML sin elemento requerido: {path}")
 
 
-def validate_with_xsd(xml_bytes: bytes, xsd_path: str) -> None:
-    """Validate XML bytes using lightweight checks derived from the schema name."""
-
-    root = parse_secure(xml_bytes)
-    schema_name = Path(xsd_path).name.lower()
-
-    if schema_name == "ecf.xsd":
-        if root.tag != "eCF":
-            raise XMLSecurityError("XML e-CF debe tener raíz eCF")
-        _require_paths(
-            root,
-            [
-                "Encabezado",
-                "Encabezado/ENCF",
-                "Encabezado/RNCEmisor",
-                "Detalle",
-            ],
-        )
-    elif schema_name == "acecf.xsd":
-        if root.tag != "ACECF":
-            raise XMLSecurityError("XML de aprobación debe tener raíz ACECF")
-        _require_paths(
-            root,
-            [
-                "ENCF",
-                "RNCEmisor",
-                "RNCComprador",
-                "Estado",
-            ],
-        )
-    else:
-        # For unknown schemas simply ensure the path exists to detect misconfiguration.
-        Path(xsd_path).resolve(strict=True)
-
-
-def ensure_elements(elements: Iterable[str], root: ET.Element) -> None:
+def validate_with_xsd(xml: bytes | etree._Element, xsd_path: str) -> etree._Element:
+    """Validate XML against the compiled schema and return the parsed root.
+
+    Accepts raw bytes or a root already produced by :func:`parse_secure`, so
+    callers can hand the same tree on to signature verification.
+    """
+
+    root = parse_secure(xml) if isinstance(xml, (bytes, bytearray)) else xml
+    compiled = schema_registry.get(Path(xsd_path).name)
+
+    # Fast path: a wrong document type is rejected without running the validator.
+    root_name = etree.QName(root).localname
+    if compiled.root_elements and root_name not in compiled.root_elements:
+        expected = ", ".join(sorted(compiled.root_elements))
+        raise XMLSecurityError(f"XML con raíz {root_name}; se esperaba {expected}")
+
+    try:
+        compiled.validate(root)
+    except XSDValidationError as exc:
+        raise XMLSecurityError(str(exc)) from exc
+    return root
+
+
+def ensure_elements(elements: Iterable[str], root: etree._Element) -> None:
     """Ensure required elements exist in an XML tree."""
 
     _require_paths(root, elements)
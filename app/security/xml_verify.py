@@ -1,27 +1,40 @@
 """XML digital signature verification helpers."""
 from __future__ import annotations
 
+import copy
+
+from lxml import etree
 from signxml import XMLVerifier
 
 from app.security.xml import parse_secure
 
 
-def verify_xml_signature(xml_bytes: bytes, *, require_x509: bool = False) -> bool:
+class _TreeVerifier(XMLVerifier):
+    """Verifier that copies an already parsed root instead of re-serializing it."""
+
+    def get_root(self, data):
+        if isinstance(data, etree._Element) and data.getparent() is None:
+            return copy.deepcopy(data)
+        return super().get_root(data)
+
+
+def verify_xml_signature(xml: bytes | etree._Element, *, require_x509: bool = False) -> bool:
     """Validate the XML signature using SignXML.
 
     Args:
-        xml_bytes: The XML payload that must contain a Signature element.
+        xml: The XML payload that must contain a Signature element, either as
+            raw bytes or as a root element returned by ``parse_secure``.
         require_x509: If ``True`` the signature must contain an X509 certificate.
 
     Returns:
         ``True`` when the signature is valid, otherwise ``False``.
     """
 
-    parse_secure(xml_bytes)  # Ensure document passes security guards first.
+    root = parse_secure(xml) if isinstance(xml, (bytes, bytearray)) else xml
     try:
-        verified = XMLVerifier().verify(xml_bytes)
+        verified = _TreeVerifier().verify(root)
     except Exception:
         return False
-    if require_x509 and not verified.signed_xml.find(".//{*}X509Certificate"):
+    if require_x509 and verified.signed_xml.find(".//{*}X509Certificate") is None:
         return False
     return True
@@ -10,6 +10,7 @@ from xml.etree.ElementTree import Element, SubElement, tostring
 import structlog
 
 from app.security.xml import validate_with_xsd
+from app.services.documents import ParsedDocument
 
 logger = structlog.get_logger(__name__)
 
@@ -48,17 +49,20 @@ def _extract_xml(payload: Union[str, bytes, Dict[str, Any]]) -> bytes:
     raise ValueError("Unsupported payload format for aprobación comercial")
 
 
-async def procesar_aprobacion(payload: Union[str, bytes, Dict[str, Any]]) -> Dict[str, Any]:
+async def procesar_aprobacion(payload: Union[str, bytes, Dict[str, Any], ParsedDocument]) -> Dict[str, Any]:
     """Validate approval payloads and return an acknowledgement."""
 
-    xml_bytes = _extract_xml(payload)
-    logger.info("aprobacion.ecf.decoded", size=len(xml_bytes))
+    if isinstance(payload, ParsedDocument):
+        document = payload
+    else:
+        document = ParsedDocument.from_bytes(_extract_xml(payload))
+    logger.info("aprobacion.ecf.decoded", **document.log_fields())
 
-    validate_with_xsd(xml_bytes, _APROBACION_XSD_PATH)
+    validate_with_xsd(document.root, _APROBACION_XSD_PATH)
 
     acuse_id = f"AC-{uuid.uuid4().hex[:10].upper()}"
     estado = "ACEPTADO"
     detalle = "OK"
-    logger.info("aprobacion.ecf.persisted", acuse_id=acuse_id)
+    logger.info("aprobacion.ecf.persisted", acuse_id=acuse_id, encf=document.encf, sha256=document.sha256)
 
     return {"acuseId": acuse_id, "estado": estado, "detalle": detalle, "timestamp": datetime.now(timezone.utc).isoformat()}
@@ -0,0 +1,92 @@
+"""Documento XML parseado una sola vez y compartido por el flujo de recepción."""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Optional
+
+from lxml import etree
+
+from app.security.xml import parse_secure
+
+# Nombre canónico -> etiquetas aceptadas en los distintos formatos DGII.
+_KEY_FIELDS: Dict[str, tuple[str, ...]] = {
+    "encf": ("ENCF", "eNCF"),
+    "rnc_emisor": ("RNCEmisor", "RncEmisor"),
+    "rnc_comprador": ("RNCComprador", "RncComprador", "RNCReceptor"),
+    "monto_total": ("MontoTotal",),
+    "tipo": ("TipoECF", "TipoeCF"),
+}
+_TAG_TO_FIELD = {tag: name for name, tags in _KEY_FIELDS.items() for tag in tags}
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedDocument:
+    """Bytes originales, árbol lxml y campos clave de un documento e-CF."""
+
+    raw: bytes
+    root: etree._Element
+    sha256: str
+    encf: Optional[str]
+    rnc_emisor: Optional[str]
+    rnc_comprador: Optional[str]
+    monto_total: Optional[Decimal]
+    tipo: str
+
+    @classmethod
+    def from_bytes(cls, raw: bytes, *, sha256: str | None = None) -> "ParsedDocument":
+        """Parsea ``raw`` con el parser seguro y extrae los campos clave.
+
+        ``sha256`` permite reutilizar un hash ya calculado (p. ej. para idempotencia).
+        """
+
+        root = parse_secure(raw)
+        fields = _extract_fields(root)
+        return cls(
+            raw=raw,
+            root=root,
+            sha256=sha256 or hashlib.sha256(raw).hexdigest(),
+            encf=fields.get("encf"),
+            rnc_emisor=fields.get("rnc_emisor"),
+            rnc_comprador=fields.get("rnc_comprador"),
+            monto_total=_to_decimal(fields.get("monto_total")),
+            tipo=fields.get("tipo") or etree.QName(root).localname,
+        )
+
+    @property
+    def size(self) -> int:
+        return len(self.raw)
+
+    def log_fields(self) -> Dict[str, object]:
+        """Campos seguros para incluir en logs estructurados."""
+
+        return {
+            "encf": self.encf,
+            "rnc_emisor": self.rnc_emisor,
+            "tipo": self.tipo,
+            "sha256": self.sha256,
+            "size": self.size,
+        }
+
+
+def _extract_fields(root: etree._Element) -> Dict[str, str]:
+    """Recorre el árbol una vez y se detiene al encontrar todos los campos."""
+
+    found: Dict[str, str] = {}
+    for element in root.iter(tag=etree.Element):
+        name = _TAG_TO_FIELD.get(etree.QName(element).localname)
+        if name and name not in found and element.text:
+            found[name] = element.text.strip()
+            if len(found) == len(_KEY_FIELDS):
+                break
+    return found
+
+
+def _to_decimal(value: Optional[str]) -> Optional[Decimal]:
+    if value is None:
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return None
@@ -1,12 +1,42 @@
-"""In-memory idempotency registry for ENFC endpoints."""
+"""Idempotency registry for ENFC endpoints with pluggable backends.
+
+Records live in memory (LRU with TTL, for tests and single-process runs) or in
+Redis so every gunicorn worker sees the same replays. While a request is being
+processed its key holds an "in-flight" lock; concurrent duplicates wait for the
+first result instead of reaching DGII twice. The lock value carries the payload
+hash plus a per-call token, and only the holder of that token may release it:
+a request that outlives ``lock_ttl`` cannot delete the lock of the duplicate
+that took over.
+"""
 from __future__ import annotations
 
 import asyncio
+import json
 import time
-from dataclasses import dataclass
-from typing import Any, Dict, Optional
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional, Protocol, Tuple
+
+import structlog
 
 _IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60  # 24 hours
+_LOCK_TTL_SECONDS = 60.0
+_WAIT_SECONDS = 30.0
+_POLL_SECONDS = 0.05
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+logger = structlog.get_logger(__name__)
+
+
+class IdempotencyInFlightError(ValueError):
+    """Another request with the same key is still being processed."""
 
 
 @dataclass(slots=True)
@@ -19,27 +49,161 @@ class IdempotencyRecord:
     headers: Dict[str, str]
     expires_at: float
 
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), default=str)
 
-class IdempotencyStore:
-    """Thread-safe store retaining responses for replayed requests."""
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> "IdempotencyRecord":
+        return cls(**json.loads(raw))
+
+
+class IdempotencyBackend(Protocol):
+    """Storage primitives required by :class:`IdempotencyStore`."""
+
+    async def load(self, key: str) -> Optional[IdempotencyRecord]: ...
+
+    async def save(self, key: str, record: IdempotencyRecord, ttl_seconds: float) -> None: ...
+
+    async def acquire(self, key: str, owner: str, ttl_seconds: float) -> bool: ...
+
+    async def lock_owner(self, key: str) -> Optional[str]: ...
+
+    async def release(self, key: str, owner: str) -> None: ...
+
+    async def clear(self) -> None: ...
+
+
+class MemoryIdempotencyBackend:
+    """Per-process backend: bounded LRU of records plus expiring locks."""
 
-    def __init__(self) -> None:
-        self._records: Dict[str, IdempotencyRecord] = {}
+    def __init__(self, *, max_entries: int = 10_000, clock: Callable[[], float] = time.monotonic) -> None:
+        self._max_entries = max_entries
+        self._clock = clock
+        self._records: "OrderedDict[str, Tuple[float, IdempotencyRecord]]" = OrderedDict()
+        self._locks: Dict[str, Tuple[float, str]] = {}
         self._lock = asyncio.Lock()
 
-    async def get(self, key: str, payload_hash: str) -> Optional[IdempotencyRecord]:
+    async def load(self, key: str) -> Optional[IdempotencyRecord]:
         async with self._lock:
-            record = self._records.get(key)
-            if not record:
+            entry = self._records.get(key)
+            if entry is None:
                 return None
-            if record.expires_at < time.time():
-                self._records.pop(key, None)
+            deadline, record = entry
+            if deadline <= self._clock():
+                del self._records[key]
                 return None
-            if record.payload_hash != payload_hash:
-                # Payload differs; treat as conflict per idempotency spec.
-                raise ValueError("Payload mismatch for supplied Idempotency-Key")
+            self._records.move_to_end(key)
             return record
 
+    async def save(self, key: str, record: IdempotencyRecord, ttl_seconds: float) -> None:
+        async with self._lock:
+            self._records[key] = (self._clock() + ttl_seconds, record)
+            self._records.move_to_end(key)
+            while len(self._records) > self._max_entries:
+                self._records.popitem(last=False)
+
+    async def acquire(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        async with self._lock:
+            now = self._clock()
+            current = self._locks.get(key)
+            if current is not None and current[0] > now:
+                return False
+            self._locks[key] = (now + ttl_seconds, owner)
+            return True
+
+    async def lock_owner(self, key: str) -> Optional[str]:
+        async with self._lock:
+            current = self._locks.get(key)
+            if current is None or current[0] <= self._clock():
+                self._locks.pop(key, None)
+                return None
+            return current[1]
+
+    async def release(self, key: str, owner: str) -> None:
+        async with self._lock:
+            current = self._locks.get(key)
+            if current is not None and current[1] == owner:
+                del self._locks[key]
+
+    async def clear(self) -> None:
+        async with self._lock:
+            self._records.clear()
+            self._locks.clear()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+class RedisIdempotencyBackend:
+    """Shared backend: JSON records with ``PX`` expiry and ``SET NX`` locks."""
+
+    def __init__(self, redis: Any, *, prefix: str = "idempotency") -> None:
+        self._redis = redis
+        self._prefix = prefix
+
+    def _record_key(self, key: str) -> str:
+        return f"{self._prefix}:record:{key}"
+
+    def _lock_key(self, key: str) -> str:
+        return f"{self._prefix}:lock:{key}"
+
+    async def load(self, key: str) -> Optional[IdempotencyRecord]:
+        raw = await self._redis.get(self._record_key(key))
+        return IdempotencyRecord.from_json(raw) if raw else None
+
+    async def save(self, key: str, record: IdempotencyRecord, ttl_seconds: float) -> None:
+        await self._redis.set(self._record_key(key), record.to_json(), px=max(1, int(ttl_seconds * 1000)))
+
+    async def acquire(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        return bool(await self._redis.set(self._lock_key(key), owner, nx=True, px=max(1, int(ttl_seconds * 1000))))
+
+    async def lock_owner(self, key: str) -> Optional[str]:
+        raw = await self._redis.get(self._lock_key(key))
+        if raw is None:
+            return None
+        return raw.decode() if isinstance(raw, bytes) else raw
+
+    async def release(self, key: str, owner: str) -> None:
+        await self._redis.eval(_RELEASE_LOCK_SCRIPT, 1, self._lock_key(key), owner)
+
+    async def clear(self) -> None:
+        keys = [key async for key in self._redis.scan_iter(match=f"{self._prefix}:*")]
+        if keys:
+            await self._redis.delete(*keys)
+
+
+class IdempotencyStore:
+    """Store retaining responses for replayed requests.
+
+    ``get``/``set`` keep their historical semantics; ``begin``/``release``
+    bracket the processing of a request so duplicates arriving meanwhile wait
+    for the stored result.
+    """
+
+    def __init__(
+        self,
+        backend: IdempotencyBackend | None = None,
+        *,
+        ttl_seconds: float = _IDEMPOTENCY_TTL_SECONDS,
+        lock_ttl_seconds: float = _LOCK_TTL_SECONDS,
+        wait_seconds: float = _WAIT_SECONDS,
+        poll_seconds: float = _POLL_SECONDS,
+    ) -> None:
+        self.backend: IdempotencyBackend = backend if backend is not None else MemoryIdempotencyBackend()
+        self._ttl_seconds = ttl_seconds
+        self._lock_ttl_seconds = lock_ttl_seconds
+        self._wait_seconds = wait_seconds
+        self._poll_seconds = poll_seconds
+
+    async def get(self, key: str, payload_hash: str) -> Optional[IdempotencyRecord]:
+        record = await self.backend.load(key)
+        if record is None:
+            return None
+        if record.payload_hash != payload_hash:
+            # Payload differs; treat as conflict per idempotency spec.
+            raise ValueError("Payload mismatch for supplied Idempotency-Key")
+        return record
+
     async def set(
         self,
         key: str,
@@ -48,18 +212,74 @@ class IdempotencyStore:
         body: Any,
         headers: Optional[Dict[str, str]] = None,
     ) -> None:
-        async with self._lock:
-            self._records[key] = IdempotencyRecord(
-                payload_hash=payload_hash,
-                status_code=status_code,
-                body=body,
-                headers=headers or {},
-                expires_at=time.time() + _IDEMPOTENCY_TTL_SECONDS,
-            )
+        record = IdempotencyRecord(
+            payload_hash=payload_hash,
+            status_code=status_code,
+            body=body,
+            headers=headers or {},
+            expires_at=time.time() + self._ttl_seconds,
+        )
+        await self.backend.save(key, record, self._ttl_seconds)
+
+    async def begin(self, key: str, payload_hash: str) -> Tuple[Optional[IdempotencyRecord], Optional[str]]:
+        """Return ``(record, None)`` for a replay, or take the lock and return ``(None, token)``.
+
+        When another request holds the lock this waits until it stores its
+        result (returned as a replay) or gives up. The caller that receives a
+        token must pass it to :meth:`release` once it has stored its result.
+        """
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._wait_seconds
+        token = f"{payload_hash}:{uuid.uuid4().hex}"
+        while True:
+            record = await self.get(key, payload_hash)
+            if record is not None:
+                return record, None
+            if await self.backend.acquire(key, token, self._lock_ttl_seconds):
+                # The holder may have stored its result between both calls.
+                record = await self.get(key, payload_hash)
+                if record is not None:
+                    await self.backend.release(key, token)
+                    return record, None
+                return None, token
+            owner = await self.backend.lock_owner(key)
+            if owner is not None and owner.rpartition(":")[0] != payload_hash:
+                raise ValueError("Payload mismatch for supplied Idempotency-Key")
+            if loop.time() >= deadline:
+                logger.warning("idempotency.wait_timeout", key=key)
+                raise IdempotencyInFlightError("Solicitud con el mismo Idempotency-Key en proceso")
+            await asyncio.sleep(self._poll_seconds)
+
+    async def release(self, key: str, token: str) -> None:
+        """Drop the in-flight lock if ``token`` (from :meth:`begin`) still holds it."""
+
+        await self.backend.release(key, token)
 
     async def clear(self) -> None:
-        async with self._lock:
-            self._records.clear()
+        await self.backend.clear()
+
+
+def build_idempotency_store(config: Any | None = None) -> IdempotencyStore:
+    """Build the store selected by ``idempotency_backend`` in the settings."""
+
+    if config is None:
+        from app.infra.settings import settings as config
+
+    if config.idempotency_backend == "redis":
+        import redis.asyncio as redis  # type: ignore[import-not-found]
+
+        backend: IdempotencyBackend = RedisIdempotencyBackend(
+            redis.from_url(config.redis_url, decode_responses=True),
+        )
+    else:
+        backend = MemoryIdempotencyBackend(max_entries=config.idempotency_max_entries)
+    return IdempotencyStore(
+        backend,
+        ttl_seconds=config.idempotency_ttl_seconds,
+        lock_ttl_seconds=config.idempotency_lock_ttl_seconds,
+        wait_seconds=config.idempotency_wait_seconds,
+    )
 
 
-idempotency_store = IdempotencyStore()
+idempotency_store = build_idempotency_store()
@@ -11,6 +11,7 @@ import structlog
 
 from app.security.xml import validate_with_xsd
 from app.security.xml_verify import verify_xml_signature
+from app.services.documents import ParsedDocument
 
 logger = structlog.get_logger(__name__)
 
@@ -50,20 +51,23 @@ def _extract_xml_bytes(payload: Union[str, bytes, Dict[str, Any]]) -> bytes:
     raise ValueError("Unsupported payload format for e-CF reception")
 
 
-async def procesar_ecf(payload: Union[str, bytes, Dict[str, Any]]) -> Dict[str, Any]:
+async def procesar_ecf(payload: Union[str, bytes, Dict[str, Any], ParsedDocument]) -> Dict[str, Any]:
     """Validate and persist the incoming e-CF payload, returning an acknowledgement."""
 
-    xml_bytes = _extract_xml_bytes(payload)
-    logger.info("recepcion.ecf.decoded", size=len(xml_bytes))
+    if isinstance(payload, ParsedDocument):
+        document = payload
+    else:
+        document = ParsedDocument.from_bytes(_extract_xml_bytes(payload))
+    logger.info("recepcion.ecf.decoded", **document.log_fields())
 
-    validate_with_xsd(xml_bytes, _ECF_XSD_PATH)
-    if not verify_xml_signature(xml_bytes):
-        logger.warning("recepcion.ecf.signature_invalid")
+    validate_with_xsd(document.root, _ECF_XSD_PATH)
+    if not verify_xml_signature(document.root):
+        logger.warning("recepcion.ecf.signature_invalid", encf=document.encf)
         raise ValueError("Firma inválida del documento e-CF")
 
     acuse_id = f"ARC-{uuid.uuid4().hex[:12].upper()}"
     timestamp = datetime.now(timezone.utc).isoformat()
-    logger.info("recepcion.ecf.persisted", acuse_id=acuse_id)
+    logger.info("recepcion.ecf.persisted", acuse_id=acuse_id, encf=document.encf, sha256=document.sha256)
 
     return {
         "acuseId": acuse_id,
@@ -2,16 +2,17 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
-from typing import Iterator
+from typing import AsyncIterator, Iterator
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db import SyncSessionFactory
+from app.db import AsyncSessionFactory, SyncSessionFactory
 
 
 @contextmanager
 def session_scope() -> Iterator[Session]:
-    """Provee un contexto seguro para operaciones DB reutilizando el engine async."""
+    """Sesión bloqueante para reportes de administración y tareas fuera del event loop."""
 
     session = SyncSessionFactory()
     try:
@@ -29,3 +30,15 @@ def get_db() -> Iterator[Session]:
 
     with session_scope() as session:
         yield session
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Dependencia de FastAPI para rutas async: la E/S de base de datos no bloquea el loop."""
+
+    async with AsyncSessionFactory() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:  # pragma: no cover - defensive rollback
+            await session.rollback()
+            raise
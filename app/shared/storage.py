@@ -1,21 +1,38 @@
-"""Abstracciones de almacenamiento WORM y manejo de archivos."""
+"""Abstracciones de almacenamiento WORM y manejo de archivos.
+
+``ContentAddressedStore`` guarda cada XML bajo su SHA-256, calculado mientras
+se escribe (una sola lectura del contenido), en directorios repartidos por
+prefijo del hash (``ab/cd/abcd...``). Contenidos idénticos se guardan una sola
+vez. El backend local escribe a un temporal y lo publica con ``os.link``
+(atómico y sin sobrescribir) según la política ``STORAGE_FSYNC``; el backend S3
+acepta cualquier servicio compatible (AWS, MinIO) o un cliente inyectado.
+"""
 from __future__ import annotations
 
+import base64
 import hashlib
 import json
+import os
+import tempfile
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Literal, Protocol, Union
 
 from app.shared.settings import settings
 
+CHUNK_SIZE = 1024 * 1024
+
+FsyncPolicy = Literal["always", "file", "none"]
+Payload = Union[bytes, bytearray, memoryview, BinaryIO, Iterable[bytes]]
+
 
 class LocalStorage:
     """Implementación simple de almacenamiento inmutable local."""
 
     def __init__(self, base_path: Path | None = None) -> None:
+        # Los directorios se crean al escribir: importar el módulo no toca el disco.
         self.base_path = base_path or settings.storage_base_path
-        self.base_path.mkdir(parents=True, exist_ok=True)
 
     def store_bytes(self, relative_path: str, data: bytes) -> Path:
         """Guarda datos como archivo WORM calculando hash SHA-512."""
@@ -49,3 +66,215 @@ class LocalStorage:
 
 
 storage = LocalStorage()
+
+
+class ContentIntegrityError(RuntimeError):
+    """El contenido leído no coincide con el hash bajo el que se guardó."""
+
+
+@dataclass(frozen=True, slots=True)
+class StoredBlob:
+    sha256: str
+    size: int
+    key: str
+    created: bool  # False si el contenido ya existía y se reutilizó
+
+
+def shard_key(sha256: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def iter_chunks(payload: Payload) -> Iterator[bytes]:
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        yield bytes(payload)
+    elif hasattr(payload, "read"):
+        while chunk := payload.read(CHUNK_SIZE):
+            yield chunk
+    else:
+        yield from payload
+
+
+class BlobBackend(Protocol):
+    def put(self, chunks: Iterable[bytes]) -> StoredBlob: ...
+
+    def exists(self, key: str) -> bool: ...
+
+    def open(self, key: str) -> Iterator[bytes]: ...
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class LocalBlobBackend:
+    """Objetos en ``base_path/ab/cd/<sha256>``, de solo lectura una vez publicados."""
+
+    def __init__(self, base_path: Path, *, fsync: FsyncPolicy = "always") -> None:
+        self.base_path = Path(base_path)
+        self.fsync = fsync
+
+    def put(self, chunks: Iterable[bytes]) -> StoredBlob:
+        staging = self.base_path / "tmp"
+        staging.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=staging)
+        tmp = Path(tmp_name)
+        try:
+            hasher = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, "wb") as handle:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    handle.write(chunk)
+                    size += len(chunk)
+                handle.flush()
+                if self.fsync != "none":
+                    os.fsync(handle.fileno())
+            digest = hasher.hexdigest()
+            key = shard_key(digest)
+            target = self.base_path / key
+            if target.exists():
+                return StoredBlob(digest, size, key, created=False)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.chmod(tmp, 0o444)
+            try:
+                os.link(tmp, target)  # atómico y nunca sobrescribe (WORM)
+            except FileExistsError:
+                return StoredBlob(digest, size, key, created=False)
+            except OSError:
+                os.replace(tmp, target)  # sistemas de archivos sin enlaces duros
+            if self.fsync == "always":
+                _fsync_dir(target.parent)
+                _fsync_dir(target.parent.parent)
+            return StoredBlob(digest, size, key, created=True)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return (self.base_path / key).is_file()
+
+    def open(self, key: str) -> Iterator[bytes]:
+        with open(self.base_path / key, "rb") as handle:
+            yield from iter_chunks(handle)
+
+
+def _is_not_found(exc: Exception) -> bool:
+    error = getattr(exc, "response", None) or {}
+    return str(error.get("Error", {}).get("Code")) in {"404", "NoSuchKey", "NotFound"}
+
+
+class S3BlobBackend:
+    """Backend S3 compatible; el contenido se acumula en un temporal para hashearlo antes de subir."""
+
+    def __init__(
+        self,
+        bucket: str,
+        *,
+        client: Any | None = None,
+        prefix: str = "",
+        endpoint_url: str | None = None,
+        spool_bytes: int = 8 * 1024 * 1024,
+        content_type: str = "application/xml",
+    ) -> None:
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.endpoint_url = endpoint_url
+        self.spool_bytes = spool_bytes
+        self.content_type = content_type
+        self._client = client
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            try:
+                import boto3  # type: ignore[import-not-found]
+            except ImportError as exc:
+                raise RuntimeError("STORAGE_BACKEND=s3 requiere boto3 (extra 's3')") from exc
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url)
+        return self._client
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, chunks: Iterable[bytes]) -> StoredBlob:
+        with tempfile.SpooledTemporaryFile(max_size=self.spool_bytes) as spool:
+            hasher = hashlib.sha256()
+            size = 0
+            for chunk in chunks:
+                hasher.update(chunk)
+                spool.write(chunk)
+                size += len(chunk)
+            digest = hasher.hexdigest()
+            key = shard_key(digest)
+            if self.exists(key):
+                return StoredBlob(digest, size, key, created=False)
+            spool.seek(0)
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=self._object_key(key),
+                Body=spool,
+                ContentLength=size,
+                ContentType=self.content_type,
+                ChecksumSHA256=base64.b64encode(bytes.fromhex(digest)).decode(),
+            )
+        return StoredBlob(digest, size, key, created=True)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as exc:  # noqa: BLE001 - botocore.ClientError sin importar botocore
+            if _is_not_found(exc):
+                return False
+            raise
+        return True
+
+    def open(self, key: str) -> Iterator[bytes]:
+        body = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))["Body"]
+        try:
+            yield from iter_chunks(body)
+        finally:
+            body.close()
+
+
+class ContentAddressedStore:
+    """Archivo de XML direccionado por contenido sobre un :class:`BlobBackend`."""
+
+    def __init__(self, backend: BlobBackend) -> None:
+        self.backend = backend
+
+    def put(self, payload: Payload) -> StoredBlob:
+        return self.backend.put(iter_chunks(payload))
+
+    def exists(self, sha256: str) -> bool:
+        return self.backend.exists(shard_key(sha256))
+
+    def open(self, sha256: str) -> Iterator[bytes]:
+        return self.backend.open(shard_key(sha256))
+
+    def read(self, sha256: str, *, verify: bool = True) -> bytes:
+        data = b"".join(self.open(sha256))
+        if verify and hashlib.sha256(data).hexdigest() != sha256:
+            raise ContentIntegrityError(f"El contenido de {sha256} no coincide con su hash")
+        return data
+
+
+def build_content_store(config: Any | None = None) -> ContentAddressedStore:
+    """Construye el archivo según ``STORAGE_BACKEND``; no toca disco ni red hasta usarse."""
+
+    config = config or settings
+    backend: BlobBackend
+    if config.storage_backend == "s3":
+        backend = S3BlobBackend(
+            config.storage_bucket,
+            prefix=config.storage_s3_prefix,
+            endpoint_url=config.storage_s3_endpoint_url,
+        )
+    else:
+        backend = LocalBlobBackend(Path(config.storage_base_path) / "cas", fsync=config.storage_fsync)
+    return ContentAddressedStore(backend)
+
+
+content_store = build_content_store()
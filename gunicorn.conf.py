@@ -8,3 +8,12 @@ graceful_timeout = 30
 keepalive = 5
 accesslog = "-"
 errorlog = "-"
+
+
+def post_fork(server, worker):
+    """Compila los XSD en cada worker antes de aceptar tráfico."""
+
+    from app.dgii.validation import warm_up_schemas
+
+    timings = warm_up_schemas()
+    server.log.info("Worker %s: %d XSD compilados en %.3fs", worker.pid, len(timings), sum(timings.values()))
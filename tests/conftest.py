@@ -30,15 +30,15 @@ def pytest_addoption(parser: pytest.Parser) -> None:
     parser.addoption("--cov-fail-under", action="store", default=None)
 
 
-@pytest.fixture(scope="session")
-def certificate_bundle(tmp_path_factory: pytest.TempPathFactory) -> Tuple[Path, bytes, rsa.RSAPrivateKey, x509.Certificate]:
-    cert_dir = tmp_path_factory.mktemp("certs")
+def _write_certificate_bundle(
+    cert_dir: Path, common_name: str
+) -> Tuple[Path, bytes, rsa.RSAPrivateKey, x509.Certificate]:
     key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
     subject = issuer = x509.Name(
         [
             x509.NameAttribute(NameOID.COUNTRY_NAME, "DO"),
             x509.NameAttribute(NameOID.ORGANIZATION_NAME, "Test Company"),
-            x509.NameAttribute(NameOID.COMMON_NAME, "test.getupnet.local"),
+            x509.NameAttribute(NameOID.COMMON_NAME, common_name),
         ]
     )
     cert = (
@@ -66,6 +66,33 @@ def certificate_bundle(tmp_path_factory: pytest.TempPathFactory) -> Tuple[Path,
     return output_path, password, key, cert
 
 
+@pytest.fixture(scope="session")
+def certificate_bundle(tmp_path_factory: pytest.TempPathFactory) -> Tuple[Path, bytes, rsa.RSAPrivateKey, x509.Certificate]:
+    return _write_certificate_bundle(tmp_path_factory.mktemp("certs"), "test.getupnet.local")
+
+
+@pytest.fixture(scope="session")
+def tenant_certificate_bundle(
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Tuple[Path, bytes, rsa.RSAPrivateKey, x509.Certificate]:
+    """Certificado distinto al por defecto para un emisor registrado aparte."""
+
+    return _write_certificate_bundle(tmp_path_factory.mktemp("tenant-certs"), "emisor.getupnet.local")
+
+
+@pytest.fixture
+def tenant_signing(configured_settings, tenant_certificate_bundle, monkeypatch: pytest.MonkeyPatch):
+    """Registra el emisor ``101010101`` con su propio certificado en el pool de firma global."""
+
+    from app.dgii.signing_pool import signing_pool
+
+    path, password, _key, cert = tenant_certificate_bundle
+    monkeypatch.setattr(signing_pool, "mode", "inline")
+    monkeypatch.setattr(signing_pool, "_tenants", {})
+    signing_pool.register_tenant("101010101", str(path), password.decode())
+    return {"tenant": "101010101", "certificate": cert, "default_certificate": configured_settings["certificate"]}
+
+
 @pytest.fixture
 def configured_settings(certificate_bundle: Tuple[Path, bytes, rsa.RSAPrivateKey, x509.Certificate]):
     from app.core.config import settings
@@ -86,6 +113,53 @@ def configured_settings(certificate_bundle: Tuple[Path, bytes, rsa.RSAPrivateKey
         settings.dgii_cert_p12_password = original_password
 
 
+@pytest.fixture
+def sqlite_engine():
+    """Base SQLite en memoria con el esquema completo de la aplicación."""
+
+    from sqlalchemy import create_engine
+
+    import app.models  # noqa: F401 - registra todas las tablas
+    from app.models.base import Base
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture
+def session_class():
+    """Clase de sesión de ``sqlite_session``; un módulo la redefine para usar ``AppSession``."""
+
+    from sqlalchemy.orm import Session
+
+    return Session
+
+
+@pytest.fixture
+def sqlite_session(sqlite_engine, session_class):
+    with session_class(sqlite_engine) as session:
+        yield session
+
+
+@pytest.fixture
+def make_tenant(sqlite_session):
+    """Crea (y persiste con ``flush``) un tenant con las URLs DGII de prueba."""
+
+    from app.models.tenant import Tenant
+
+    def _make(name: str = "Acme", rnc: str = "131415161", **kwargs) -> Tenant:
+        tenant = Tenant(name=name, rnc=rnc, dgii_base_ecf="https://ecf", dgii_base_fc="https://fc", **kwargs)
+        sqlite_session.add(tenant)
+        sqlite_session.flush()
+        return tenant
+
+    return _make
+
+
 @pytest.fixture(autouse=True)
 async def fake_redis_backend(monkeypatch: pytest.MonkeyPatch):
     from app.security import rate_limit
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import AsyncIterator, List
+
+import pytest
+
+from app.dgii.batch import BatchItemError, BatchPipeline, parse_json_array, parse_ndjson
+from app.services.idempotency import IdempotencyStore
+
+
+def _submission(encf: str, monto: str = "100.00") -> dict:
+    return {
+        "encf": encf,
+        "tipoECF": "E31",
+        "rncEmisor": "131415161",
+        "rncReceptor": "101010101",
+        "fechaEmision": "2024-05-01T10:00:00",
+        "montoTotal": monto,
+        "items": [{"descripcion": "Servicio", "cantidad": "1", "precioUnitario": monto}],
+    }
+
+
+async def _chunks(payload: bytes, size: int = 7) -> AsyncIterator[bytes]:
+    for start in range(0, len(payload), size):
+        yield payload[start : start + size]
+
+
+def _pipeline(sent: List[str], store: IdempotencyStore | None = None) -> BatchPipeline:
+    async def prepare(submission):
+        if submission.encf.endswith("9"):
+            raise ValueError("XML inválido")
+        return f"<signed>{submission.encf}</signed>".encode()
+
+    async def send(submission, signed, key):
+        await asyncio.sleep(0)
+        sent.append(key)
+        return {"trackId": f"T-{submission.encf}", "estado": "EN_PROCESO"}
+
+    return BatchPipeline(prepare=prepare, send=send, prepare_concurrency=2, send_concurrency=3, idempotency=store)
+
+
+async def test_ndjson_stream_reports_partial_failures() -> None:
+    lines = [json.dumps(_submission(f"E31000000000{i}")) for i in range(1, 10)]
+    lines.insert(3, '{"encf": "roto"}')
+    body = ("\n".join(lines) + "\n").encode()
+    sent: List[str] = []
+
+    pipeline = _pipeline(sent)
+    results = [result async for result in pipeline.run(parse_ndjson(_chunks(body), max_items=100))]
+
+    assert sorted(result.index for result in results) == list(range(10))
+    failures = {result.index: result.error for result in results if not result.ok}
+    assert set(failures) == {3, 9}
+    assert "XML inválido" in failures[9]
+    assert pipeline.summary.enviados == 8
+    assert pipeline.summary.errores == 2
+    assert len(sent) == 8
+
+
+async def test_items_are_idempotent_across_batches() -> None:
+    store = IdempotencyStore()
+    body = json.dumps([_submission("E310000000001"), _submission("E310000000002")]).encode()
+    sent: List[str] = []
+
+    first = [r async for r in _pipeline(sent, store).run(parse_json_array(body, max_items=10))]
+    second = [r async for r in _pipeline(sent, store).run(parse_json_array(body, max_items=10))]
+
+    assert len(sent) == 2
+    assert all(result.replay for result in second)
+    assert {r.track_id for r in first} == {r.track_id for r in second}
+
+    changed = json.dumps([_submission("E310000000001", monto="200.00")]).encode()
+    conflict = [r async for r in _pipeline(sent, store).run(parse_json_array(changed, max_items=10))]
+    assert conflict[0].ok is False
+
+
+async def test_batch_limits() -> None:
+    with pytest.raises(ValueError):
+        parse_json_array(b"[1, 2, 3]", max_items=2)
+    with pytest.raises(ValueError):
+        parse_json_array(b"{}", max_items=2)
+
+    body = "\n".join(json.dumps(_submission(f"E31000000000{i}")) for i in range(1, 4)).encode()
+    parsed = [item async for item in parse_ndjson(_chunks(body), max_items=2)]
+    assert isinstance(parsed[-1], BatchItemError)
+
+
+@pytest.mark.parametrize("error", ["db", "conexion"])
+async def test_accepted_document_is_tracked_when_usage_recording_fails(error: str, monkeypatch) -> None:
+    from sqlalchemy.exc import OperationalError
+
+    from app.dgii.schemas import ECFSubmission
+    from app.routers import recepcion
+
+    class _Client:
+        async def send_ecf(self, signed_xml: bytes, token: str, *, idempotency_key: str | None = None) -> dict:
+            return {"trackId": "TRACK-9", "estado": "EN_PROCESO"}
+
+    async def record_usage(submission, track_id) -> None:
+        if error == "db":
+            raise OperationalError("INSERT", {}, Exception("server closed the connection"))
+        raise ConnectionRefusedError("db caída")
+
+    enqueued: List[tuple] = []
+
+    async def enqueue(track_id: str, tenant: str | None = None) -> bool:
+        enqueued.append((track_id, tenant))
+        return True
+
+    monkeypatch.setattr(recepcion, "_record_usage", record_usage)
+    monkeypatch.setattr(recepcion.dispatcher, "enqueue_status_check", enqueue)
+    submission = ECFSubmission.model_validate(_submission("E310000000009"))
+
+    result = await recepcion._send_document(_Client(), "tok", submission, b"<ECF/>", "k")
+
+    assert result["trackId"] == "TRACK-9"
+    assert enqueued == [("TRACK-9", "131415161")]
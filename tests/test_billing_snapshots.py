@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.billing.services import BillingService
+from app.billing.usage_counters import tenant_plan_cache
+from app.db import AppSession
+from app.models.billing import BillingPeriod, Plan, UsageRecord
+from app.models.tenant import Tenant
+from app.portal_admin.reports import billing_summary
+
+
+@pytest.fixture()
+def session_class():
+    return AppSession
+
+
+@pytest.fixture()
+def session(sqlite_session, make_tenant):
+    tenant_plan_cache.invalidate()
+    plan = Plan(name="basico", documentos_incluidos=0, precio_por_documento=Decimal("2"))
+    make_tenant(plan=plan)
+    make_tenant("Beta", "101010101", plan=plan)
+    sqlite_session.commit()
+    yield sqlite_session
+    tenant_plan_cache.invalidate()
+
+
+def _add_may_usage(session: Session, rnc: str, fecha: datetime, monto: str) -> UsageRecord:
+    tenant = session.scalar(select(Tenant).where(Tenant.rnc == rnc))
+    record = UsageRecord(tenant_id=tenant.id, ecf_type="31", monto_cargado=Decimal(monto), fecha=fecha)
+    session.add(record)
+    session.commit()
+    return record
+
+
+def test_current_month_reads_counters(session: Session) -> None:
+    service = BillingService(session)
+    service.record_usage_for_rnc(rnc="131415161", ecf_type="31")
+    service.record_usage_for_rnc(rnc="131415161", ecf_type="31")
+    service.record_usage_for_rnc(rnc="101010101", ecf_type="31")
+    session.commit()
+
+    rows = billing_summary(session, datetime.utcnow())
+    assert [(row["client_name"], row["invoice_count"], row["total_amount_due"]) for row in rows] == [
+        ("Acme", 2, Decimal("4")),
+        ("Beta", 1, Decimal("2")),
+    ]
+    assert session.scalar(select(BillingPeriod)) is None
+
+
+def test_closed_month_is_snapshotted_once(session: Session) -> None:
+    _add_may_usage(session, "131415161", datetime(2024, 5, 3), "2")
+    _add_may_usage(session, "131415161", datetime(2024, 5, 9), "2")
+
+    first = billing_summary(session, datetime(2024, 5, 1))
+    session.commit()
+    assert [(row["client_name"], row["invoice_count"], row["total_amount_due"]) for row in first] == [
+        ("Acme", 2, Decimal("4.0000"))
+    ]
+    closed_at = session.scalar(select(BillingPeriod.closed_at))
+
+    assert billing_summary(session, datetime(2024, 5, 20)) == first
+    assert session.scalar(select(BillingPeriod.closed_at)) == closed_at
+
+
+def test_corrections_invalidate_the_closed_month(session: Session) -> None:
+    record = _add_may_usage(session, "131415161", datetime(2024, 5, 3), "2")
+    billing_summary(session, datetime(2024, 5, 1))
+    session.commit()
+
+    record.monto_cargado = Decimal("0.5")
+    session.commit()
+    assert session.scalar(select(BillingPeriod)) is None
+
+    _add_may_usage(session, "101010101", datetime(2024, 5, 7), "2")
+    rows = billing_summary(session, datetime(2024, 5, 1))
+    session.commit()
+    assert [(row["client_name"], row["total_amount_due"]) for row in rows] == [
+        ("Acme", Decimal("0.5000")),
+        ("Beta", Decimal("2.0000")),
+    ]
+
+    session.delete(record)
+    session.commit()
+    rows = billing_summary(session, datetime(2024, 5, 1))
+    assert [row["client_name"] for row in rows] == ["Beta"]
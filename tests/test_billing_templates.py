@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import pytest
+from lxml import etree
+
+from app.billing.acecf_builder import build_acecf
+from app.billing.rfce_builder import build_rfce
+from app.billing.templates import TEMPLATES, render_document
+
+
+@pytest.mark.parametrize("name", sorted(TEMPLATES))
+def test_engines_render_identical_escaped_xml(name: str) -> None:
+    context = {field: f"<{field}> & \"x\"" for field in TEMPLATES[name].fields}
+    rendered = render_document(name, engine="format", **context)
+
+    assert rendered == render_document(name, engine="jinja", **context)
+    assert "<rnc_emisor>" not in rendered and "&lt;rnc_emisor&gt; &amp;" in rendered
+    etree.fromstring(rendered.encode("utf-8"))
+
+
+def test_builders_escape_free_text_fields() -> None:
+    xml = build_acecf(
+        encf="E310000000001",
+        rnc_emisor="131415161",
+        rnc_comprador="101010101",
+        estado=2,
+        detalle_motivo="Monto <incorrecto> & duplicado",
+    )
+    root = etree.fromstring(xml.encode("utf-8"))
+    assert root.findtext("DetalleMotivo") == "Monto <incorrecto> & duplicado"
+
+    rfce = build_rfce(encf="E320000000001", rnc_emisor="131415161", total=10.5)
+    assert rfce.startswith("<?xml version='1.0' encoding='UTF-8'?><Resumen><RNCEmisor>131415161</RNCEmisor>")
+    assert "<Total>10.50</Total>" in rfce
+
+
+def test_missing_fields_are_rejected() -> None:
+    with pytest.raises(ValueError, match="Faltan campos"):
+        render_document("rfce", encf="E320000000001")
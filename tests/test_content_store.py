@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import io
+import os
+import stat
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from app.shared.storage import (
+    ContentAddressedStore,
+    ContentIntegrityError,
+    LocalBlobBackend,
+    S3BlobBackend,
+    build_content_store,
+    shard_key,
+)
+
+XML = b"<?xml version='1.0' encoding='UTF-8'?><ECF><Encabezado><eNCF>E310000000001</eNCF></Encabezado></ECF>"
+SHA = "0" * 64
+
+
+class _NotFound(Exception):
+    def __init__(self) -> None:
+        super().__init__("Not Found")
+        self.response = {"Error": {"Code": "404"}}
+
+
+class FakeS3:
+    """Stand-in en memoria con la parte de la API de S3 que usa el backend."""
+
+    def __init__(self) -> None:
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self.puts = 0
+
+    def head_object(self, *, Bucket: str, Key: str) -> dict:
+        if (Bucket, Key) not in self.objects:
+            raise _NotFound()
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def put_object(self, *, Bucket: str, Key: str, Body, ContentLength: int, **_: object) -> dict:
+        data = Body.read()
+        assert len(data) == ContentLength
+        self.objects[(Bucket, Key)] = data
+        self.puts += 1
+        return {}
+
+    def get_object(self, *, Bucket: str, Key: str) -> dict:
+        if (Bucket, Key) not in self.objects:
+            raise _NotFound()
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+
+def test_local_store_shards_and_deduplicates(tmp_path) -> None:
+    store = ContentAddressedStore(LocalBlobBackend(tmp_path, fsync="always"))
+
+    first = store.put(XML)
+    second = store.put(iter([XML[:10], XML[10:]]))
+
+    assert first.created and not second.created
+    assert first.sha256 == second.sha256 and first.size == len(XML)
+    assert first.key == shard_key(first.sha256) == f"{first.sha256[:2]}/{first.sha256[2:4]}/{first.sha256}"
+    assert store.read(first.sha256) == XML
+    assert stat.S_IMODE(os.stat(tmp_path / first.key).st_mode) == 0o444
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+def test_local_store_detects_corruption(tmp_path) -> None:
+    store = ContentAddressedStore(LocalBlobBackend(tmp_path, fsync="none"))
+    blob = store.put(io.BytesIO(XML))
+    target = tmp_path / blob.key
+    os.chmod(target, 0o644)
+    target.write_bytes(XML + b"<!-- alterado -->")
+
+    with pytest.raises(ContentIntegrityError):
+        store.read(blob.sha256)
+    assert store.read(blob.sha256, verify=False).endswith(b"-->")
+
+
+def test_s3_backend_against_stand_in() -> None:
+    client = FakeS3()
+    store = ContentAddressedStore(S3BlobBackend("archivo", client=client, prefix="xml/", spool_bytes=16))
+
+    blob = store.put(XML)
+    again = store.put(XML)
+
+    assert (blob.created, again.created, client.puts) == (True, False, 1)
+    assert ("archivo", f"xml/{blob.key}") in client.objects
+    assert store.exists(blob.sha256) and not store.exists(SHA)
+    assert store.read(blob.sha256) == XML
+
+
+def test_build_content_store_selects_backend(tmp_path) -> None:
+    local = build_content_store(
+        SimpleNamespace(storage_backend="local", storage_base_path=tmp_path, storage_fsync="file")
+    )
+    assert isinstance(local.backend, LocalBlobBackend) and local.backend.base_path == tmp_path / "cas"
+
+    remote = build_content_store(
+        SimpleNamespace(
+            storage_backend="s3",
+            storage_bucket="ecf",
+            storage_s3_prefix="xml",
+            storage_s3_endpoint_url="http://minio:9000",
+        )
+    )
+    assert isinstance(remote.backend, S3BlobBackend) and remote.backend.endpoint_url == "http://minio:9000"
+
+
+def test_s3_backend_without_boto3_names_the_extra(monkeypatch) -> None:
+    monkeypatch.setitem(sys.modules, "boto3", None)
+    with pytest.raises(RuntimeError, match="extra 's3'"):
+        S3BlobBackend("archivo").client
+
+
+async def test_repository_indexes_archived_xml(tmp_path) -> None:
+    from app.repositories import XMLStoreRepository
+
+    added = []
+
+    class _Session:
+        def add(self, entry) -> None:
+            added.append(entry)
+
+        async def flush(self) -> None:
+            return None
+
+    repo = XMLStoreRepository(_Session(), ContentAddressedStore(LocalBlobBackend(tmp_path)))
+    entry = await repo.archive(1, "E310000000001", "ecf", XML)
+
+    assert added == [entry]
+    assert (entry.path, entry.size_bytes) == (shard_key(entry.sha256), len(XML))
+    assert await repo.read(entry) == XML
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.billing.services import AsyncBillingService, BillingService, charge_for, month_window
+from app.infra.settings import Settings
+from app.billing.usage_counters import tenant_plan_cache
+from app.models.billing import Plan, UsageRecord
+
+
+@pytest.mark.parametrize(
+    ("database_url", "async_url", "sync_url"),
+    [
+        ("postgresql+asyncpg://u:p@db/dgii", "postgresql+asyncpg://u:p@db/dgii", "postgresql+psycopg://u:p@db/dgii"),
+        ("postgresql://u:p@db/dgii", "postgresql+asyncpg://u:p@db/dgii", "postgresql+psycopg://u:p@db/dgii"),
+        ("sqlite+aiosqlite:///./local.db", "sqlite+aiosqlite:///./local.db", "sqlite:///./local.db"),
+        ("sqlite:///./local.db", "sqlite+aiosqlite:///./local.db", "sqlite:///./local.db"),
+    ],
+)
+def test_sync_and_async_urls(database_url: str, async_url: str, sync_url: str) -> None:
+    config = Settings(DATABASE_URL=database_url)
+    assert config.sqlalchemy_async_url == async_url
+    assert config.sqlalchemy_sync_url == sync_url
+
+
+def test_charge_rules_and_month_window() -> None:
+    plan = Plan(name="basico", documentos_incluidos=2, precio_por_documento=Decimal("1.2500"))
+    assert charge_for(plan, 1) == Decimal("0")
+    assert charge_for(plan, 2) == Decimal("1.2500")
+    assert month_window(datetime(2024, 12, 15, 10)) == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+
+
+def test_sync_billing_service_on_blocking_engine(sqlite_session: Session, make_tenant) -> None:
+    tenant_plan_cache.invalidate()
+    make_tenant(plan=Plan(name="basico", documentos_incluidos=1, precio_por_documento=Decimal("2.5")))
+
+    service = BillingService(sqlite_session)
+    first = service.record_usage_for_rnc(rnc="131415161", ecf_type="31", track_id="t-1")
+    second = service.record_usage_for_rnc(rnc="131415161", ecf_type="31", track_id="t-2")
+
+    assert (first.monto_cargado, second.monto_cargado) == (Decimal("0"), Decimal("2.5"))
+
+
+async def test_async_billing_path_commits_through_get_async_db(tmp_path, monkeypatch) -> None:
+    from sqlalchemy import func, select
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    import app.models  # noqa: F401 - registra todas las tablas
+    from app.db import AppSession
+    from app.models.base import Base
+    from app.models.invoice import Invoice
+    from app.models.tenant import Tenant
+    from app.repositories import InvoiceRepository, TenantRepository, XMLStoreRepository
+    from app.shared import database
+    from app.shared.storage import ContentAddressedStore, LocalBlobBackend
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False, sync_session_class=AppSession)
+    monkeypatch.setattr(database, "AsyncSessionFactory", factory)
+    async with factory() as session:
+        plan = Plan(name="basico", documentos_incluidos=1, precio_por_documento=Decimal("2.5"))
+        session.add(Tenant(name="Acme", rnc="131415161", dgii_base_ecf="https://ecf", dgii_base_fc="https://fc", plan=plan))
+        await session.commit()
+    tenant_plan_cache.invalidate()
+
+    requests = database.get_async_db()
+    db = await anext(requests)
+    tenant = await TenantRepository(db).get_by_rnc("131415161")
+    assert tenant is not None and tenant.plan.name == "basico"
+    service = AsyncBillingService(db)
+    first = await service.record_usage_for_rnc(rnc="131415161", ecf_type="31", track_id="t-1")
+    second = await service.record_usage_for_rnc(rnc="131415161", ecf_type="31", track_id="t-2")
+    await InvoiceRepository(db).add(
+        Invoice(
+            tenant_id=tenant.id, encf="E310000000001", tipo_ecf="31", xml_path="/tmp/a.xml", xml_hash="h",
+            track_id="t-2", total=Decimal("10"),
+        )
+    )
+    assert await InvoiceRepository(db).update_estado("t-2", "ACEPTADO") == 1
+    archive = XMLStoreRepository(db, ContentAddressedStore(LocalBlobBackend(tmp_path / "xml")))
+    entry = await archive.archive(tenant.id, "E310000000001", "ecf", b"<ECF/>")
+    with pytest.raises(StopAsyncIteration):
+        await anext(requests)
+
+    assert (first.monto_cargado, second.monto_cargado) == (Decimal("0"), Decimal("2.5"))
+    async with factory() as session:
+        assert await session.scalar(select(func.count(UsageRecord.id))) == 2
+        assert (await InvoiceRepository(session).get_by_track_id("t-2")).estado_dgii == "ACEPTADO"
+        stored = await XMLStoreRepository(session, archive.store).get(tenant.id, "E310000000001", "ecf")
+        assert stored.id == entry.id and await XMLStoreRepository(session, archive.store).read(stored) == b"<ECF/>"
+    await engine.dispose()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Dict, List
+
+import pytest
+
+try:  # pragma: no cover - optional dependency for offline testing
+    import fakeredis.aioredis as fakeredis_aioredis
+except ModuleNotFoundError:  # pragma: no cover
+    fakeredis_aioredis = None
+
+from app.dgii.directory import DirectoryCache
+from app.dgii.exceptions import DGIINotFoundError
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _fetcher(calls: List[str], unknown: set[str] = frozenset()):
+    async def fetch(rnc: str) -> Dict[str, str]:
+        calls.append(rnc)
+        await asyncio.sleep(0.01)
+        if rnc in unknown:
+            raise DGIINotFoundError(rnc)
+        return {"rnc": rnc, "nombre": f"Empresa {rnc} #{len(calls)}"}
+
+    return fetch
+
+
+async def test_fresh_stale_and_expired_lookups() -> None:
+    clock = _Clock()
+    cache = DirectoryCache(ttl_seconds=100, stale_seconds=50, clock=clock)
+    calls: List[str] = []
+
+    results = await asyncio.gather(*(cache.get("101-01010-1", _fetcher(calls)) for _ in range(5)))
+    assert calls == ["101010101"]
+    assert {r["nombre"] for r in results} == {"Empresa 101010101 #1"}
+
+    clock.now += 120  # stale: served immediately, refreshed once in background
+    stale = await cache.get("101010101", _fetcher(calls))
+    assert stale["nombre"].endswith("#1")
+    assert len(cache._background[asyncio.get_running_loop()]) == 1
+    await asyncio.sleep(0.05)
+    assert not cache._background[asyncio.get_running_loop()]
+    assert (await cache.get("101010101", _fetcher(calls)))["nombre"].endswith("#2")
+
+    clock.now += 200  # beyond stale window: fetched synchronously
+    assert (await cache.get("101010101", _fetcher(calls)))["nombre"].endswith("#3")
+    assert cache.stats.stale_hits == 1
+
+
+async def test_unknown_rncs_are_cached_negatively() -> None:
+    clock = _Clock()
+    cache = DirectoryCache(negative_ttl_seconds=60, clock=clock)
+    calls: List[str] = []
+    fetch = _fetcher(calls, unknown={"999999999"})
+
+    for _ in range(2):
+        with pytest.raises(DGIINotFoundError):
+            await cache.get("999999999", fetch)
+    assert calls == ["999999999"]
+
+    clock.now += 61
+    with pytest.raises(DGIINotFoundError):
+        await cache.get("999999999", fetch)
+    assert len(calls) == 2
+
+
+async def test_prefetch_shares_entries_through_redis() -> None:
+    if fakeredis_aioredis is None:
+        pytest.skip("fakeredis no disponible")
+    redis = fakeredis_aioredis.FakeRedis(decode_responses=True)
+    calls: List[str] = []
+    warm = DirectoryCache(redis=redis, prefetch_concurrency=2)
+
+    result = await warm.prefetch(["101010101", "131415161", "101010101", "999999999"], _fetcher(calls, {"999999999"}))
+    assert result["999999999"] is None and result["131415161"]["rnc"] == "131415161"
+    assert sorted(calls) == ["101010101", "131415161", "999999999"]
+
+    other_worker = DirectoryCache(redis=redis)
+    assert (await other_worker.get("131415161", _fetcher(calls)))["rnc"] == "131415161"
+    with pytest.raises(DGIINotFoundError):
+        await other_worker.get("999999999", _fetcher(calls))
+    assert len(calls) == 3
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from app.core.config import settings
+from app.dgii.models import ECFLineItem, ECFRequest, RFCERequest
+
+
+def _ecf(items: int) -> ECFRequest:
+    return ECFRequest(
+        encf="E310000000001",
+        tipo_ecf="31",
+        rnc_emisor="131415161",
+        rnc_comprador="101010101",
+        fecha_emision=datetime(2024, 5, 1, 10, 30),
+        monto_total=Decimal("1234.50"),
+        items=[
+            ECFLineItem(
+                descripcion=f"Servicio <{index}> & cargo ñ",
+                cantidad=Decimal(index + 1),
+                precio_unitario=Decimal("10.005"),
+            )
+            for index in range(items)
+        ],
+    )
+
+
+@pytest.mark.parametrize("items", [0, 1, 250])
+def test_streaming_output_is_byte_identical(items: int) -> None:
+    document = _ecf(items)
+    assert document.to_xml_bytes(streaming=True) == document.to_xml_bytes(streaming=False)
+
+
+def test_other_documents_stream_through_the_generic_path() -> None:
+    document = RFCERequest(
+        encf="E320000000001",
+        rnc_emisor="131415161",
+        periodo=datetime(2024, 5, 1).date(),
+        cantidad_facturas=3,
+        monto_total=Decimal("99.90"),
+    )
+    assert document.to_xml_bytes(streaming=True) == document.to_xml_bytes(streaming=False)
+
+
+def test_large_documents_select_streaming(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "ecf_streaming_min_items", 10)
+    small, large = _ecf(9), _ecf(10)
+    assert not small._use_streaming() and large._use_streaming()
+
+    target = tmp_path / "ecf.xml"
+    large.write_xml(target)
+    assert target.read_bytes() == large.to_xml_bytes(streaming=False) == large.to_xml_bytes()
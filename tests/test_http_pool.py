@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+import respx
+
+from app.core.config import settings
+from app.dgii.clients import DGIIClient
+from app.dgii.http_pool import HTTP_REQUESTS, HTTPClientPool, http_pool
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_clients_share_the_pooled_connection(configured_settings) -> None:
+    auth_base = str(settings.url_for("auth"))
+    respx.get(f"{auth_base}/semilla").respond(200, content=b"<Semilla>ABC</Semilla>")
+    host = httpx.URL(auth_base).host
+    before = HTTP_REQUESTS.labels(host=host, outcome="200")._value.get()
+
+    async with DGIIClient() as first, DGIIClient() as second:
+        assert first.http is second.http is http_pool.get()
+        await first.get_seed()
+        await second.get_seed()
+
+    assert not http_pool.get().is_closed
+    assert HTTP_REQUESTS.labels(host=host, outcome="200")._value.get() >= before + 2
+    assert http_pool.stats()["max_connections"] == settings.dgii_http_max_connections
+
+
+def test_pool_is_bound_to_each_event_loop() -> None:
+    pool = HTTPClientPool()
+
+    async def grab():
+        client = pool.get()
+        assert pool.get() is client
+        return client
+
+    first = asyncio.run(grab())
+    second = asyncio.run(grab())
+    assert first is not second
+
+
+async def test_close_releases_current_loop_client() -> None:
+    pool = HTTPClientPool()
+    client = pool.get()
+
+    await pool.aclose()
+
+    assert client.is_closed
+    assert pool.get() is not client
+    await pool.aclose()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+try:  # pragma: no cover - optional dependency for offline testing
+    import fakeredis.aioredis as fakeredis_aioredis
+except ModuleNotFoundError:  # pragma: no cover
+    fakeredis_aioredis = None
+
+from app.services.idempotency import (
+    IdempotencyInFlightError,
+    IdempotencyStore,
+    MemoryIdempotencyBackend,
+    RedisIdempotencyBackend,
+)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _redis_store(**kwargs) -> IdempotencyStore:
+    if fakeredis_aioredis is None:
+        pytest.skip("fakeredis no disponible")
+    return IdempotencyStore(RedisIdempotencyBackend(fakeredis_aioredis.FakeRedis(decode_responses=True)), **kwargs)
+
+
+async def test_memory_backend_evicts_by_ttl_and_size() -> None:
+    clock = _Clock()
+    store = IdempotencyStore(MemoryIdempotencyBackend(max_entries=2, clock=clock), ttl_seconds=10)
+
+    for key in ("a", "b", "c"):
+        await store.set(key, "h", 200, {"key": key})
+    assert await store.get("a", "h") is None
+    assert (await store.get("c", "h")).body == {"key": "c"}
+
+    clock.now = 11
+    assert await store.get("c", "h") is None
+    assert len(store.backend) == 1
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+async def test_concurrent_duplicates_wait_for_first_result(backend: str) -> None:
+    store = IdempotencyStore(poll_seconds=0.01) if backend == "memory" else _redis_store(poll_seconds=0.01)
+    calls = 0
+
+    async def handle() -> dict:
+        nonlocal calls
+        record, token = await store.begin("k", "h")
+        if record is not None:
+            return record.body
+        try:
+            calls += 1
+            await asyncio.sleep(0.05)
+            await store.set("k", "h", 200, {"trackId": "T-1"})
+            return {"trackId": "T-1"}
+        finally:
+            await store.release("k", token)
+
+    results = await asyncio.gather(*(handle() for _ in range(5)))
+
+    assert calls == 1
+    assert all(result == {"trackId": "T-1"} for result in results)
+
+
+async def test_conflicts_and_wait_timeout() -> None:
+    store = _redis_store(wait_seconds=0.05, poll_seconds=0.01)
+
+    record, token = await store.begin("k", "h1")
+    assert record is None and token
+    with pytest.raises(ValueError, match="mismatch"):
+        await store.begin("k", "h2")
+    with pytest.raises(IdempotencyInFlightError):
+        await store.begin("k", "h1")
+
+    await store.release("k", token)
+    assert (await store.begin("k", "h1"))[0] is None
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+async def test_expired_holder_does_not_release_successor_lock(backend: str) -> None:
+    kwargs = {"lock_ttl_seconds": 0.05, "wait_seconds": 0.02, "poll_seconds": 0.01}
+    store = IdempotencyStore(**kwargs) if backend == "memory" else _redis_store(**kwargs)
+
+    _, first = await store.begin("k", "h")
+    await asyncio.sleep(0.1)  # the first request outlives its lock
+    _, second = await store.begin("k", "h")
+    assert second is not None and second != first
+
+    await store.release("k", first)
+    with pytest.raises(IdempotencyInFlightError):
+        await store.begin("k", "h")
+
+    await store.release("k", second)
+    record, third = await store.begin("k", "h")
+    assert record is None and third is not None
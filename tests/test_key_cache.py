@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import os
+import shutil
+
+import pytest
+
+from app.dgii.signing import XMLSigningService, sign_ecf
+from app.dgii.exceptions import DGIISignError
+from app.security.keystore import KeyMaterialCache, KeyStoreError
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_bundle_is_decoded_once(certificate_bundle) -> None:
+    path, password, _key, cert = certificate_bundle
+    cache = KeyMaterialCache()
+
+    first = cache.load(path, password, tenant="101010101")
+    second = cache.load(path, password.decode(), tenant="101010101")
+
+    assert first is second
+    assert first.cert_pem.startswith(b"-----BEGIN CERTIFICATE-----")
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_rotated_bundle_is_reloaded(certificate_bundle, tmp_path) -> None:
+    path, password, _key, _cert = certificate_bundle
+    local = tmp_path / "tenant.p12"
+    shutil.copy(path, local)
+    cache = KeyMaterialCache()
+
+    first = cache.load(local, password)
+    stat = local.stat()
+    os.utime(local, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second = cache.load(local, password)
+
+    assert first is not second
+    assert first.fingerprint == second.fingerprint
+
+
+def test_ttl_and_invalidation(certificate_bundle) -> None:
+    path, password, _key, _cert = certificate_bundle
+    clock = _Clock()
+    cache = KeyMaterialCache(ttl_seconds=10, clock=clock)
+
+    first = cache.load(path, password, tenant="a")
+    clock.now = 11
+    second = cache.load(path, password, tenant="a")
+    assert first is not second
+
+    cache.load(path, password, tenant="b")
+    assert cache.invalidate(tenant="a") == 1
+    assert cache.stats()["entries"] == 1
+    assert cache.invalidate(path) == 1
+
+
+def test_lru_eviction(certificate_bundle) -> None:
+    path, password, _key, _cert = certificate_bundle
+    cache = KeyMaterialCache(max_entries=2)
+
+    for tenant in ("a", "b", "c"):
+        cache.load(path, password, tenant=tenant)
+
+    assert cache.stats()["entries"] == 2
+    assert cache.invalidate(tenant="a") == 0
+
+
+def test_invalid_password_raises(certificate_bundle) -> None:
+    path, _password, _key, _cert = certificate_bundle
+    with pytest.raises(KeyStoreError):
+        KeyMaterialCache().load(path, "wrong")
+    with pytest.raises(DGIISignError):
+        sign_ecf(b"<eCF/>", str(path), "wrong")
+
+
+def test_signing_service_uses_cached_pem(certificate_bundle) -> None:
+    path, password, _key, _cert = certificate_bundle
+    service = XMLSigningService(str(path), password.decode())
+
+    signed = service.sign_xml(b"<eCF><ENCF>E310000000001</ENCF></eCF>")
+
+    assert b"Signature" in signed
+    assert XMLSigningService(str(path), password.decode()).cert_pem is service.cert_pem
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.models.accounting import InvoiceLedgerEntry
+from app.models.invoice import Invoice
+from app.portal_admin.ledger import InvalidCursorError, decode_cursor, encode_cursor, ledger_count_cache
+from app.routers.admin import list_ledger_entries
+
+
+@pytest.fixture()
+def session(sqlite_session, make_tenant):
+    tenant = make_tenant()
+    invoice = Invoice(
+        tenant_id=tenant.id, encf="E310000000001", tipo_ecf="31", xml_path="/tmp/a.xml", xml_hash="h",
+        total=Decimal("10"), contabilizado=True,
+    )
+    sqlite_session.add(invoice)
+    sqlite_session.flush()
+    base = datetime(2024, 5, 1)
+    # Fechas repetidas para que el desempate por id importe.
+    for n in range(7):
+        sqlite_session.add(
+            InvoiceLedgerEntry(
+                tenant_id=tenant.id,
+                invoice_id=invoice.id if n % 2 else None,
+                referencia=f"AS-{n}",
+                cuenta="4100",
+                fecha=base + timedelta(days=n // 2),
+            )
+        )
+    sqlite_session.flush()
+    ledger_count_cache.invalidate(tenant.id)
+    return sqlite_session
+
+
+def _list(session: Session, **params):
+    defaults = {"page": 1, "size": 3, "contabilizado": None, "paginacion": "offset", "cursor": None, "conteo": "exacto"}
+    return list_ledger_entries(1, db=session, **{**defaults, **params})
+
+
+def test_cursor_pages_match_offset_pages(session: Session) -> None:
+    offset_refs = [item.referencia for page in (1, 2, 3) for item in _list(session, page=page).items]
+
+    cursor_refs: list[str] = []
+    response = _list(session, paginacion="cursor")
+    while True:
+        cursor_refs.extend(item.referencia for item in response.items)
+        if response.next_cursor is None:
+            break
+        response = _list(session, cursor=response.next_cursor)
+
+    assert cursor_refs == offset_refs
+    assert len(set(cursor_refs)) == 7
+
+
+def test_filter_and_count_modes(session: Session) -> None:
+    filtered = _list(session, contabilizado=True, size=10)
+    assert filtered.total == 3 and len(filtered.items) == 3
+
+    assert _list(session, conteo="ninguno").total is None
+    cached = _list(session, conteo="cache")
+    assert (cached.total, cached.total_exacto) == (7, False)
+    session.add(InvoiceLedgerEntry(tenant_id=1, referencia="AS-X", cuenta="4100", fecha=datetime(2024, 6, 1)))
+    session.flush()
+    assert _list(session, conteo="cache").total == 7
+    assert _list(session).total == 8
+
+
+def test_cursor_roundtrip_and_rejection(session: Session) -> None:
+    fecha = datetime(2024, 5, 1, 12, 30, 15, 123)
+    assert decode_cursor(encode_cursor(fecha, 42)) == (fecha, 42)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("no-es-un-cursor")
+    with pytest.raises(HTTPException) as excinfo:
+        _list(session, cursor="%%%")
+    assert excinfo.value.status_code == 400
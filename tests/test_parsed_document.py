@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import hashlib
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from app.security.xml import XMLSecurityError, validate_with_xsd
+from app.services.documents import ParsedDocument
+from app.services.recepcion_service import procesar_ecf
+
+ECF_SAMPLE = Path("tests/assets/sample_ecf_32.xml").read_bytes()
+
+
+def test_key_fields_are_extracted_once() -> None:
+    document = ParsedDocument.from_bytes(ECF_SAMPLE)
+
+    assert document.encf == "E3200000001"
+    assert document.rnc_emisor == "101234567"
+    assert document.rnc_comprador == "102345678"
+    assert document.monto_total == Decimal("1000.00")
+    assert document.tipo == "32"
+    assert document.sha256 == hashlib.sha256(ECF_SAMPLE).hexdigest()
+    assert document.log_fields()["size"] == len(ECF_SAMPLE)
+
+
+def test_precomputed_hash_is_reused_and_tree_is_shared() -> None:
+    document = ParsedDocument.from_bytes(ECF_SAMPLE, sha256="abc")
+
+    assert document.sha256 == "abc"
+    assert validate_with_xsd(document.root, "xsd/ecf.xsd") is document.root
+
+
+def test_hostile_documents_are_rejected() -> None:
+    with pytest.raises(XMLSecurityError):
+        ParsedDocument.from_bytes(b'<!DOCTYPE eCF [<!ENTITY x "boom">]><eCF>&x;</eCF>')
+
+
+async def test_procesar_ecf_accepts_parsed_document(monkeypatch: pytest.MonkeyPatch) -> None:
+    seen = []
+    monkeypatch.setattr(
+        "app.services.recepcion_service.verify_xml_signature",
+        lambda root: seen.append(root) or True,
+    )
+    document = ParsedDocument.from_bytes(ECF_SAMPLE)
+
+    result = await procesar_ecf(document)
+
+    assert result["estado"]
+    assert seen == [document.root]
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import httpx
+import pytest
+
+try:  # pragma: no cover - optional dependency for offline testing
+    import fakeredis.aioredis as fakeredis_aioredis
+except ModuleNotFoundError:  # pragma: no cover
+    fakeredis_aioredis = None
+
+from app.dgii.exceptions import CircuitOpenError, RateLimitExceededError
+from app.dgii.resilience import BreakerState, CircuitBreaker, RateGovernor, Resilience, endpoint_for
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _redis():
+    if fakeredis_aioredis is None:
+        pytest.skip("fakeredis no disponible")
+    return fakeredis_aioredis.FakeRedis(decode_responses=True)
+
+
+def _status_error(code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://ecf.dgii.gov.do/x")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(code, request=request))
+
+
+async def test_breaker_opens_on_error_rate_and_probes_half_open() -> None:
+    clock = _Clock()
+    breaker = CircuitBreaker("recepcion", failure_rate_threshold=0.5, min_calls=4, open_seconds=30, clock=clock)
+
+    for ok in (True, False, True, False):
+        await breaker.allow()
+        await (breaker.record_success() if ok else breaker.record_failure())
+    assert breaker.state is BreakerState.OPEN
+    with pytest.raises(CircuitOpenError):
+        await breaker.allow()
+
+    clock.now += 30
+    await breaker.allow()
+    assert breaker.state is BreakerState.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        await breaker.allow()  # only one probe at a time
+    await breaker.record_success()
+    assert breaker.state is BreakerState.CLOSED
+
+
+async def test_open_state_is_shared_between_workers() -> None:
+    redis = _redis()
+    clock = _Clock()
+    first = CircuitBreaker("auth", min_calls=1, redis=redis, clock=clock)
+    second = CircuitBreaker("auth", min_calls=1, redis=redis, clock=clock)
+
+    await first.allow()
+    await first.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        await second.allow()
+    clock.now += 31
+    await first.allow()
+    with pytest.raises(CircuitOpenError):
+        await second.allow()  # probe slot is taken cluster-wide
+    await first.record_success()
+    await second.allow()
+
+
+@pytest.mark.parametrize("shared", [False, True])
+async def test_governor_spaces_requests(shared: bool, monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = _Clock()
+    slept = []
+
+    async def fake_sleep(seconds: float) -> None:
+        slept.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr("app.dgii.resilience.asyncio.sleep", fake_sleep)
+    governor = RateGovernor({"recepcion": 2.0}, redis=_redis() if shared else None, clock=clock, max_wait_seconds=0.5)
+
+    for _ in range(2):
+        assert await governor.acquire("recepcion") == 0.0
+    assert await governor.acquire("recepcion") == pytest.approx(0.5)
+    assert slept == [pytest.approx(0.5)]
+    assert await governor.acquire("otro") == 0.0
+
+    strict = RateGovernor({"recepcion": 2.0}, clock=clock, max_wait_seconds=0.1)
+    for _ in range(2):
+        await strict.acquire("recepcion")
+    with pytest.raises(RateLimitExceededError):
+        await strict.acquire("recepcion")
+
+
+async def test_guard_ignores_client_errors() -> None:
+    guard = Resilience(
+        governor=RateGovernor({}),
+        breaker_factory=lambda name: CircuitBreaker(name, min_calls=2, failure_rate_threshold=0.5),
+    )
+    for _ in range(3):
+        with pytest.raises(httpx.HTTPStatusError):
+            async with guard.guard("recepcion"):
+                raise _status_error(400)
+    assert guard.states() == {"recepcion": "closed"}
+
+    for _ in range(3):
+        with pytest.raises(httpx.HTTPStatusError):
+            async with guard.guard("recepcion"):
+                raise _status_error(503)
+    assert guard.states() == {"recepcion": "open"}
+
+
+def test_endpoint_classification() -> None:
+    bases = {"recepcion": "https://ecf.dgii.gov.do/testecf/recepcion", "recepcion_fc": "https://fc.dgii.gov.do/testecf/recepcionfc"}
+    assert endpoint_for("https://ecf.dgii.gov.do/testecf/recepcion/api/ecf", bases) == "recepcion"
+    assert endpoint_for("https://fc.dgii.gov.do/testecf/recepcionfc/rfce", bases) == "recepcion_fc"
+    assert endpoint_for("https://servicios.dgii.gov.do/otro", bases) == "servicios.dgii.gov.do"
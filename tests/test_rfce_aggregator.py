@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List
+
+import httpx
+import pytest
+import respx
+from lxml import etree
+
+from app.billing.rfce_aggregator import ConsumoRow, RFCEAggregator, summarize
+
+
+async def _rows(count_per_day: int, days: int) -> AsyncIterator[ConsumoRow]:
+    start = datetime(2024, 5, 1, 8)
+    sequence = 0
+    for day in range(days):
+        for index in range(count_per_day):
+            sequence += 1
+            yield ConsumoRow(
+                encf=f"E32{sequence:010d}",
+                total=Decimal("100.10"),
+                fecha_emision=start + timedelta(days=day, seconds=index),
+            )
+
+
+class _Sender:
+    def __init__(self, fail_on: date | None = None) -> None:
+        self.sent: List[tuple[bytes, str | None]] = []
+        self.fail_on = fail_on
+
+    async def send_rfce(self, xml_bytes: bytes, *, idempotency_key: str | None = None) -> Dict[str, Any]:
+        if self.fail_on and self.fail_on.isoformat() in (idempotency_key or ""):
+            raise RuntimeError("DGII no disponible")
+        self.sent.append((xml_bytes, idempotency_key))
+        return {"codigo": "1", "estado": "Aceptado"}
+
+
+async def _sign(xml_bytes: bytes) -> bytes:
+    return xml_bytes.replace(b"</RFCE>", b"<Signature/></RFCE>")
+
+
+async def test_summaries_are_emitted_per_day() -> None:
+    summaries = [summary async for summary in summarize(_rows(1_000, 3))]
+
+    assert [s.periodo for s in summaries] == [date(2024, 5, 1), date(2024, 5, 2), date(2024, 5, 3)]
+    assert all(s.cantidad_facturas == 1_000 and s.monto_total == Decimal("100100.00") for s in summaries)
+    assert summaries[1].encf_desde == "E320000001001" and summaries[1].encf_hasta == "E320000002000"
+
+
+async def test_out_of_order_rows_are_rejected() -> None:
+    async def rows() -> AsyncIterator[ConsumoRow]:
+        yield ConsumoRow("E320000000002", Decimal("1"), datetime(2024, 5, 2))
+        yield ConsumoRow("E320000000001", Decimal("1"), datetime(2024, 5, 1))
+
+    with pytest.raises(ValueError, match="ordenadas"):
+        [summary async for summary in summarize(rows())]
+
+
+async def test_aggregator_signs_and_sends_each_summary() -> None:
+    sender = _Sender(fail_on=date(2024, 5, 2))
+    aggregator = RFCEAggregator(client=sender, sign=_sign)
+
+    report = await aggregator.run(7, "131415161", date(2024, 5, 1), date(2024, 5, 3), rows=_rows(10, 3))
+
+    assert report.facturas == 30 and report.errores == 1
+    assert [key for _xml, key in sender.sent] == ["rfce:7:2024-05-01", "rfce:7:2024-05-03"]
+    root = etree.fromstring(sender.sent[0][0])
+    assert root.findtext("CantidadFacturas") == "10"
+    assert root.findtext("MontoTotal") == "1001.00"
+    assert root.find("Signature") is not None
+
+
+async def test_run_streams_consumo_from_the_database(tmp_path) -> None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.models.base import Base
+    from app.models.billing import Plan
+    from app.models.invoice import Invoice
+    from app.models.tenant import Tenant
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'rfce.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(
+            Base.metadata.create_all, tables=[Plan.__table__, Tenant.__table__, Invoice.__table__]
+        )
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as session:
+        acme = Tenant(name="Acme", rnc="131415161", dgii_base_ecf="https://ecf", dgii_base_fc="https://fc")
+        otro = Tenant(name="Otro", rnc="101010101", dgii_base_ecf="https://ecf", dgii_base_fc="https://fc")
+        session.add_all([acme, otro])
+        await session.flush()
+        rows = [
+            (acme.id, "32", "100.00", datetime(2024, 5, 1, 9)),
+            (acme.id, "32", "50.50", datetime(2024, 5, 1, 18)),
+            (acme.id, "32", "25.00", datetime(2024, 5, 2, 8)),
+            (acme.id, "31", "10.00", datetime(2024, 5, 1, 10)),  # no es de consumo
+            (acme.id, "32", "300000.00", datetime(2024, 5, 1, 11)),  # sobre el límite
+            (acme.id, "32", "10.00", datetime(2024, 5, 4, 8)),  # fuera del rango
+            (otro.id, "32", "10.00", datetime(2024, 5, 1, 12)),  # otro tenant
+        ]
+        for n, (tenant_id, tipo, total, fecha) in enumerate(rows):
+            session.add(
+                Invoice(
+                    tenant_id=tenant_id,
+                    encf=f"E{tipo}{n:010d}",
+                    tipo_ecf=tipo,
+                    xml_path=f"/tmp/{n}.xml",
+                    xml_hash=f"h{n}",
+                    estado_dgii="pendiente",
+                    total=Decimal(total),
+                    fecha_emision=fecha,
+                )
+            )
+        await session.commit()
+        tenant_id = acme.id
+
+    sender = _Sender()
+    report = await RFCEAggregator(client=sender, sign=_sign, session_factory=session_factory).run(
+        tenant_id, "131415161", date(2024, 5, 1), date(2024, 5, 3)
+    )
+    await engine.dispose()
+
+    assert [(r.resumen.periodo, r.resumen.cantidad_facturas, r.resumen.monto_total) for r in report.resultados] == [
+        (date(2024, 5, 1), 2, Decimal("150.50")),
+        (date(2024, 5, 2), 1, Decimal("25.00")),
+    ]
+    assert [key for _xml, key in sender.sent] == [f"rfce:{tenant_id}:2024-05-01", f"rfce:{tenant_id}:2024-05-02"]
+
+
+@respx.mock
+async def test_period_entry_point_uses_the_emitter_certificate_and_token(tenant_signing, monkeypatch) -> None:
+    from cryptography.hazmat.primitives.serialization import Encoding
+
+    from app.billing.rfce_aggregator import enviar_rfce_periodo
+    from app.core.config import settings
+    from app.dgii import client as client_module
+    from app.dgii.signing import verify_xml_signature
+    from app.dgii.tokens import TokenManager
+
+    rnc = tenant_signing["tenant"]
+    certificate = tenant_signing["certificate"].public_bytes(Encoding.PEM)
+    monkeypatch.setattr(client_module, "token_manager", TokenManager())
+    auth_base = str(settings.url_for("auth"))
+    respx.get(f"{auth_base}/semilla").mock(
+        return_value=httpx.Response(200, content=b"<SemillaModel><valor>ABC123</valor></SemillaModel>")
+    )
+
+    def mint(request: httpx.Request) -> httpx.Response:
+        token = "tok-emisor" if verify_xml_signature(request.content, certificate) else "tok-default"
+        return httpx.Response(200, json={"token": token, "expires_at": "2099-01-01T00:00:00Z"})
+
+    respx.post(f"{auth_base}/token").mock(side_effect=mint)
+    envio = respx.post(f"{settings.url_for('recepcion_fc')}/rfce").mock(
+        return_value=httpx.Response(200, json={"codigo": "1", "estado": "Aceptado"})
+    )
+
+    async def rows() -> AsyncIterator[ConsumoRow]:
+        async for row in _rows(2, 1):
+            yield row
+
+    monkeypatch.setattr(RFCEAggregator, "run", lambda self, *args: self._process(7, rnc, rows()))
+
+    report = await enviar_rfce_periodo(7, rnc, date(2024, 5, 1), date(2024, 5, 1))
+
+    assert [r.error for r in report.resultados] == [None]
+    request = envio.calls.last.request
+    assert request.headers["Authorization"] == "Bearer tok-emisor"
+    assert verify_xml_signature(request.content, certificate)
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import zipfile
+from pathlib import Path
+
+import pytest
+from lxml import etree
+
+from app.billing.rnc_registry import RNCRegistry
+from app.billing.validators import validate_rnc_comprador
+
+DUMP = (
+    "RNC|RAZON SOCIAL|NOMBRE COMERCIAL|ACTIVIDAD|||||FECHA|ESTADO|REGIMEN\n"
+    "101010101|COMERCIAL  ACME SRL|ACME|VENTA AL POR MENOR|||||01/02/2010|ACTIVO|NORMAL\n"
+    "131415161|SERVICIOS ÑANDÚ SA||CONSULTORIA|||||03/04/2015|SUSPENDIDO|NORMAL\n"
+    "00112233445|JUAN PEREZ|||||||05/06/2018|ACTIVO|RST\n"
+    "basura sin formato\n"
+)
+
+
+def _write(path: Path, text: str) -> Path:
+    path.write_bytes(text.encode("latin-1"))
+    return path
+
+
+def test_import_and_lookup(tmp_path: Path) -> None:
+    registry = RNCRegistry(tmp_path / "rnc.sqlite3")
+    stats = registry.import_file(_write(tmp_path / "DGII_RNC.TXT", DUMP))
+
+    assert (stats.leidos, stats.descartados, stats.insertados) == (5, 2, 3)
+    record = registry.lookup("101-01010-1")
+    assert record is not None and record.razon_social == "COMERCIAL ACME SRL" and record.activo
+    assert registry.razon_social("131415161") == "SERVICIOS ÑANDÚ SA"
+    assert not registry.lookup("131415161").activo
+    assert registry.lookup("999999999") is None
+    assert set(registry.lookup_many(["101010101", "00112233445", "999999999"])) == {"101010101", "00112233445"}
+
+
+def test_reimport_is_incremental(tmp_path: Path) -> None:
+    registry = RNCRegistry(tmp_path / "rnc.sqlite3")
+    source = _write(tmp_path / "DGII_RNC.TXT", DUMP)
+    registry.import_file(source)
+
+    assert registry.import_file(source).sin_cambios
+
+    changed = DUMP.replace("SUSPENDIDO", "ACTIVO").replace("00112233445|JUAN PEREZ|||||||05/06/2018|ACTIVO|RST\n", "")
+    changed += "172839405|NUEVA EMPRESA SRL|||||||07/08/2024|ACTIVO|NORMAL\n"
+    archive = tmp_path / "DGII_RNC.zip"
+    with zipfile.ZipFile(archive, "w") as handle:
+        handle.writestr("TMP/DGII_RNC.TXT", changed.encode("latin-1"))
+    stats = registry.import_file(archive)
+
+    assert (stats.insertados, stats.actualizados, stats.eliminados) == (1, 1, 1)
+    assert registry.lookup("131415161").activo
+    assert registry.lookup("00112233445") is None
+    assert registry.count() == 3
+
+    delta = _write(tmp_path / "delta.txt", "101010101|ACME DOMINICANA SRL|||||||||ACTIVO|NORMAL\n")
+    stats = registry.import_file(delta, partial=True)
+    assert (stats.actualizados, stats.eliminados) == (1, 0)
+    assert registry.count() == 3
+
+
+def test_validate_rnc_comprador_uses_registry(tmp_path: Path) -> None:
+    registry = RNCRegistry(tmp_path / "rnc.sqlite3")
+    validate_rnc_comprador("999999999", registry=registry)  # sin padrón importado solo se valida el formato
+
+    registry.import_file(_write(tmp_path / "DGII_RNC.TXT", DUMP))
+    assert validate_rnc_comprador("101010101", registry=registry).razon_social == "COMERCIAL ACME SRL"
+    with pytest.raises(ValueError, match="no registrado"):
+        validate_rnc_comprador("999999999", registry=registry)
+    with pytest.raises(ValueError, match="RNC inválido"):
+        validate_rnc_comprador("12ab", registry=registry)
+
+
+def test_builders_fill_razon_social_from_registry(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.billing import validators
+    from app.billing.acecf_builder import build_acecf
+    from app.billing.arecf_builder import build_arecf
+    from app.billing.ecf_builder import build_ecf
+
+    registry = RNCRegistry(tmp_path / "rnc.sqlite3")
+    registry.import_file(_write(tmp_path / "DGII_RNC.TXT", DUMP))
+    monkeypatch.setattr(validators, "rnc_registry", registry)
+    documentos = [
+        build_ecf(encf="E310000000001", rnc_emisor="131415161", rnc_comprador="101010101", total=10),
+        build_acecf(encf="E310000000001", rnc_emisor="131415161", rnc_comprador="101010101", estado=1, detalle_motivo=None),
+        build_arecf(encf="E310000000001", rnc_emisor="131415161", rnc_comprador="101010101", estado=0, motivo_codigo=None),
+    ]
+
+    for xml in documentos:
+        assert etree.fromstring(xml.encode("utf-8")).findtext(".//RazonSocialComprador") == "COMERCIAL ACME SRL"
+    explicito = build_ecf(
+        encf="E310000000001", rnc_emisor="131415161", rnc_comprador="101010101", total=10, razon_social_comprador="Acme"
+    )
+    assert etree.fromstring(explicito.encode("utf-8")).findtext(".//RazonSocialComprador") == "Acme"
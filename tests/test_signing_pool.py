@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.dgii.exceptions import DGIISignError
+from app.dgii.signing_pool import SigningBackpressureError, SigningCredentials, SigningPool
+
+SEED = b"<SemillaModel><valor>ABC123</valor></SemillaModel>"
+
+
+@pytest.fixture
+def credentials(certificate_bundle) -> SigningCredentials:
+    path, password, _key, _cert = certificate_bundle
+    return SigningCredentials(p12_path=str(path), password=password.decode())
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+async def test_sign_async_in_pool(credentials, mode) -> None:
+    pool = SigningPool(mode=mode, max_workers=1, default_credentials=credentials)
+    try:
+        signed = await pool.sign_async(SEED, "131415161")
+    finally:
+        pool.stop()
+
+    assert b"Signature" in signed
+    assert pool.stats()["processed"] == 1
+    assert pool.stats()["pending"] == 0
+
+
+async def test_backpressure_rejects_when_queue_full(credentials) -> None:
+    pool = SigningPool(mode="thread", max_workers=1, max_pending=2, default_credentials=credentials)
+    try:
+        results = await asyncio.gather(
+            *(pool.sign_async(SEED) for _ in range(4)),
+            return_exceptions=True,
+        )
+    finally:
+        pool.stop()
+
+    rejected = [item for item in results if isinstance(item, SigningBackpressureError)]
+    assert len(rejected) == 2
+    assert pool.stats()["rejected"] == 2
+
+
+async def test_tenant_credentials_override_default(credentials, tmp_path) -> None:
+    pool = SigningPool(
+        mode="inline",
+        default_credentials=SigningCredentials(p12_path=str(tmp_path / "missing.p12"), password="x"),
+    )
+    pool.register_tenant("101010101", credentials.p12_path, credentials.password)
+
+    signed = await pool.sign_async(SEED, "101010101")
+
+    assert b"Signature" in signed
+    with pytest.raises(DGIISignError):
+        await pool.sign_async(SEED, "999999999")
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from typing import Dict, List
+
+import httpx
+import pytest
+import respx
+
+try:  # pragma: no cover - optional dependency for offline testing
+    import fakeredis.aioredis as fakeredis_aioredis
+except ModuleNotFoundError:  # pragma: no cover
+    fakeredis_aioredis = None
+
+from app.core.config import settings
+from app.dgii.jobs import DGIIJobDispatcher, MemoryJobStore, RedisJobStore, StatusJob
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _store(kind: str):
+    if kind == "memory":
+        return MemoryJobStore()
+    if fakeredis_aioredis is None:
+        pytest.skip("fakeredis no disponible")
+    return RedisJobStore(fakeredis_aioredis.FakeRedis(decode_responses=True))
+
+
+def _dispatcher(store, clock, responses: List[Dict[str, str]], written: Dict[str, str]) -> DGIIJobDispatcher:
+    async def fetch(job: StatusJob) -> Dict[str, str]:
+        response = responses.pop(0)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response
+
+    async def write(track_id: str, estado: str) -> None:
+        written[track_id] = estado
+
+    config = settings.model_copy(update={"jobs_backoff_base_seconds": 5.0, "jobs_max_attempts": 5})
+    return DGIIJobDispatcher(config, store=store, fetch_status=fetch, write_estado=write, clock=clock)
+
+
+@pytest.mark.parametrize("kind", ["memory", "redis"])
+async def test_job_polls_with_backoff_until_terminal(kind: str) -> None:
+    clock = _Clock()
+    written: Dict[str, str] = {}
+    responses = [{"estado": "En Proceso"}, {"error": "timeout"}, {"estado": "Aceptado"}]
+    dispatcher = _dispatcher(_store(kind), clock, responses, written)
+
+    assert await dispatcher.enqueue_status_check("TRACK-1", "131415161") is True
+    assert await dispatcher.enqueue_status_check("TRACK-1", "131415161") is False
+
+    assert await dispatcher.run_once() is True
+    assert await dispatcher.run_once() is False  # rescheduled 5s later
+    clock.now += 5
+    assert await dispatcher.run_once() is True
+    clock.now += 9
+    assert await dispatcher.run_once() is False  # second backoff is 10s
+    clock.now += 1
+    assert await dispatcher.run_once() is True
+
+    assert written == {"TRACK-1": "ACEPTADO"}
+    assert await dispatcher.store.counts() == {"scheduled": 0, "inflight": 0}
+
+
+@pytest.mark.parametrize("kind", ["memory", "redis"])
+async def test_expired_claims_are_requeued(kind: str) -> None:
+    store = _store(kind)
+    await store.schedule(StatusJob(track_id="TRACK-2", tenant="131415161"), 0)
+
+    claimed = await store.claim(10, visibility_timeout=30)
+    assert claimed is not None and claimed.track_id == "TRACK-2"
+    assert await store.claim(10, visibility_timeout=30) is None
+    assert await store.requeue_expired(20) == 0
+    assert await store.requeue_expired(41) == 1
+    assert (await store.claim(41, visibility_timeout=30)).track_id == "TRACK-2"
+
+
+def test_backoff_is_capped() -> None:
+    config = settings.model_copy(update={"jobs_backoff_base_seconds": 5.0, "jobs_backoff_max_seconds": 60.0})
+    dispatcher = DGIIJobDispatcher(config, store=MemoryJobStore())
+    assert [dispatcher.backoff(n) for n in (1, 2, 3, 4, 5)] == [5.0, 10.0, 20.0, 40.0, 60.0]
+
+
+@pytest.mark.parametrize("kind", ["memory", "redis"])
+async def test_jobs_store_tenant_not_bearer_token(kind: str) -> None:
+    store = _store(kind)
+    clock = _Clock()
+    dispatcher = DGIIJobDispatcher(settings.model_copy(update={"jobs_enabled": True}), store=store, clock=clock)
+    await dispatcher.enqueue_status_check("TRACK-3", "131415161")
+
+    claimed = await store.claim(clock.now, visibility_timeout=30)
+    assert claimed is not None and claimed.tenant == "131415161"
+    assert "token" not in claimed.to_json()
+    legacy = StatusJob.from_json('{"track_id": "T", "token": "secreto", "attempts": 2, "last_estado": null}')
+    assert legacy == StatusJob(track_id="T", attempts=2)
+
+
+@respx.mock
+async def test_poll_uses_token_minted_with_job_tenant_certificate(tenant_signing, monkeypatch) -> None:
+    from cryptography.hazmat.primitives.serialization import Encoding
+
+    from app.dgii import client as client_module
+    from app.dgii.jobs import _fetch_status
+    from app.dgii.signing import verify_xml_signature
+    from app.dgii.tokens import TokenManager
+
+    monkeypatch.setattr(client_module, "token_manager", TokenManager())
+    certificate = tenant_signing["certificate"].public_bytes(Encoding.PEM)
+    auth_base = str(settings.url_for("auth"))
+    respx.get(f"{auth_base}/semilla").mock(
+        return_value=httpx.Response(200, content=b"<SemillaModel><valor>ABC123</valor></SemillaModel>")
+    )
+
+    def mint(request: httpx.Request) -> httpx.Response:
+        token = "tok-emisor" if verify_xml_signature(request.content, certificate) else "tok-default"
+        return httpx.Response(200, json={"token": token, "expires_at": "2099-01-01T00:00:00Z"})
+
+    respx.post(f"{auth_base}/token").mock(side_effect=mint)
+    status = respx.get(f"{settings.url_for('recepcion')}/estatus/TRACK-4").mock(
+        return_value=httpx.Response(200, json={"estado": "Aceptado"})
+    )
+
+    result = await _fetch_status(StatusJob(track_id="TRACK-4", tenant=tenant_signing["tenant"]))
+
+    assert result["estado"] == "Aceptado"
+    assert status.calls.last.request.headers["Authorization"] == "Bearer tok-emisor"
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+import respx
+
+from app.core.config import settings
+from app.dgii.client import DGIIClient
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_status_many_dedupes_and_reports_failures(configured_settings) -> None:
+    recepcion_base = str(settings.url_for("recepcion"))
+    active = 0
+    peak = 0
+
+    async def respond(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        track_id = request.url.path.rsplit("/", 1)[-1]
+        if track_id == "T-ROTO":
+            return httpx.Response(404)
+        return httpx.Response(200, json={"trackId": track_id, "estado": "Aceptado"})
+
+    route = respx.get(url__startswith=f"{recepcion_base}/estatus/").mock(side_effect=respond)
+    track_ids = [f"T-{n}" for n in range(12)] + ["T-1", "T-ROTO"]
+
+    client = DGIIClient(config=settings)
+    results = [result async for result in client.get_status_many(track_ids, token="tok", concurrency=3)]
+
+    assert sorted(result.track_id for result in results) == sorted(set(track_ids))
+    assert route.call_count == 13
+    assert peak <= 3
+    failed = [result for result in results if not result.ok]
+    assert [result.track_id for result in failed] == ["T-ROTO"]
+    assert route.calls.last.request.headers["Authorization"] == "Bearer tok"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_concurrent_lookups_share_inflight_calls(configured_settings) -> None:
+    recepcion_base = str(settings.url_for("recepcion"))
+
+    async def respond(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.02)
+        return httpx.Response(200, json={"estado": "En Proceso"})
+
+    route = respx.get(url__startswith=f"{recepcion_base}/estatus/").mock(side_effect=respond)
+
+    async def collect() -> list:
+        client = DGIIClient(config=settings)
+        return [r async for r in client.get_status_many(["T-A", "T-B"], token="tok")]
+
+    first, second = await asyncio.gather(collect(), collect())
+
+    assert len(first) == len(second) == 2
+    assert route.call_count == 2
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+import respx
+
+try:  # pragma: no cover - optional dependency for offline testing
+    import fakeredis.aioredis as fakeredis_aioredis
+except ModuleNotFoundError:  # pragma: no cover
+    fakeredis_aioredis = None
+
+from app.dgii.tokens import CachedToken, TokenManager
+
+
+def _fetcher(calls: list, *, lifetime: float = 600.0, delay: float = 0.02):
+    async def fetch() -> CachedToken:
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return CachedToken(
+            access_token=f"token-{len(calls)}",
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=lifetime),
+        )
+
+    return fetch
+
+
+async def test_concurrent_callers_share_one_exchange() -> None:
+    manager = TokenManager()
+    calls: list = []
+    key = TokenManager.key_for("131415161", "PRECERT")
+
+    tokens = await asyncio.gather(*(manager.get_token(key, _fetcher(calls)) for _ in range(10)))
+
+    assert set(tokens) == {"token-1"}
+    assert len(calls) == 1
+    assert await manager.get_token(TokenManager.key_for("otro", "PRECERT"), _fetcher(calls)) == "token-2"
+
+
+async def test_token_in_refresh_margin_is_served_while_renewed() -> None:
+    manager = TokenManager(refresh_margin_seconds=120)
+    calls: list = []
+    key = "default:precert"
+
+    assert await manager.get_token(key, _fetcher(calls, lifetime=90)) == "token-1"
+    assert await manager.get_token(key, _fetcher(calls)) == "token-1"
+    await asyncio.sleep(0.05)
+
+    assert await manager.get_token(key, _fetcher(calls)) == "token-2"
+    assert len(calls) == 2
+
+
+async def test_workers_share_tokens_through_redis() -> None:
+    if fakeredis_aioredis is None:
+        pytest.skip("fakeredis no disponible")
+    redis = fakeredis_aioredis.FakeRedis(decode_responses=True)
+    workers = [TokenManager(redis=redis, poll_seconds=0.01) for _ in range(3)]
+    calls: list = []
+
+    tokens = await asyncio.gather(*(worker.get_token("t:precert", _fetcher(calls)) for worker in workers))
+
+    assert set(tokens) == {"token-1"}
+    assert len(calls) == 1
+
+    await workers[0].invalidate("t:precert", "token-1")
+    workers[1].clear()
+    assert await workers[1].get_token("t:precert", _fetcher(calls)) == "token-2"
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_tenant_bearer_signs_seed_with_tenant_certificate(tenant_signing) -> None:
+    from cryptography.hazmat.primitives.serialization import Encoding
+
+    from app.core.config import settings
+    from app.dgii.client import DGIIClient
+    from app.dgii.signing import verify_xml_signature
+
+    auth_base = str(settings.url_for("auth"))
+    respx.get(f"{auth_base}/semilla").mock(
+        return_value=httpx.Response(200, content=b"<SemillaModel><valor>ABC123</valor></SemillaModel>")
+    )
+    route = respx.post(f"{auth_base}/token").mock(
+        return_value=httpx.Response(200, json={"token": "tok-emisor", "expires_at": "2099-01-01T00:00:00Z"})
+    )
+
+    client = DGIIClient(config=settings, tokens=TokenManager(), tenant=tenant_signing["tenant"])
+    assert await client.bearer() == "tok-emisor"
+
+    signed_seed = route.calls.last.request.content
+    assert verify_xml_signature(signed_seed, tenant_signing["certificate"].public_bytes(Encoding.PEM))
+    assert not verify_xml_signature(signed_seed, tenant_signing["default_certificate"].public_bytes(Encoding.PEM))
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import random
+from decimal import Decimal
+
+import pytest
+
+from app.billing import totals
+from app.billing.totals import (
+    TotalesDivergentesError,
+    calcular_lote,
+    calcular_totales,
+    calcular_totales_decimal,
+    formatear_centavos,
+)
+from app.dgii.models.base import decimal_to_str
+
+
+def test_document_totals_with_itbis_discounts_and_exempt_lines() -> None:
+    items = [
+        {"cantidad": Decimal("3"), "precio_unitario": Decimal("33.335")},  # 100.005 -> 100.00
+        {"cantidad": Decimal("1"), "precio_unitario": Decimal("0.125"), "tasa_itbis": Decimal("16")},  # 0.12
+        {"cantidad": Decimal("2"), "precio_unitario": Decimal("50"), "descuento": Decimal("10"), "tasa_itbis": 0},
+    ]
+    result = calcular_totales(items, verificar=True)
+
+    assert [linea.bruto for linea in result.lineas] == [10000, 12, 10000]
+    assert [linea.itbis for linea in result.lineas] == [1800, 2, 0]
+    assert result.as_decimals() == {
+        "monto_gravado": Decimal("100.12"),
+        "monto_exento": Decimal("90.00"),
+        "total_descuento": Decimal("10.00"),
+        "total_itbis": Decimal("18.02"),
+        "monto_total": Decimal("208.14"),
+    }
+    with pytest.raises(ValueError, match="descuento"):
+        calcular_totales([{"cantidad": 1, "precio_unitario": Decimal("5"), "descuento": Decimal("6")}])
+
+
+def test_rounding_parity_with_decimal_path() -> None:
+    rng = random.Random(20240501)
+    documentos = [
+        [
+            {
+                "cantidad": Decimal(rng.randint(1, 10_000)).scaleb(-rng.randint(0, 3)),
+                "precio_unitario": Decimal(rng.randint(1, 10**8)).scaleb(-rng.randint(0, 4)),
+                "tasa_itbis": rng.choice([None, Decimal("16"), Decimal("0"), Decimal("18.5")]),
+            }
+            for _ in range(rng.randint(1, 40))
+        ]
+        for _ in range(200)
+    ]
+    for items, result in zip(documentos, calcular_lote(documentos, verificar=True)):
+        assert result == calcular_totales_decimal(items)
+        for item, linea in zip(items, result.lineas):
+            assert formatear_centavos(linea.bruto) == decimal_to_str(item["cantidad"] * item["precio_unitario"])
+
+
+def test_verification_mode_detects_divergence(monkeypatch: pytest.MonkeyPatch) -> None:
+    items = [{"cantidad": Decimal("1"), "precio_unitario": Decimal("10.00")}]
+    reference = calcular_totales_decimal(items)
+    reference.total_itbis += 1
+    monkeypatch.setattr(totals, "calcular_totales_decimal", lambda *_args, **_kwargs: reference)
+
+    calcular_totales(items, verificar=False)
+    with pytest.raises(TotalesDivergentesError):
+        calcular_totales(items, verificar=True)
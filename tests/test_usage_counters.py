@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.billing.services import BillingError, BillingService
+from app.billing.usage_counters import (
+    TenantPlan,
+    TenantPlanCache,
+    increment_stmt,
+    reconcile_usage_counters,
+    tenant_plan_cache,
+)
+from app.models.billing import Plan, UsageCounter, UsageRecord
+from app.models.tenant import Tenant
+
+
+@pytest.fixture()
+def session(sqlite_session, make_tenant):
+    tenant_plan_cache.invalidate()
+    make_tenant(plan=Plan(name="basico", documentos_incluidos=2, precio_por_documento=Decimal("1.5")))
+    yield sqlite_session
+    tenant_plan_cache.invalidate()
+
+
+def _counter(session: Session) -> UsageCounter:
+    return session.scalars(select(UsageCounter)).one()
+
+
+def test_counter_tracks_each_usage_record(session: Session) -> None:
+    service = BillingService(session)
+    montos = [service.record_usage_for_rnc(rnc="131415161", ecf_type="31").monto_cargado for _ in range(4)]
+
+    counter = _counter(session)
+    session.refresh(counter)
+    assert montos == [Decimal("0"), Decimal("0"), Decimal("1.5"), Decimal("1.5")]
+    assert counter.documentos == 4
+    assert counter.monto_cargado == Decimal("3.0")
+    assert counter.periodo == datetime.utcnow().date().replace(day=1)
+    assert reconcile_usage_counters(session) == []
+
+
+def test_tenant_lookup_is_cached_by_rnc(session: Session) -> None:
+    service = BillingService(session)
+    service.record_usage_for_rnc(rnc="131415161", ecf_type="31")
+    cached = tenant_plan_cache.get(rnc="131415161")
+
+    assert cached is not None and cached.precio_por_documento == Decimal("1.5")
+    assert tenant_plan_cache.get(cached.tenant_id) is cached
+
+    tenant_plan_cache.invalidate(cached.tenant_id)
+    assert tenant_plan_cache.get(rnc="131415161") is None
+
+
+def test_plan_change_invalidates_cache_after_commit(session: Session) -> None:
+    service = BillingService(session)
+    service.record_usage_for_rnc(rnc="131415161", ecf_type="31")
+    cached = tenant_plan_cache.get(rnc="131415161")
+
+    tenant_plan_cache.invalidate_on_commit(session, cached.tenant_id)
+    assert tenant_plan_cache.get(rnc="131415161") is cached  # aún sin confirmar
+    session.commit()
+    assert tenant_plan_cache.get(rnc="131415161") is None
+
+
+def test_tenant_without_plan_is_rejected(session: Session, make_tenant) -> None:
+    make_tenant("Sin plan", "101010101")
+
+    with pytest.raises(BillingError):
+        BillingService(session).record_usage_for_rnc(rnc="101010101", ecf_type="31")
+
+
+def test_cache_expires_and_can_be_disabled() -> None:
+    plan = TenantPlan(tenant_id=1, rnc="131415161", plan_id=1, documentos_incluidos=0, precio_por_documento=Decimal("1"))
+
+    expired = TenantPlanCache(ttl_seconds=1e-9)
+    expired.put(plan)
+    assert expired.get(1) is None
+
+    disabled = TenantPlanCache(ttl_seconds=0)
+    disabled.put(plan)
+    assert disabled.get(rnc="131415161") is None
+
+
+def test_reconciliation_reports_and_fixes_drift(session: Session) -> None:
+    service = BillingService(session)
+    for _ in range(3):
+        service.record_usage_for_rnc(rnc="131415161", ecf_type="31")
+    tenant_id = _counter(session).tenant_id
+    # Registro insertado sin pasar por el servicio (p. ej. una carga manual).
+    session.add(UsageRecord(tenant_id=tenant_id, ecf_type="31", monto_cargado=Decimal("1.5"), fecha=datetime.utcnow()))
+    session.flush()
+
+    drifts = reconcile_usage_counters(session, fix=False)
+    assert [(d.documentos_contador, d.documentos_reales) for d in drifts] == [(3, 4)]
+    assert (drifts[0].monto_contador, drifts[0].monto_real) == (Decimal("1.5"), Decimal("3.0"))
+
+    assert len(reconcile_usage_counters(session)) == 1
+    assert reconcile_usage_counters(session) == []
+    assert _counter(session).documentos == 4
+
+
+def test_reconciliation_seeds_missing_counters(session: Session) -> None:
+    tenant_id = session.scalar(select(Tenant.id))
+    session.add(UsageRecord(tenant_id=tenant_id, ecf_type="31", fecha=datetime(2024, 5, 10)))
+    session.flush()
+
+    drifts = reconcile_usage_counters(session, date(2024, 5, 1))
+    assert [(d.tenant_id, d.documentos_contador, d.documentos_reales) for d in drifts] == [(tenant_id, 0, 1)]
+    assert _counter(session).periodo == date(2024, 5, 1)
+    assert reconcile_usage_counters(session, date(2024, 6, 1)) == []
+
+
+def test_unsupported_dialect_is_rejected() -> None:
+    with pytest.raises(RuntimeError, match="no soportados en oracle"):
+        increment_stmt("oracle", 1, date(2024, 5, 1))
@@ -1,5 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
-from app.dgii.validation import XSDValidator, get_validator_for
+from app.dgii.validation import (
+    SchemaRegistry,
+    XSDValidationError,
+    XSDValidator,
+    get_validator_for,
+    schema_registry,
+    validate_xml,
+)
 
 def test_xsd_validator_valid_xml():
     """
@@ -55,3 +64,36 @@ def test_xsd_validator_file_not_found():
     """
     with pytest.raises(FileNotFoundError):
         XSDValidator("non_existent_schema.xsd")
+
+def test_schema_registry_compiles_once():
+    """
+    Tests that the registry memoizes compiled schemas and reports timings.
+    """
+    first = get_validator_for("ANECF")
+    second = XSDValidator("ANECF v.1.0.xsd")
+
+    assert first.schema is second.schema
+    assert schema_registry.get("anecf v.1.0.xsd") is first.compiled
+    assert "ANECF" in first.compiled.root_elements
+    assert schema_registry.timings()["ANECF v.1.0.xsd"] > 0
+
+def test_schema_registry_warm_up_is_thread_safe():
+    """
+    Tests that concurrent warm-ups compile each schema exactly once.
+    """
+    registry = SchemaRegistry()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: registry.get("ARECF v1.0.xsd"), range(8)))
+
+    assert all(result is results[0] for result in results)
+    timings = registry.warm_up()
+    assert "e-CF 31 v.1.0.xsd" in timings
+    assert "ARECF v1.0.xsd" in timings
+
+def test_validate_xml_raises_with_schema_message():
+    """
+    Tests that validate_xml reports the first schema violation.
+    """
+    with pytest.raises(XSDValidationError) as excinfo:
+        validate_xml(b"<ARECF><Otro/></ARECF>", "ARECF v1.0.xsd")
+    assert "ARECF v1.0.xsd" in str(excinfo.value)
@@ -4,7 +4,7 @@ from pathlib import Path
 
 import pytest
 
-from app.security.xml import XMLSecurityError, validate_with_xsd
+from app.security.xml import XMLSecurityError, parse_secure, validate_with_xsd
 
 
 @pytest.mark.parametrize(
@@ -25,3 +25,57 @@ def test_xml_too_large_raises() -> None:
     huge_xml = b"<eCF>" + b"<a>" * 1_000_000 + b"</a>" * 1_000_000 + b"</eCF>"
     with pytest.raises(XMLSecurityError):
         validate_with_xsd(huge_xml, "xsd/ecf.xsd")
+
+
+def test_xml_too_deep_raises() -> None:
+    deep_xml = b"<eCF>" + b"<a>" * 100 + b"</a>" * 100 + b"</eCF>"
+    with pytest.raises(XMLSecurityError, match="profundo"):
+        parse_secure(deep_xml)
+
+
+def test_xml_with_entities_is_rejected() -> None:
+    xml_bytes = b'<?xml version="1.0"?><!DOCTYPE eCF [<!ENTITY x "boom">]><eCF>&x;</eCF>'
+    with pytest.raises(XMLSecurityError, match="DTD"):
+        parse_secure(xml_bytes)
+
+
+def test_wrong_root_fails_fast() -> None:
+    xml_bytes = Path("tests/assets/sample_acecf.xml").read_bytes()
+    with pytest.raises(XMLSecurityError, match="raíz ACECF"):
+        validate_with_xsd(xml_bytes, "xsd/ecf.xsd")
+
+
+def test_schema_violation_is_reported() -> None:
+    xml_bytes = b"<eCF><Encabezado><RNCEmisor>101234567</RNCEmisor></Encabezado><Detalle/></eCF>"
+    with pytest.raises(XMLSecurityError, match="ecf.xsd"):
+        validate_with_xsd(xml_bytes, "xsd/ecf.xsd")
+
+
+def test_validated_tree_is_reused() -> None:
+    root = parse_secure(Path("tests/assets/sample_ecf_32.xml").read_bytes())
+    assert validate_with_xsd(root, "xsd/ecf.xsd") is root
+
+
+def test_router_maps_schema_violation_to_422() -> None:
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.routers import recepcion
+
+    api = FastAPI()
+    api.include_router(recepcion.router)
+    payload = {
+        "encf": "E310000000001",
+        "tipoECF": "31",
+        "rncEmisor": "131415161",
+        "rncReceptor": "172839405",
+        "fechaEmision": "2024-05-01T00:00:00",
+        "montoTotal": 1500.0,
+        "items": [],  # sin Detalle: el XSD lo exige
+    }
+
+    with TestClient(api) as client:
+        response = client.post("/dgii/recepcion/ecf", json=payload, headers={"Authorization": "Bearer tok"})
+
+    assert response.status_code == 422
+    assert "Detalle" in response.json()["detail"]
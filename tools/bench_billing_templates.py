@@ -0,0 +1,118 @@
+"""Micro-benchmark of the billing XML renderers.
+
+Compares, per document type, the two escaping engines of
+``app.billing.templates`` (``format`` and ``jinja``), an unescaped f-string
+baseline (unsafe, for reference only) and an lxml builder that fills a parsed
+skeleton. Run from the repository root::
+
+    python tools/bench_billing_templates.py --number 20000
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from lxml import etree
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.billing.templates import TEMPLATES, BillingTemplate  # noqa: E402
+
+SAMPLES: Dict[str, Dict[str, Any]] = {
+    "ecf": {
+        "rnc_emisor": "131415161",
+        "rnc_comprador": "101010101",
+        "razon_social_comprador": "COMERCIAL ACME SRL",
+        "encf": "E310000012345",
+        "fecha_emision": "2024-05-01T10:30:00",
+        "total": "125430.75",
+    },
+    "rfce": {"rnc_emisor": "131415161", "encf": "E320000004321", "total": "1780.00", "fecha": "2024-05-01"},
+    "anecf": {
+        "tipo_ecf": "31",
+        "rnc_emisor": "131415161",
+        "desde": 1,
+        "hasta": 250,
+        "cantidad": 250,
+        "fecha": "2024-05-01T10:30:00",
+    },
+    "acecf": {
+        "encf": "E310000012345",
+        "rnc_emisor": "131415161",
+        "rnc_comprador": "101010101",
+        "razon_social_comprador": "COMERCIAL ACME SRL",
+        "estado": 2,
+        "detalle_motivo": "Monto & ITBIS <no coinciden> con la orden \"OC-77\"",
+        "fecha": "2024-05-01T10:30:00",
+    },
+    "arecf": {
+        "encf": "E310000012345",
+        "rnc_emisor": "131415161",
+        "rnc_comprador": "101010101",
+        "razon_social_comprador": "COMERCIAL ACME SRL",
+        "estado": 1,
+        "motivo_codigo": "02",
+        "fecha": "2024-05-01T10:30:00",
+    },
+}
+
+
+def _lxml_renderer(template: BillingTemplate) -> Callable[[Dict[str, Any]], bytes]:
+    body = template.source.split("?>", 1)[1]
+    skeleton = etree.fromstring(body.encode("utf-8"))
+    slots = {
+        element.text.strip()[1:-1]: skeleton.getroottree().getpath(element)
+        for element in skeleton.iter()
+        if element.text and element.text.strip().startswith("{")
+    }
+
+    def render(context: Dict[str, Any]) -> bytes:
+        root = copy.deepcopy(skeleton)
+        for name, path in slots.items():
+            root.xpath(path)[0].text = str(context[name])
+        return etree.tostring(root, encoding="UTF-8", xml_declaration=True)
+
+    return render
+
+
+def run(number: int) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for name, template in TEMPLATES.items():
+        context = SAMPLES[name]
+        assert template.render(context, "format") == template.render(context, "jinja")
+        renderers: Dict[str, Callable[[], Any]] = {
+            "format": lambda: template.render(context, "format"),
+            "jinja": lambda: template.render(context, "jinja"),
+            "fstring_sin_escape": lambda: template.source.format_map(context),
+            "lxml": lambda render=_lxml_renderer(template): render(context),
+        }
+        for engine, func in renderers.items():
+            seconds = min(timeit.repeat(func, number=number, repeat=3))
+            rows.append({"documento": name, "motor": engine, "us_por_render": seconds / number * 1e6})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=10_000, help="Renders por medición")
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados en JSON")
+    args = parser.parse_args()
+
+    rows = run(args.number)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'documento':<10} {'motor':<20} {'µs/render':>10}")
+    for row in rows:
+        print(f"{row['documento']:<10} {row['motor']:<20} {row['us_por_render']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()